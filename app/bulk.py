@@ -0,0 +1,181 @@
+import json
+import logging
+from itertools import islice
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+from app.existence import get_existence_cache
+from data.crimes.lookups import LOOKUP_COLLECTIONS, compact_crime_report, extract_lookups, get_lookup_cache
+from data.crimes.process import process_crime_data
+from data.crimes.validation import validate_crime_batch
+from data.upvotes.validation import validate_officer_data, validate_report_data, validate_upvote_data
+from db.rollups import apply_reports, apply_upvotes
+from app.queries.leaderboard import forget_upvoted_days, parse_day
+
+# bulk ingestion behind POST /crimes/bulk and /upvotes/bulk: items are validated a batch at a
+# time, written with one unordered bulk_write per batch, and every item gets a result:
+#   {"index": i, "status": "inserted" | "duplicate" | "invalid" | "failed", "error": ...}
+
+BATCH_SIZE = 1000  # items per validation pass / bulk_write
+DUPLICATE_KEY = 11000
+
+
+class InvalidItem:
+    """Placeholder for an item that could not be parsed."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def parse_ndjson(lines):
+    """Yield the documents of an NDJSON stream; lines that are not JSON yield an error marker."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield InvalidItem("Invalid JSON.")
+
+
+def batches(items, size=BATCH_SIZE):
+    """Split an iterable of items into lists of at most `size`."""
+    items = iter(items)
+    return iter(lambda: list(islice(items, size)), [])
+
+
+def write(collection, documents, positions, results):
+    """Insert documents unordered and record inserted / duplicate / failed per item; return the inserted ones."""
+    if not documents:
+        return []
+
+    failed = {}
+    try:
+        collection.bulk_write([InsertOne(document) for document in documents], ordered=False)
+    except BulkWriteError as e:
+        failed = {error["index"]: error for error in e.details["writeErrors"]}
+
+    inserted = []
+    for index, (document, position) in enumerate(zip(documents, positions)):
+        error = failed.get(index)
+        if error is None:
+            results[position] = {"index": position, "status": "inserted"}
+            inserted.append(document)
+        elif error["code"] == DUPLICATE_KEY:
+            results[position] = {"index": position, "status": "duplicate"}
+        else:
+            results[position] = {"index": position, "status": "failed", "error": error.get("errmsg")}
+    return inserted
+
+
+def insert_crimes(db, items, compact=False):
+    """Validate, process and insert raw crime records in batches; return the per-item results."""
+    results, offset = [], 0
+    for batch in batches(items):
+        results.extend([None] * len(batch))
+        records = [item if isinstance(item, dict) else {} for item in batch]
+        mask, errors = validate_crime_batch(records)
+
+        documents, positions = [], []
+        lookups = {collection: {} for collection in LOOKUP_COLLECTIONS}
+        for index, (item, valid, error) in enumerate(zip(batch, mask, errors)):
+            position = offset + index
+            if isinstance(item, InvalidItem):
+                results[position] = {"index": position, "status": "invalid", "error": item.error}
+                continue
+            if not valid:
+                results[position] = {"index": position, "status": "invalid", "error": error["error"]}
+                continue
+
+            crime_report, error, _ = process_crime_data(item, validate=False)
+            if error:
+                results[position] = {"index": position, "status": "invalid", "error": error["error"]}
+                continue
+            extract_lookups(crime_report, lookups)
+            documents.append(compact_crime_report(crime_report) if compact else crime_report)
+            positions.append(position)
+
+        get_lookup_cache(db).remember(lookups)
+        inserted = write(db.crime_reports, documents, positions, results)
+        for position, document in zip(positions, documents):
+            results[position]["dr_no"] = document["dr_no"]
+
+        # keep the rollups and the existence cache in step with what was actually inserted
+        apply_reports(db, inserted)
+        existence = get_existence_cache(db, "crime_reports", "dr_no")
+        for document in inserted:
+            existence.add(document["dr_no"])
+        offset += len(batch)
+    return results
+
+
+def check_upvote(upvote):
+    """Run the single-upvote validators; return an error message or None."""
+    if isinstance(upvote, InvalidItem):
+        return upvote.error
+    if not isinstance(upvote, dict):
+        return "Upvote must be a JSON object."
+    is_valid, error_message = validate_upvote_data(upvote)
+    if is_valid:
+        is_valid, error_message = validate_officer_data(upvote["officer"])
+    if is_valid:
+        is_valid, error_message = validate_report_data(upvote["report"])
+    if is_valid and not all(isinstance(key, (int, str)) for key in (upvote["officer"]["badge_no"], upvote["report"]["dr_no"])):
+        is_valid, error_message = False, "badge_no and dr_no must be numbers or strings."
+    if is_valid:
+        try:
+            parse_day(upvote["upvote_date"])
+        except ValueError as e:
+            is_valid, error_message = False, f"upvote_date: {e}"
+    return None if is_valid else error_message
+
+
+def insert_upvotes(db, items, logger=None):
+    """Validate and insert upvotes in batches; return the per-item results."""
+    logger = logger or logging.getLogger(__name__)
+    officers = get_existence_cache(db, "police_officers", "badge_no")
+    reports = get_existence_cache(db, "crime_reports", "dr_no")
+
+    results, offset = [], 0
+    for batch in batches(items):
+        results.extend([None] * len(batch))
+        valid = []
+        for index, upvote in enumerate(batch):
+            error = check_upvote(upvote)
+            if error:
+                results[offset + index] = {"index": offset + index, "status": "invalid", "error": error}
+            else:
+                valid.append((offset + index, upvote))
+
+        # one existence query per collection for the whole batch
+        known_officers = officers.existing(upvote["officer"]["badge_no"] for _, upvote in valid)
+        known_reports = reports.existing(upvote["report"]["dr_no"] for _, upvote in valid)
+
+        documents, positions = [], []
+        for position, upvote in valid:
+            if upvote["officer"]["badge_no"] not in known_officers:
+                results[position] = {"index": position, "status": "invalid", "error": f"Officer with badge_no {upvote['officer']['badge_no']} not found."}
+            elif upvote["report"]["dr_no"] not in known_reports:
+                results[position] = {"index": position, "status": "invalid", "error": f"Report with DR_NO {upvote['report']['dr_no']} not found."}
+            else:
+                documents.append(upvote)
+                positions.append(position)
+
+        # repeated upvotes are rejected by the unique index and must not be counted
+        inserted = write(db.upvotes, documents, positions, results)
+        try:
+            apply_upvotes(db, inserted)
+        except Exception as e:
+            # the batch is stored and reported as such, the stats are fixed by db.rollups.officers --repair
+            logger.error(f"{len(inserted)} upvotes stored, but the upvote rollups were not updated: {e}")
+        forget_upvoted_days(db, inserted)
+        offset += len(batch)
+    return results
+
+
+def summarize(results):
+    """Count the results per status and attach them."""
+    summary = {status: 0 for status in ("inserted", "duplicate", "invalid", "failed")}
+    for result in results:
+        summary[result["status"]] += 1
+    return {**summary, "results": results}
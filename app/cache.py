@@ -0,0 +1,135 @@
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# in-process cache of analytics query results. entries are keyed on the query function and its
+# arguments as given, evicted LRU-first past MAX_ENTRIES / MAX_BYTES or after TTL seconds, and
+# remember the version of every collection the query reads. writes through the API bump those
+# versions, which invalidates the dependent entries of this process at once; writes made by
+# other processes (loaders, sync, other app workers) are picked up when the TTL runs out
+#
+# cached results are shared between callers and must not be mutated
+
+TTL = 300  # seconds
+MAX_ENTRIES = 1000
+MAX_BYTES = 64 * 1024 * 1024
+
+
+def normalize(value):
+    """Make a query argument hashable, keeping its value as given (only the query decides what " John Smith" means)."""
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, normalize(item)) for key, item in value.items()))
+    return value
+
+
+class ResultCache:
+    """LRU + TTL cache of query results, bounded in entries and (estimated) bytes."""
+
+    def __init__(self, ttl=TTL, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (result, versions, expires_at, size)
+        self.versions = {}  # (db name, collection) -> write counter
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "expired": 0, "evictions": 0, "uncacheable": 0}
+
+    def bump(self, db, *collections):
+        """Record a write to collections, invalidating the results that read them."""
+        with self.lock:
+            for collection in collections:
+                key = (db.name, collection)
+                self.versions[key] = self.versions.get(key, 0) + 1
+
+    def current_versions(self, db, collections):
+        """The write counters of collections, stored with each entry."""
+        return tuple(self.versions.get((db.name, collection), 0) for collection in collections)
+
+    def get(self, key, versions):
+        """Return (True, result) for a fresh entry, (False, None) otherwise."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return False, None
+            result, entry_versions, expires_at, _ = entry
+            if entry_versions != versions or expires_at < time.monotonic():
+                self.stats["stale" if entry_versions != versions else "expired"] += 1
+                self.stats["misses"] += 1
+                self.remove(key)
+                return False, None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return True, result
+
+    def put(self, key, result, versions):
+        """Store a result, evicting least recently used entries past the caps."""
+        size = len(json.dumps(result, default=str))
+        with self.lock:
+            if size > self.max_bytes:
+                self.stats["uncacheable"] += 1
+                return
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (result, versions, time.monotonic() + self.ttl, size)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+                self.stats["evictions"] += 1
+
+    def remove(self, key):
+        """Drop an entry (the lock must be held)."""
+        _, _, _, size = self.entries.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        """Drop every entry."""
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def info(self):
+        """Hit / miss counters and current size."""
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+            }
+
+
+# one cache per process, shared by every query function
+result_cache = ResultCache()
+
+
+def cached(*collections):
+    """Cache a query function `f(db, *args)` until one of `collections` is written to or the TTL passes."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(db, *args, **kwargs):
+            key = (db.name, func.__module__, func.__qualname__, normalize(args), normalize(kwargs))
+            versions = result_cache.current_versions(db, collections)
+            hit, result = result_cache.get(key, versions)
+            if hit:
+                return result
+            result = func(db, *args, **kwargs)
+            result_cache.put(key, result, versions)
+            return result
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def invalidate(db, *collections):
+    """Bump the version of collections written to, see ResultCache.bump."""
+    result_cache.bump(db, *collections)
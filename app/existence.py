@@ -0,0 +1,275 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# existence checks for the keys upvotes and crime routes refer to (officer badge_no, report
+# dr_no). keys seen to exist are remembered in a bounded LRU, so repeated upvotes for the same
+# officers and reports skip the lookup; a miss costs one find_one served by the unique index.
+#
+# in front of that sits a Bloom filter of every key, built in a background thread from a
+# projection-only scan and rebuilt every REFRESH_INTERVAL seconds. keys inserted by other
+# processes (loaders, sync, other app workers) are followed with a change stream opened before
+# the scan, so the filter never misses a key while that stream is running. only then is a key
+# the filter has never seen rejected without a round trip; without a change stream (standalone
+# servers) or after it fails, a filter miss is confirmed with the indexed find_one.
+#
+# change streams need a replica set, so on a standalone mongod the filter never rejects a key
+# and saves no lookups: only the LRU of existing keys does. /metrics/existence reports this
+# as "authoritative": false, and the failing stream is logged once per collection
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = 100000  # keys remembered per collection
+FALSE_POSITIVE_RATE = 0.01
+REFRESH_INTERVAL = 300  # seconds between filter rebuilds
+MIN_CAPACITY = 100000
+SCAN_BATCH_SIZE = 10000
+STREAM_OPEN_TIMEOUT = 10  # seconds to wait for the change stream before scanning
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over str() of the keys, with double hashing."""
+
+    def __init__(self, capacity, false_positive_rate=FALSE_POSITIVE_RATE):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, value):
+        """Bit positions of a key: two 64-bit halves of one hash, combined k times."""
+        digest = hashlib.blake2b(str(value).encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self.positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(value))
+
+    def false_positive_rate(self):
+        """Expected false positive rate at the current number of keys."""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    def stats(self):
+        """Size, load and memory use of the filter."""
+        return {
+            "keys": self.count,
+            "capacity": self.capacity,
+            "hashes": self.hashes,
+            "memory_bytes": len(self.bits),
+            "false_positive_rate": self.false_positive_rate(),
+        }
+
+
+class ExistenceCache:
+    """Positive LRU cache of keys known to exist in one collection, in front of an indexed find_one."""
+
+    def __init__(self, collection, field, size=CACHE_SIZE):
+        self.collection = collection
+        self.field = field
+        self.size = size
+        self.known = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Bloom filter of every key, None until the first build has finished
+        self.filter = None
+        self.rejected = 0
+        self.pending = None
+        self.built_at = None
+        self.build_seconds = None
+        # set while a change stream adds the keys inserted elsewhere; a filter may only reject
+        # keys if it was built after the stream it is kept current by had been opened
+        self.stream_opened_at = None
+        self.watcher = None
+        self.stream_ready = threading.Event()
+        self.authoritative = False
+        self.stream_error = None
+
+    def add(self, value):
+        """Remember a key, e.g. right after inserting its document."""
+        with self.lock:
+            self.known[value] = True
+            self.known.move_to_end(value)
+            if len(self.known) > self.size:
+                self.known.popitem(last=False)
+            if self.filter is not None:
+                self.filter.add(value)
+            # keys inserted while a rebuild scans the collection are added to the new filter too
+            if self.pending is not None:
+                self.pending.append(value)
+
+    def watch(self):
+        """Follow inserts into the collection with a change stream, adding their keys until it fails."""
+        pipeline = [
+            {"$match": {"operationType": {"$in": ["insert", "replace"]}}},
+            {"$project": {f"fullDocument.{self.field}": 1}},
+        ]
+        try:
+            with self.collection.watch(pipeline) as stream:
+                with self.lock:
+                    self.stream_opened_at = time.monotonic()
+                    self.stream_error = None
+                self.stream_ready.set()
+                for change in stream:
+                    value = (change.get("fullDocument") or {}).get(self.field)
+                    if value is not None:
+                        self.add(value)
+        except Exception as e:
+            # the refresh loop retries every interval, a standalone server fails the same way each time
+            if self.stream_error is None:
+                logger.warning(f"Existence filter of {self.collection.name} is not kept current by a change stream, misses are confirmed with a query: {e}")
+            self.stream_error = str(e)
+        finally:
+            with self.lock:
+                self.stream_opened_at = None
+                self.authoritative = False
+            self.stream_ready.set()
+
+    def start_watching(self):
+        """Start the change stream thread unless it is running, and wait until it is open or has failed."""
+        if self.watcher is not None and self.watcher.is_alive():
+            return
+        self.stream_ready.clear()
+        self.watcher = threading.Thread(target=self.watch, name=f"{self.collection.name}-existence-stream", daemon=True)
+        self.watcher.start()
+        self.stream_ready.wait(STREAM_OPEN_TIMEOUT)
+
+    def build_filter(self, false_positive_rate=FALSE_POSITIVE_RATE):
+        """Scan the collection keys into a new Bloom filter and swap it in."""
+        started = time.perf_counter()
+        scan_started = time.monotonic()
+        with self.lock:
+            self.pending = []
+
+        try:
+            # leave room for growth until the next rebuild
+            capacity = max(MIN_CAPACITY, 2 * self.collection.estimated_document_count())
+            bloom = BloomFilter(capacity, false_positive_rate)
+            for document in self.collection.find({}, {"_id": 0, self.field: 1}).batch_size(SCAN_BATCH_SIZE):
+                if self.field in document:
+                    bloom.add(document[self.field])
+        except Exception:
+            with self.lock:
+                self.pending = None
+            raise
+
+        with self.lock:
+            for value in self.pending:
+                bloom.add(value)
+            self.pending = None
+            self.filter = bloom
+            # keys inserted elsewhere before the scan are in it, the stream adds the later ones
+            self.authoritative = self.stream_opened_at is not None and self.stream_opened_at <= scan_started
+            self.built_at = time.time()
+            self.build_seconds = time.perf_counter() - started
+
+    def might_exist(self, value):
+        """False only for keys that definitely do not exist (True while no filter is kept current)."""
+        bloom = self.filter
+        if bloom is None or not self.authoritative or value in bloom:
+            return True
+        with self.lock:
+            self.rejected += 1
+        return False
+
+    def exists(self, value):
+        """Return True if a document with this key exists."""
+        with self.lock:
+            if value in self.known:
+                self.known.move_to_end(value)
+                self.hits += 1
+                return True
+            self.misses += 1
+
+        if not self.might_exist(value):
+            return False
+
+        # documents are never deleted through the API, so only positive answers are cached
+        if self.collection.find_one({self.field: value}, {"_id": 1}) is None:
+            return False
+        self.add(value)
+        return True
+
+    def existing(self, values):
+        """Return the subset of `values` that exist, with one $in query for the uncached ones."""
+        values = set(values)
+        with self.lock:
+            found = {value for value in values if value in self.known}
+            self.hits += len(found)
+            self.misses += len(values) - len(found)
+
+        missing = [value for value in values - found if self.might_exist(value)]
+        if missing:
+            for document in self.collection.find({self.field: {"$in": missing}}, {"_id": 0, self.field: 1}):
+                found.add(document[self.field])
+                self.add(document[self.field])
+        return found
+
+    def stats(self):
+        """Cache hit / miss counters and the state of the Bloom filter."""
+        bloom = self.filter
+        return {
+            "cache": {"keys": len(self.known), "size": self.size, "hits": self.hits, "misses": self.misses},
+            # false: every filter miss still costs a find_one (no change stream, e.g. a standalone server)
+            "authoritative": bloom is not None and self.authoritative,
+            "change_stream_error": self.stream_error,
+            "filter": {
+                **bloom.stats(),
+                "rejected": self.rejected,
+                "built_at": self.built_at,
+                "build_seconds": self.build_seconds,
+            } if bloom is not None else None,
+        }
+
+
+# one cache per database and collection, shared by the request handlers of a process
+caches = {}
+
+
+def get_existence_cache(db, collection, field):
+    """Return the process-wide existence cache of a collection key."""
+    key = (db.name, collection)
+    if key not in caches:
+        caches[key] = ExistenceCache(db[collection], field)
+    return caches[key]
+
+
+def officer_exists(db, badge_no):
+    """Return True if an officer with this badge_no exists."""
+    return get_existence_cache(db, "police_officers", "badge_no").exists(badge_no)
+
+
+def report_exists(db, dr_no):
+    """Return True if a crime report with this dr_no exists."""
+    return get_existence_cache(db, "crime_reports", "dr_no").exists(dr_no)
+
+
+def start_existence_filters(db, false_positive_rate=FALSE_POSITIVE_RATE, refresh_interval=REFRESH_INTERVAL):
+    """Build the officer / report filters in a background thread and rebuild them periodically."""
+    targets = [get_existence_cache(db, "police_officers", "badge_no"), get_existence_cache(db, "crime_reports", "dr_no")]
+
+    def refresh():
+        while True:
+            for cache in targets:
+                # (re)open the change stream before scanning, so no insert falls in between
+                cache.start_watching()
+                try:
+                    cache.build_filter(false_positive_rate)
+                except Exception as e:
+                    logger.error(f"Could not build the {cache.collection.name} existence filter: {e}")
+            if not refresh_interval:
+                return
+            time.sleep(refresh_interval)
+
+    thread = threading.Thread(target=refresh, name="existence-filters", daemon=True)
+    thread.start()
+    return thread
@@ -1,13 +1,58 @@
-
+import os
 from flask import Flask
 from db.mongo import init_db
+from db.indexes import create_unique_indexes
 from app.routes import crime_routes
+from app.existence import start_existence_filters
+from app.cache import result_cache
+from app.write_behind import install_shutdown_handler, write_concern_from
 
 app = Flask(__name__)
 
+# crime report layout written by the API: "full" (default) or "compact" (codes only, see data/crimes/lookups.py)
+app.config["CRIME_SCHEMA"] = os.environ.get("CRIME_SCHEMA", "full")
+
+# how POST /upvotes writes: "sync" (default, insert per request) or "write-behind" (queued, inserted
+# in batches, see app/write_behind.py), with the flusher's queue / batch sizes and durability
+app.config["UPVOTE_WRITE_MODE"] = os.environ.get("UPVOTE_WRITE_MODE", "sync")
+app.config["UPVOTE_QUEUE_SIZE"] = int(os.environ.get("UPVOTE_QUEUE_SIZE", 50000))
+app.config["UPVOTE_BATCH_SIZE"] = int(os.environ.get("UPVOTE_BATCH_SIZE", 1000))
+app.config["UPVOTE_FLUSH_INTERVAL"] = float(os.environ.get("UPVOTE_FLUSH_INTERVAL", 0.2))
+app.config["UPVOTE_WRITE_CONCERN"] = os.environ.get("UPVOTE_WRITE_CONCERN")  # e.g. 0, 1, majority
+app.config["UPVOTE_JOURNAL"] = os.environ.get("UPVOTE_JOURNAL", "") == "1"
+# fail at startup rather than on the first queued upvote
+write_concern_from(app.config)
+# flush the queued upvotes when the server is stopped with SIGTERM
+if app.config["UPVOTE_WRITE_MODE"] == "write-behind":
+    install_shutdown_handler()
+
+# in-memory Bloom filters of dr_no / badge_no that reject unknown ids without a query (see app/existence.py)
+app.config["EXISTENCE_FILTERS"] = os.environ.get("EXISTENCE_FILTERS", "1") == "1"
+app.config["EXISTENCE_FP_RATE"] = float(os.environ.get("EXISTENCE_FP_RATE", 0.01))
+app.config["EXISTENCE_REFRESH"] = int(os.environ.get("EXISTENCE_REFRESH", 300))  # seconds, 0 builds once
+
+# analytics result cache (see app/cache.py): entry lifetime and size caps
+app.config["RESULT_CACHE_TTL"] = int(os.environ.get("RESULT_CACHE_TTL", 300))  # seconds
+app.config["RESULT_CACHE_ENTRIES"] = int(os.environ.get("RESULT_CACHE_ENTRIES", 1000))
+app.config["RESULT_CACHE_MB"] = int(os.environ.get("RESULT_CACHE_MB", 64))
+
 # initialize MongoDB connection
 mongo = init_db(app=app)
 
+# duplicate upvotes / reports are rejected by the unique key indexes, so make sure they exist
+try:
+    create_unique_indexes(mongo.db)
+except Exception as e:
+    print(f"Warning: could not create the unique indexes (run `python -m db.indexes --dedupe`): {e}")
+
+# build the existence filters in the background, requests fall back to the database until they are ready
+if app.config["EXISTENCE_FILTERS"]:
+    start_existence_filters(mongo.db, app.config["EXISTENCE_FP_RATE"], app.config["EXISTENCE_REFRESH"])
+
+result_cache.ttl = app.config["RESULT_CACHE_TTL"]
+result_cache.max_entries = app.config["RESULT_CACHE_ENTRIES"]
+result_cache.max_bytes = app.config["RESULT_CACHE_MB"] * 1024 * 1024
+
 # pass the `mongo` object to the Blueprint
 crime_routes.mongo = mongo
 
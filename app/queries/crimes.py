@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
+from data.crimes.lookups import get_lookup_cache
+from app.cache import cached
 
-# function to convert date strings to datetime
+# function to convert date strings to datetime (date_occurred is stored as a BSON date)
 def convert_to_datetime(date):
     if isinstance(date, str):
         return datetime.fromisoformat(date)
@@ -17,6 +19,7 @@ def execute_pipeline(db, pipeline):
         raise e
     
 # query 1
+@cached("crime_reports")
 def get_reports_per_crime_code(db, start_date, end_date):
 
     # convert input strings to datetime objects
@@ -31,8 +34,8 @@ def get_reports_per_crime_code(db, start_date, end_date):
         {
             "$match": {
                 "date_occurred": {
-                    "$gte": start_date.isoformat(), # ensure the format matches
-                    "$lte": end_date.isoformat() # ensure the format matches
+                    "$gte": start_date,
+                    "$lte": end_date
                 }
             }
         },
@@ -64,13 +67,13 @@ def get_reports_per_crime_code(db, start_date, end_date):
     return execute_pipeline(db, pipeline)
     
 # query 2
+@cached("crime_reports")
 def get_reports_per_day_for_crime_code(db, crime_code, start_date, end_date):
 
-    # convert input strings to datetime objects
-    if isinstance(start_date, str):
-        start_date = datetime.fromisoformat(start_date)
-    if isinstance(end_date, str):
-        end_date = datetime.fromisoformat(end_date)
+    # convert input strings to datetime objects and the crime code to int
+    start_date = convert_to_datetime(start_date)
+    end_date = convert_to_datetime(end_date)
+    crime_code = int(crime_code)
         
     # print(f"Querying for crime code {crime_code} from {start_date} to {end_date}")
 
@@ -80,8 +83,8 @@ def get_reports_per_day_for_crime_code(db, crime_code, start_date, end_date):
         {
             "$match": {
                 "date_occurred": {
-                    "$gte": start_date.isoformat(), # ensure the format matches
-                    "$lte": end_date.isoformat() # ensure the format matches
+                    "$gte": start_date,
+                    "$lte": end_date
                 },
                 "crime.code": crime_code
             }
@@ -96,19 +99,10 @@ def get_reports_per_day_for_crime_code(db, crime_code, start_date, end_date):
                 "crime.code": crime_code
             }
         },
-        # group by the day part of the date_occurred field and count occurrences
+        # group by the precomputed day bucket and count occurrences
         {
             "$group": {
-                "_id": {
-                    "$dateToString": {
-                        "format": "%Y-%m-%d",
-                        "date": {
-                            "$dateFromString": {
-                                "dateString": "$date_occurred"
-                            }
-                        }
-                    }
-                },
+                "_id": "$day",
                 "count": {"$sum": 1}
             }
         },
@@ -116,11 +110,11 @@ def get_reports_per_day_for_crime_code(db, crime_code, start_date, end_date):
         {
             "$sort": {"_id": 1}
         },
-        # format the output to include only 'date' and 'count'
+        # format the output to include only 'date' and 'count' (formatting runs once per day, not per document)
         {
             "$project": {
                 "_id": 0,
-                "date": "$_id",
+                "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$_id"}},
                 "count": 1
             }
         }
@@ -130,11 +124,11 @@ def get_reports_per_day_for_crime_code(db, crime_code, start_date, end_date):
     return execute_pipeline(db, pipeline)
 
 # quey 3 
+@cached("crime_reports")
 def get_top_three_crimes_per_area_for_day(db, specific_date):
 
     # convert input string to datetime object
-    if isinstance(specific_date, str):
-        specific_date = datetime.fromisoformat(specific_date)
+    specific_date = convert_to_datetime(specific_date)
         
     # print(f"Querying for crimes on {specific_date}")
 
@@ -144,8 +138,8 @@ def get_top_three_crimes_per_area_for_day(db, specific_date):
         {
             "$match": {
                 "date_occurred": {
-                    "$gte": specific_date.isoformat(),  # start of the day
-                    "$lt": (specific_date + timedelta(days=1)).isoformat()  # start of the next day
+                    "$gte": specific_date,  # start of the day
+                    "$lt": specific_date + timedelta(days=1)  # start of the next day
                 }
             }
         },
@@ -153,13 +147,14 @@ def get_top_three_crimes_per_area_for_day(db, specific_date):
         {
             "$unwind": "$crime"
         },
-        # group by area and crime code, and count occurrences
+        # group by area and crime code, and count occurrences (area codes exist in both the full and compact layout)
         {
             "$group": {
                 "_id": {
-                    "area": "$area.name",
+                    "area": "$area.no",
                     "crime_code": "$crime.code"
                 },
+                "area_name": {"$first": "$area.name"},
                 "count": {"$sum": 1}
             }
         },
@@ -174,6 +169,7 @@ def get_top_three_crimes_per_area_for_day(db, specific_date):
         {
             "$group": {
                 "_id": "$_id.area",
+                "area_name": {"$first": "$area_name"},
                 "crimes": {
                     "$push": {
                         "crime_code": "$_id.crime_code",
@@ -186,7 +182,8 @@ def get_top_three_crimes_per_area_for_day(db, specific_date):
         {
             "$project": {
                 "_id": 0,
-                "area": "$_id",
+                "area_no": "$_id",
+                "area": "$area_name",
                 "top_crimes": {
                     "$slice": ["$crimes", 3]
                 }
@@ -194,17 +191,21 @@ def get_top_three_crimes_per_area_for_day(db, specific_date):
         }
     ]
 
-    # execute the aggregation pipeline
-    return execute_pipeline(db, pipeline)
+    # execute the aggregation pipeline and join the area names of compact reports back in
+    lookups = get_lookup_cache(db)
+    result = execute_pipeline(db, pipeline)
+    for row in result:
+        area_no = row.pop("area_no")
+        row["area"] = row.get("area") or lookups.describe("areas", area_no)
+    return result
 
 # query 4
+@cached("crime_reports")
 def get_two_least_common_crimes_per_day(db, start_date, end_date):
 
     # convert input strings to datetime objects
-    if isinstance(start_date, str):
-        start_date = datetime.fromisoformat(start_date)
-    if isinstance(end_date, str):
-        end_date = datetime.fromisoformat(end_date)
+    start_date = convert_to_datetime(start_date)
+    end_date = convert_to_datetime(end_date)
         
     # print(f"Querying from {start_date} to {end_date}")
 
@@ -214,8 +215,8 @@ def get_two_least_common_crimes_per_day(db, start_date, end_date):
         {
             "$match": {
                 "date_occurred": {
-                    "$gte": start_date.isoformat(),  # ensure the format matches
-                    "$lte": end_date.isoformat()    # ensure the format matches
+                    "$gte": start_date,
+                    "$lte": end_date
                 }
             }
         },
@@ -251,6 +252,7 @@ def get_two_least_common_crimes_per_day(db, start_date, end_date):
     return execute_pipeline(db, pipeline)
 
 # query 5
+@cached("crime_reports")
 def get_weapons_used_for_same_crime_in_multiple_areas(db):
 
     # MongoDB aggregation pipeline
@@ -259,10 +261,10 @@ def get_weapons_used_for_same_crime_in_multiple_areas(db):
         {
             "$unwind": "$crime"
         },
-        # filter out documents where weapon description is missing or empty
+        # filter out documents without a weapon (weapon is {} when the report has none)
         {
             "$match": {
-                "weapon.description": {"$ne": "", "$exists": True}
+                "weapon.code": {"$exists": True}
             }
         },
         # group by crime code and weapon type, and collect distinct areas
@@ -270,9 +272,10 @@ def get_weapons_used_for_same_crime_in_multiple_areas(db):
             "$group": {
                 "_id": {
                     "crime_code": "$crime.code",
-                    "weapon": "$weapon.description"
+                    "weapon": "$weapon.code"
                 },
-                "areas": {"$addToSet": "$area.name"}
+                "weapon": {"$first": "$weapon.description"},
+                "areas": {"$addToSet": {"no": "$area.no", "name": "$area.name"}}
             }
         },
         # filter for combinations used in more than one area
@@ -288,12 +291,19 @@ def get_weapons_used_for_same_crime_in_multiple_areas(db):
             "$project": {
                 "_id": 0,
                 "crime_code": "$_id.crime_code",
-                "weapon": "$_id.weapon",
+                "weapon_code": "$_id.weapon",
+                "weapon": 1,
                 "areas": 1
             }
         }
     ]
 
-    # execute the aggregation pipeline
-    return execute_pipeline(db, pipeline)
+    # execute the aggregation pipeline and join the names of compact reports back in
+    lookups = get_lookup_cache(db)
+    result = execute_pipeline(db, pipeline)
+    for row in result:
+        weapon_code = row.pop("weapon_code")
+        row["weapon"] = row.get("weapon") or lookups.describe("weapons", weapon_code)
+        row["areas"] = sorted({area.get("name") or lookups.describe("areas", area["no"]) or str(area["no"]) for area in row["areas"]})
+    return result
 
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from app.cache import cached
+from app.queries.crimes import convert_to_datetime
+from data.crimes.lookups import get_lookup_cache
+from db.rollups.base import known
+from db.rollups.daily import COLLECTION
+
+# queries 1-4 read from the crime_daily_counts rollup (see db/rollups/daily.py) instead of
+# unwinding every report in the range. the rollup is bucketed per day, so reports match on their
+# day rather than the exact date_occurred (the same thing for the midnight dates of the dataset).
+# the raw pipelines stay in app/queries/crimes.py, `python -m db.rollups.check` compares the two
+
+
+def day_range(start_date, end_date):
+    """Match rollup rows whose day lies in [start_date, end_date]."""
+    return {"day": {"$gte": convert_to_datetime(start_date), "$lte": convert_to_datetime(end_date)}, "count": {"$gt": 0}}
+
+
+# query 1
+@cached("crime_reports")
+def get_reports_per_crime_code(db, start_date, end_date):
+    """Crime entries per crime code in a date range, most common first."""
+    pipeline = [
+        # match the days in the range
+        {"$match": day_range(start_date, end_date)},
+        # sum the rows of every area and severity per crime code
+        {"$group": {"_id": "$crime_code", "count": {"$sum": "$count"}}},
+        {"$sort": {"count": -1}},
+        {"$project": {"_id": 0, "code": known("$_id"), "count": 1}},
+    ]
+    return list(db[COLLECTION].aggregate(pipeline))
+
+
+# query 2
+@cached("crime_reports")
+def get_reports_per_day_for_crime_code(db, crime_code, start_date, end_date):
+    """Crime entries of one crime code per day in a date range."""
+    query = day_range(start_date, end_date)
+    query["crime_code"] = int(crime_code)
+    pipeline = [
+        # match the days in the range for the crime code
+        {"$match": query},
+        # sum the rows of every area and severity per day
+        {"$group": {"_id": "$day", "count": {"$sum": "$count"}}},
+        {"$sort": {"_id": 1}},
+        {"$project": {"_id": 0, "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$_id"}}, "count": 1}},
+    ]
+    return list(db[COLLECTION].aggregate(pipeline))
+
+
+# query 3
+@cached("crime_reports")
+def get_top_three_crimes_per_area_for_day(db, specific_date):
+    """The three most common crime codes per area on one day."""
+    day = convert_to_datetime(specific_date)
+    pipeline = [
+        # match the rows of the day
+        {"$match": {"day": {"$gte": day, "$lt": day + timedelta(days=1)}, "count": {"$gt": 0}}},
+        # sum the severities per area and crime code
+        {"$group": {"_id": {"area": "$area_no", "crime_code": "$crime_code"}, "count": {"$sum": "$count"}}},
+        # sort by area and count in descending order, and keep the top three per area
+        {"$sort": {"_id.area": 1, "count": -1}},
+        {"$group": {"_id": "$_id.area", "crimes": {"$push": {"crime_code": known("$_id.crime_code"), "count": "$count"}}}},
+        {"$project": {"_id": 0, "area_no": known("$_id"), "top_crimes": {"$slice": ["$crimes", 3]}}},
+    ]
+
+    # the rollup only stores area codes, the names come from the lookup cache
+    lookups = get_lookup_cache(db)
+    result = []
+    for row in db[COLLECTION].aggregate(pipeline):
+        result.append({"area": lookups.describe("areas", row["area_no"]), "top_crimes": row["top_crimes"]})
+    return result
+
+
+# query 4
+@cached("crime_reports")
+def get_two_least_common_crimes_per_day(db, start_date, end_date):
+    """The two least common crime codes in a date range."""
+    pipeline = [
+        # match the days in the range
+        {"$match": day_range(start_date, end_date)},
+        {"$group": {"_id": "$crime_code", "count": {"$sum": "$count"}}},
+        {"$sort": {"count": 1}},
+        {"$limit": 2},
+        {"$project": {"_id": 0, "code": known("$_id"), "count": 1}},
+    ]
+    return list(db[COLLECTION].aggregate(pipeline))
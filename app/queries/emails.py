@@ -0,0 +1,61 @@
+from app.cache import cached
+from db.rollups.emails import COLLECTION, normalize_email
+
+# query 9 read from the officer_emails mapping (see db/rollups/emails.py): the emails shared by
+# several officers are paged through the (duplicate, email) index, and the reports upvoted by
+# the officers of one email are fetched separately, page by page, so neither grows with the
+# total number of upvotes. pages are keyed on the last email / dr_no of the previous page
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def parse_limit(limit):
+    """Validate the page size."""
+    limit = int(limit)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}.")
+    return limit
+
+
+# query 9
+@cached("police_officers")
+def get_duplicate_emails(db, after=None, limit=DEFAULT_LIMIT):
+    """A page of the emails used by more than one officer, with their badge numbers."""
+    limit = parse_limit(limit)
+    query = {"duplicate": True}
+    if after:
+        query["email"] = {"$gt": normalize_email(after)}
+
+    cursor = db[COLLECTION].find(query, {"_id": 0, "email": 1, "badge_nos": 1}).sort("email", 1).limit(limit)
+    emails = [{"officer_email": mapping["email"], "unique_badge_numbers": sorted(mapping["badge_nos"], key=str)} for mapping in cursor]
+    return {"emails": emails, "next": emails[-1]["officer_email"] if len(emails) == limit else None}
+
+
+@cached("upvotes", "police_officers")
+def get_reports_for_email(db, email, after=None, limit=DEFAULT_LIMIT):
+    """A page of the reports upvoted by the officers registered with an email."""
+    limit = parse_limit(limit)
+    email = normalize_email(email)
+    mapping = db[COLLECTION].find_one({"email": email}, {"_id": 0, "badge_nos": 1})
+    if mapping is None:
+        return None
+
+    query = {"officer.badge_no": {"$in": mapping["badge_nos"]}}
+    if after:
+        query["report.dr_no"] = {"$gt": after}
+    pipeline = [
+        # match the upvotes of the email's officers
+        {"$match": query},
+        # one row per report, in dr_no order
+        {"$group": {"_id": "$report.dr_no"}},
+        {"$sort": {"_id": 1}},
+        {"$limit": limit},
+    ]
+    dr_nos = [row["_id"] for row in db.upvotes.aggregate(pipeline, allowDiskUse=True)]
+    return {
+        "officer_email": email,
+        "unique_badge_numbers": sorted(mapping["badge_nos"], key=str),
+        "report_dr_nos": dr_nos,
+        "next": dr_nos[-1] if len(dr_nos) == limit else None,
+    }
@@ -0,0 +1,67 @@
+from app.queries.crimes import convert_to_datetime
+from app.queries.spatial import check_point
+from data.crimes.geohash import bbox, count_tiles, covering
+from db.rollups.tiles import COLLECTION, TILE_PRECISIONS
+
+# heatmap counts read straight from the crime_tiles cube (see db/rollups/tiles.py)
+
+MAX_TILES = 2000
+
+# finest geohash precision worth drawing at a map zoom level (web mercator, 256px tiles)
+ZOOM_PRECISIONS = [(9, 4), (11, 5), (22, 6)]
+
+
+def precision_for_zoom(zoom):
+    """Map a map zoom level to a tile precision."""
+    for max_zoom, precision in ZOOM_PRECISIONS:
+        if zoom <= max_zoom:
+            return precision
+    return TILE_PRECISIONS[-1]
+
+
+def get_heatmap(db, min_lat, min_lon, max_lat, max_lon, zoom, start_date=None, end_date=None, crime_code=None):
+    """Crime counts per tile inside a viewport, at the precision matching the zoom level."""
+    min_lat, min_lon = check_point(min_lat, min_lon)
+    max_lat, max_lon = check_point(max_lat, max_lon)
+    if min_lat >= max_lat or min_lon >= max_lon:
+        raise ValueError("min_lat / min_lon must be smaller than max_lat / max_lon.")
+
+    # step down to a coarser precision when the viewport would cover too many tiles
+    precision = precision_for_zoom(int(zoom))
+    while precision > TILE_PRECISIONS[0] and count_tiles(min_lat, min_lon, max_lat, max_lon, precision) > MAX_TILES:
+        precision -= 1
+    if count_tiles(min_lat, min_lon, max_lat, max_lon, precision) > MAX_TILES:
+        raise ValueError("The viewport is too large for a heatmap.")
+
+    query = {
+        "precision": precision,
+        "tile": {"$in": covering(min_lat, min_lon, max_lat, max_lon, precision)},
+        "count": {"$gt": 0},
+    }
+    if start_date or end_date:
+        query["day"] = {}
+        if start_date:
+            query["day"]["$gte"] = convert_to_datetime(start_date)
+        if end_date:
+            query["day"]["$lte"] = convert_to_datetime(end_date)
+    if crime_code is not None:
+        query["crime_code"] = int(crime_code)
+
+    pipeline = [
+        # match tiles in the viewport for the given date range and crime code
+        {"$match": query},
+        # sum the counts of every day / crime code per tile
+        {"$group": {"_id": "$tile", "count": {"$sum": "$count"}}},
+        {"$sort": {"_id": 1}},
+    ]
+
+    tiles = []
+    for tile in db[COLLECTION].aggregate(pipeline):
+        south, west, north, east = bbox(tile["_id"])
+        tiles.append({
+            "tile": tile["_id"],
+            "count": tile["count"],
+            "bbox": [south, west, north, east],
+            "center": [(south + north) / 2, (west + east) / 2],
+        })
+    return {"precision": precision, "tiles": tiles}
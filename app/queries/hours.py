@@ -0,0 +1,64 @@
+import calendar
+from app.queries.crimes import convert_to_datetime
+from data.crimes.lookups import get_lookup_cache
+from db.rollups.base import known
+from db.rollups.hours import COLLECTION, month_of
+
+# hour-of-week slices read straight from the crime_hours cube (see db/rollups/hours.py). the
+# cube is bucketed per month, so date filters are widened to whole months and the months that
+# were actually counted are returned with the result
+
+# dimensions a slice can be grouped by, mapped to their cube field
+DIMENSIONS = {"weekday": "weekday", "hour": "hour", "area": "area_no", "crime_code": "crime_code"}
+DEFAULT_DIMENSIONS = ["weekday", "hour"]
+
+
+def month_filter(start_date=None, end_date=None):
+    """Widen a date range to whole months: the month filter and the {"start", "end"} days it covers."""
+    query, months = {}, {"start": None, "end": None}
+    if start_date:
+        query["$gte"] = month_of(convert_to_datetime(start_date))
+        months["start"] = query["$gte"].strftime("%Y-%m-%d")
+    if end_date:
+        query["$lte"] = month_of(convert_to_datetime(end_date))
+        last_day = calendar.monthrange(query["$lte"].year, query["$lte"].month)[1]
+        months["end"] = query["$lte"].replace(day=last_day).strftime("%Y-%m-%d")
+    return query, months
+
+
+def get_crimes_per_hour_of_week(db, start_date=None, end_date=None, area=None, crime_code=None, group_by=None):
+    """Crime counts grouped by any of weekday / hour / area / crime code.
+
+    The cube is bucketed per month, so the date range is widened to whole months, returned as
+    {"months": {"start", "end"}, "cells": [...]}.
+    """
+    group_by = group_by or DEFAULT_DIMENSIONS
+    unknown = [dimension for dimension in group_by if dimension not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown group_by dimensions: {', '.join(unknown)}. Use {', '.join(DIMENSIONS)}.")
+
+    query = {"count": {"$gt": 0}}
+    months, covered = month_filter(start_date, end_date)
+    if months:
+        query["month"] = months
+    if area is not None:
+        query["area_no"] = int(area)
+    if crime_code is not None:
+        query["crime_code"] = int(crime_code)
+
+    pipeline = [
+        # match the cube cells in the month range, area and crime code
+        {"$match": query},
+        # sum the cells per requested dimensions
+        {"$group": {"_id": {dimension: known(f"${DIMENSIONS[dimension]}") for dimension in group_by}, "count": {"$sum": "$count"}}},
+        {"$sort": {f"_id.{dimension}": 1 for dimension in group_by}},
+    ]
+
+    lookups = get_lookup_cache(db)
+    result = []
+    for cell in db[COLLECTION].aggregate(pipeline):
+        row = dict(cell["_id"], count=cell["count"])
+        if "area" in row:
+            row["area_name"] = lookups.describe("areas", row["area"])
+        result.append(row)
+    return {"months": covered, "cells": result}
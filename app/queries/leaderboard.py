@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from app.cache import cached
+from db.rollups.leaderboard import COLLECTION
+
+# query 6 read from the upvote_leaderboard counters (see db/rollups/leaderboard.py). a single
+# day is an index walk over (date, count desc); the top MAX_LIMIT reports of the most recently
+# asked days are kept in process, dropped when this process writes an upvote for that day and
+# refreshed after HOT_TTL seconds otherwise (to pick up upvotes written by other processes).
+# date ranges sum the per-day counters and go through the result cache
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+HOT_DAYS = 64  # days kept in process
+HOT_TTL = 30  # seconds
+
+
+def parse_day(value):
+    """Validate a "YYYY-MM-DD" date, the format upvote_date is stored in."""
+    if not isinstance(value, str):
+        raise ValueError("Dates must be strings in 'YYYY-MM-DD' format.")
+    try:
+        # the counters are keyed on the exact string, so "2024-5-1" would never match
+        valid = datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d") == value
+    except ValueError:
+        valid = False
+    if not valid:
+        raise ValueError("Dates must be strings in 'YYYY-MM-DD' format.")
+    return value
+
+
+def parse_limit(limit):
+    """Validate the number of reports asked for."""
+    limit = int(limit)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}.")
+    return limit
+
+
+def rows(documents):
+    """Shape leaderboard counters like the original query 6 output."""
+    return [{"dr_no": document["dr_no"], "upvote_count": document["count"]} for document in documents]
+
+
+class HotDays:
+    """LRU of the top MAX_LIMIT reports of recently asked days."""
+
+    def __init__(self, collection, size=HOT_DAYS, ttl=HOT_TTL):
+        self.collection = collection
+        self.size = size
+        self.ttl = ttl
+        self.days = OrderedDict()  # day -> (expires_at, rows)
+        self.writes = 0  # forget() calls, so a read racing an upvote write is not cached
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def top(self, day, limit):
+        """The `limit` most upvoted reports of a day."""
+        with self.lock:
+            entry = self.days.get(day)
+            if entry is not None and entry[0] >= time.monotonic():
+                self.days.move_to_end(day)
+                self.hits += 1
+                return entry[1][:limit]
+            self.misses += 1
+            writes = self.writes
+
+        cursor = self.collection.find({"date": day, "count": {"$gt": 0}}, {"_id": 0, "dr_no": 1, "count": 1})
+        top = rows(cursor.sort([("count", -1), ("dr_no", 1)]).limit(MAX_LIMIT))
+        with self.lock:
+            if self.writes == writes:
+                self.days[day] = (time.monotonic() + self.ttl, top)
+                self.days.move_to_end(day)
+                if len(self.days) > self.size:
+                    self.days.popitem(last=False)
+        return top[:limit]
+
+    def forget(self, days):
+        """Drop days that were just upvoted."""
+        with self.lock:
+            for day in days:
+                self.days.pop(day, None)
+            self.writes += 1
+
+    def stats(self):
+        """Cached days and hit / miss counters."""
+        with self.lock:
+            return {"days": len(self.days), "size": self.size, "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
+
+
+# one hot-day cache per database, shared by the request handlers of a process
+hot_days = {}
+
+
+def get_hot_days(db):
+    """Return the process-wide hot-day cache."""
+    if db.name not in hot_days:
+        hot_days[db.name] = HotDays(db[COLLECTION])
+    return hot_days[db.name]
+
+
+def forget_upvoted_days(db, upvotes):
+    """Drop the cached leaderboards of the days of newly written upvotes."""
+    get_hot_days(db).forget({upvote.get("upvote_date") for upvote in upvotes if isinstance(upvote.get("upvote_date"), str)})
+
+
+@cached("upvotes")
+def get_top_upvoted_reports_in_range(db, start_date, end_date, limit=DEFAULT_LIMIT):
+    """The most upvoted reports over the days in [start_date, end_date]."""
+    pipeline = [
+        # match the counters of the days in the range
+        {"$match": {"date": {"$gte": start_date, "$lte": end_date}, "count": {"$gt": 0}}},
+        # sum the days per report
+        {"$group": {"_id": "$dr_no", "count": {"$sum": "$count"}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "dr_no": "$_id", "count": 1}},
+    ]
+    return rows(db[COLLECTION].aggregate(pipeline, allowDiskUse=True))
+
+
+# query 6
+def get_top_upvoted_reports(db, start_date, end_date=None, limit=DEFAULT_LIMIT):
+    """The `limit` most upvoted reports of a day, or of a range of days."""
+    start_date = parse_day(start_date)
+    end_date = parse_day(end_date) if end_date else start_date
+    limit = parse_limit(limit)
+    if end_date < start_date:
+        raise ValueError("end_date must not be before start_date.")
+
+    if start_date == end_date:
+        return get_hot_days(db).top(start_date, limit)
+    return get_top_upvoted_reports_in_range(db, start_date, end_date, limit)
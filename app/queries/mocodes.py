@@ -0,0 +1,68 @@
+from datetime import datetime
+from app.queries.crimes import convert_to_datetime, execute_pipeline
+from app.queries.spatial import REPORT_PROJECTION, DEFAULT_LIMIT, MAX_LIMIT
+from data.crimes.lookups import get_lookup_cache
+
+# modus operandi search over the multikey-indexed mocodes array
+
+TOP_CO_OCCURRING = 10
+
+
+def parse_mocodes(codes):
+    """Normalize a list of MO codes to the stored 4-digit strings."""
+    codes = [str(code).strip() for code in codes if str(code).strip()]
+    if not codes or not all(code.isdigit() and len(code) <= 4 for code in codes):
+        raise ValueError("mocodes must be a list of MO codes of up to 4 digits.")
+    return sorted({code.zfill(4) for code in codes})
+
+
+def get_reports_by_mocodes(db, mocodes, match="any", start_date=None, end_date=None, area=None, limit=DEFAULT_LIMIT):
+    """Reports with any / all of the given MO codes, plus the codes most often seen alongside them."""
+    mocodes = parse_mocodes(mocodes)
+    if match not in ("any", "all"):
+        raise ValueError("match must be 'any' or 'all'.")
+    limit = max(1, min(int(limit), MAX_LIMIT))
+
+    query = {"mocodes": {"$in" if match == "any" else "$all": mocodes}}
+    if start_date or end_date:
+        query["date_occurred"] = {}
+        if start_date:
+            query["date_occurred"]["$gte"] = convert_to_datetime(start_date)
+        if end_date:
+            query["date_occurred"]["$lte"] = convert_to_datetime(end_date)
+    if area is not None:
+        query["area.no"] = int(area)
+
+    pipeline = [
+        # match reports by MO code (served by the mocodes index), date range and area
+        {"$match": query},
+        {"$project": {"_id": 0, "mocodes": 1}},
+        {"$facet": {
+            # total number of matching reports
+            "total": [{"$count": "count"}],
+            # the other MO codes of the matching reports, most frequent first
+            "co_occurring": [
+                {"$unwind": "$mocodes"},
+                {"$match": {"mocodes": {"$nin": mocodes}}},
+                {"$group": {"_id": "$mocodes", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": TOP_CO_OCCURRING},
+                {"$project": {"_id": 0, "mocode": "$_id", "count": 1}}
+            ]
+        }}
+    ]
+    summary = execute_pipeline(db, pipeline)[0]
+
+    lookups = get_lookup_cache(db)
+    reports = []
+    for report in db.crime_reports.find(query, dict(REPORT_PROJECTION, mocodes=1)).sort("date_occurred", -1).limit(limit):
+        report = lookups.expand_crime_report(report)
+        if isinstance(report.get("date_occurred"), datetime):
+            report["date_occurred"] = report["date_occurred"].isoformat()
+        reports.append(report)
+
+    return {
+        "total": summary["total"][0]["count"] if summary["total"] else 0,
+        "co_occurring": summary["co_occurring"],
+        "reports": reports,
+    }
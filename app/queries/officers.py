@@ -0,0 +1,39 @@
+from app.cache import cached
+from data.crimes.lookups import get_lookup_cache
+from db.rollups.officers import COLLECTION
+
+# queries 7, 8 and 10 read from the officer_stats collection (see db/rollups/officers.py), whose
+# counter indexes turn the top-50 queries into index scans. the pipelines over all upvotes stay
+# in app/queries/upvotes.py
+
+
+# query 7
+@cached("upvotes")
+def get_top_fifty_active_officers(db):
+    """The 50 officers with the most upvotes."""
+    cursor = db[COLLECTION].find({}, {"_id": 0, "badge_no": 1, "name": 1, "total_upvotes": 1})
+    return list(cursor.sort("total_upvotes", -1).limit(50))
+
+
+# query 8
+@cached("upvotes")
+def get_top_50_officers_by_unique_areas(db):
+    """The 50 officers who upvoted reports in the most distinct areas."""
+    cursor = db[COLLECTION].find({}, {"_id": 0, "badge_no": 1, "name": 1, "distinct_areas": 1})
+    return [
+        {"badge_no": stats["badge_no"], "name": stats.get("name"), "total_unique_areas": stats["distinct_areas"]}
+        for stats in cursor.sort("distinct_areas", -1).limit(50)
+    ]
+
+
+# query 10
+@cached("upvotes")
+def get_areas_for_given_name(db, name):
+    """The areas of the reports upvoted by officers with a given name."""
+    area_nos = set()
+    for stats in db[COLLECTION].find({"name": name}, {"_id": 0, "areas": 1}):
+        area_nos.update(int(area) for area in stats.get("areas") or {})
+
+    # the stats only keep area codes, the names come from the lookup cache
+    lookups = get_lookup_cache(db)
+    return [{"area": {"no": area_no, "name": lookups.describe("areas", area_no)}} for area_no in sorted(area_nos)]
@@ -0,0 +1,114 @@
+from datetime import datetime
+from app.queries.crimes import convert_to_datetime
+from data.crimes.lookups import get_lookup_cache
+
+# spatial lookups over location.coordinates (a GeoJSON Point, indexed with 2dsphere)
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# fields returned for every matching report
+REPORT_PROJECTION = {
+    "_id": 0,
+    "dr_no": 1,
+    # sent back with PUT /crimes/<dr_no> to guard against lost updates
+    "version": 1,
+    "date_occurred": 1,
+    "time_occurred": 1,
+    "area": 1,
+    "crime": 1,
+    "weapon": 1,
+    "location": 1,
+    "status": 1,
+}
+
+
+def build_filters(start_date=None, end_date=None, crime_code=None):
+    """Build the optional date range / crime code part of a spatial query."""
+    filters = {}
+    if start_date or end_date:
+        filters["date_occurred"] = {}
+        if start_date:
+            filters["date_occurred"]["$gte"] = convert_to_datetime(start_date)
+        if end_date:
+            filters["date_occurred"]["$lte"] = convert_to_datetime(end_date)
+    if crime_code is not None:
+        filters["crime.code"] = int(crime_code)
+    return filters
+
+
+def check_point(lat, lon):
+    """Validate a latitude / longitude pair and return it as floats."""
+    lat, lon = float(lat), float(lon)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("Latitude must be within [-90, 90] and longitude within [-180, 180].")
+    return lat, lon
+
+
+def find_reports(db, geo_filter, start_date=None, end_date=None, crime_code=None, limit=DEFAULT_LIMIT):
+    """Run a spatial query and return the matching reports with their descriptions joined in."""
+    query = {"location.coordinates": geo_filter, **build_filters(start_date, end_date, crime_code)}
+    limit = max(1, min(int(limit), MAX_LIMIT))
+
+    lookups = get_lookup_cache(db)
+    reports = []
+    for report in db.crime_reports.find(query, REPORT_PROJECTION).limit(limit):
+        report = lookups.expand_crime_report(report)
+        if isinstance(report.get("date_occurred"), datetime):
+            report["date_occurred"] = report["date_occurred"].isoformat()
+        reports.append(report)
+    return reports
+
+
+def get_crimes_within_radius(db, lat, lon, radius, **filters):
+    """Reports within `radius` meters of a point, nearest first."""
+    lat, lon = check_point(lat, lon)
+    radius = float(radius)
+    if radius <= 0:
+        raise ValueError("radius must be a positive number of meters.")
+
+    geo_filter = {
+        "$nearSphere": {
+            "$geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "$maxDistance": radius
+        }
+    }
+    return find_reports(db, geo_filter, **filters)
+
+
+def get_crimes_within_box(db, min_lat, min_lon, max_lat, max_lon, **filters):
+    """Reports inside a bounding box (edges are geodesic, which is negligible at city scale)."""
+    min_lat, min_lon = check_point(min_lat, min_lon)
+    max_lat, max_lon = check_point(max_lat, max_lon)
+    if min_lat >= max_lat or min_lon >= max_lon:
+        raise ValueError("min_lat / min_lon must be smaller than max_lat / max_lon.")
+
+    ring = [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]]
+    return get_crimes_within_polygon(db, ring, **filters)
+
+
+def check_vertex(point):
+    """Validate a [lon, lat] polygon point and return it as floats, in the same order."""
+    if not isinstance(point, (list, tuple)) or len(point) != 2:
+        raise ValueError("Polygon points must be [lon, lat] pairs.")
+    lon, lat = point
+    try:
+        lat, lon = check_point(lat, lon)
+    except TypeError:
+        raise ValueError("Polygon points must be [lon, lat] pairs of numbers.")
+    return [lon, lat]
+
+
+def get_crimes_within_polygon(db, polygon, **filters):
+    """Reports inside a polygon: a GeoJSON Polygon / MultiPolygon or a single ring of [lon, lat] points."""
+    if isinstance(polygon, list):
+        ring = [check_vertex(point) for point in polygon]
+        if len(ring) < 3:
+            raise ValueError("A polygon needs at least three points.")
+        if ring[0] != ring[-1]:
+            ring.append(ring[0])
+        polygon = {"type": "Polygon", "coordinates": [ring]}
+    elif not isinstance(polygon, dict) or polygon.get("type") not in ("Polygon", "MultiPolygon"):
+        raise ValueError("polygon must be a GeoJSON Polygon / MultiPolygon or a list of [lon, lat] points.")
+
+    return find_reports(db, {"$geoWithin": {"$geometry": polygon}}, **filters)
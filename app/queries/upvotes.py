@@ -1,27 +1,23 @@
 from datetime import datetime
+from app.cache import cached
 
 # function to execute MongoDB aggregation pipeline
 def execute_pipeline(db, pipeline):
     try:
-        result = list(db.upvotes.aggregate(pipeline))
-        print(f"Query result: {result}")
-        return result
+        return list(db.upvotes.aggregate(pipeline))
     except Exception as e:
         print(f"Error: {e}")
         raise e
     
 # query 6
+@cached("upvotes")
 def get_top_fifty_upvoted_reports_for_day(db, specific_date):
-    print("specific_date: ", specific_date)
-    
     # ensure the specific_date is in the correct format
     if isinstance(specific_date, str):
         # validate the date format 
         datetime.strptime(specific_date, '%Y-%m-%d')
     else:
         raise ValueError("specific_date must be a string in 'YYYY-MM-DD' format.")
-        
-    print(f"Querying for top fifty upvoted reports on {specific_date}")
 
     # MongoDB aggregation pipeline
     pipeline = [
@@ -62,6 +58,7 @@ def get_top_fifty_upvoted_reports_for_day(db, specific_date):
     return execute_pipeline(db, pipeline)
 
 # query 7
+@cached("upvotes")
 def get_top_fifty_active_officers(db):
     
     # MongoDB aggregation pipeline
@@ -96,6 +93,7 @@ def get_top_fifty_active_officers(db):
     return execute_pipeline(db, pipeline)
 
 # query 8
+@cached("upvotes")
 def get_top_50_officers_by_unique_areas(db):
 
     # MongoDB aggregation pipeline
@@ -138,6 +136,7 @@ def get_top_50_officers_by_unique_areas(db):
     return execute_pipeline(db, pipeline)
     
 # query 9
+@cached("upvotes")
 def get_reports_with_duplicate_email(db):
     # MongoDB aggregation pipeline
     pipeline = [
@@ -177,6 +176,7 @@ def get_reports_with_duplicate_email(db):
     
     
 # query 10      
+@cached("upvotes")
 def get_areas_for_given_name(db, name):
 
     # MongoDB aggregation pipeline
@@ -0,0 +1,50 @@
+from app.cache import cached
+from app.queries.hours import month_filter
+from data.crimes.lookups import get_lookup_cache
+from db.rollups.base import UNKNOWN
+from db.rollups.weapons import COLLECTION
+
+# query 5 read from the crime_weapons matrix (see db/rollups/weapons.py) instead of unwinding
+# every crime report. the matrix is bucketed per month, so date filters work on whole months,
+# which are echoed with the result. reports without an area do not count as an area
+
+
+# query 5
+@cached("crime_reports")
+def get_weapons_used_for_same_crime_in_multiple_areas(db, min_areas=2, start_date=None, end_date=None, weapons=None):
+    """(crime code, weapon) pairs seen in at least `min_areas` areas, optionally in a month range / for some weapons.
+
+    Returned as {"months": {"start", "end"}, "results": [...]}, the months being the whole months counted.
+    """
+    min_areas = int(min_areas)
+    if min_areas < 1:
+        raise ValueError("min_areas must be at least 1.")
+
+    # cells of reports without an area would add an unknown area to every pair
+    query = {"count": {"$gt": 0}, "area_no": {"$ne": UNKNOWN}}
+    months, covered = month_filter(start_date, end_date)
+    if months:
+        query["month"] = months
+    if weapons:
+        query["weapon_code"] = {"$in": [int(weapon) for weapon in weapons]}
+
+    pipeline = [
+        # match the cells in the month range and weapons
+        {"$match": query},
+        # collect the distinct areas per crime code and weapon
+        {"$group": {"_id": {"crime_code": "$crime_code", "weapon_code": "$weapon_code"}, "areas": {"$addToSet": "$area_no"}}},
+        # keep the pairs seen in enough areas
+        {"$match": {"$expr": {"$gte": [{"$size": "$areas"}, min_areas]}}},
+        {"$sort": {"_id.crime_code": 1, "_id.weapon_code": 1}},
+    ]
+
+    # the matrix only stores codes, the names come from the lookup cache
+    lookups = get_lookup_cache(db)
+    result = []
+    for row in db[COLLECTION].aggregate(pipeline, allowDiskUse=True):
+        result.append({
+            "crime_code": row["_id"]["crime_code"],
+            "weapon": lookups.describe("weapons", row["_id"]["weapon_code"]),
+            "areas": sorted(lookups.describe("areas", area_no) or str(area_no) for area_no in row["areas"]),
+        })
+    return {"months": covered, "results": result}
@@ -1,23 +1,40 @@
-from flask import Blueprint, jsonify, request
-from data.crimes.validation import (
-    validate_new_crime_data,
-    validate_partial_crime_data
-)
+from flask import Blueprint, current_app, jsonify, request
+from pymongo.errors import DuplicateKeyError
 from data.crimes.process import process_crime_data
-from app.queries.crimes import (
+from data.crimes.update import UpdateError, update_crime_report, update_crime_reports
+from data.crimes.lookups import compact_crime_report, extract_lookups, get_lookup_cache
+# queries 1-4 are answered from the crime_daily_counts rollup
+from app.queries.daily import (
     get_reports_per_crime_code,
     get_reports_per_day_for_crime_code,
     get_top_three_crimes_per_area_for_day,
-    get_two_least_common_crimes_per_day,
-    get_weapons_used_for_same_crime_in_multiple_areas
+    get_two_least_common_crimes_per_day
+)
+# query 5 is answered from the crime_weapons matrix
+from app.queries.weapons import get_weapons_used_for_same_crime_in_multiple_areas
+from app.queries.spatial import (
+    get_crimes_within_radius,
+    get_crimes_within_box,
+    get_crimes_within_polygon
 )
-from app.queries.upvotes import (
-    get_top_fifty_upvoted_reports_for_day,
+from app.queries.heatmap import get_heatmap
+from app.queries.hours import get_crimes_per_hour_of_week
+from app.queries.mocodes import get_reports_by_mocodes
+# query 9 is answered from the officer_emails mapping
+from app.queries.emails import get_duplicate_emails, get_reports_for_email
+# query 6 is answered from the upvote_leaderboard counters
+from app.queries.leaderboard import forget_upvoted_days, get_hot_days, get_top_upvoted_reports, parse_day
+# queries 7, 8 and 10 are answered from the officer_stats collection
+from app.queries.officers import (
     get_top_fifty_active_officers,
     get_top_50_officers_by_unique_areas,
-    get_reports_with_duplicate_email,
     get_areas_for_given_name
 )
+from db.rollups import apply_reports, apply_upvotes
+from app.existence import get_existence_cache, officer_exists, report_exists
+from app.bulk import insert_crimes, insert_upvotes, parse_ndjson, summarize
+from app.write_behind import get_write_behind
+from app.cache import invalidate, result_cache
 from data.upvotes.validation import (
     validate_upvote_data, 
     validate_officer_data, 
@@ -26,6 +43,22 @@ from data.upvotes.validation import (
 
 crime_routes = Blueprint('crime_routes', __name__)
 
+def spatial_filters(params):
+    """Read the optional filters shared by the spatial routes."""
+    return {
+        "start_date": params.get("start_date"),
+        "end_date": params.get("end_date"),
+        "crime_code": params.get("crime_code"),
+        "limit": params.get("limit", 100),
+    }
+
+def bulk_items():
+    """Read a bulk request body: a JSON array, or NDJSON read line by line from the stream."""
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        return parse_ndjson(line.decode("utf-8", "replace") for line in request.stream)
+    items = request.get_json(silent=True)
+    return items if isinstance(items, list) else None
+
 @crime_routes.route("/test", methods=["GET"])
 def test_route():
     return jsonify({"message": "Test route works!"}), 200
@@ -35,42 +68,205 @@ def test_route():
 def insert_crime():
     new_crime = request.json
     
-    # validate the incoming crime data
-    validation_error, status_code = validate_new_crime_data(new_crime)
-    if validation_error:
-        return jsonify(validation_error), status_code
-    
-    # process the crime data
+    # validate and process the crime data
     crime_report, error, status_code = process_crime_data(new_crime)
     if error:
         return jsonify(error), status_code
     
     try:
+        # keep the lookup collections complete, and drop the descriptions when storing compact reports
+        get_lookup_cache(crime_routes.mongo.db).remember(extract_lookups(crime_report))
+        if current_app.config.get("CRIME_SCHEMA") == "compact":
+            crime_report = compact_crime_report(crime_report)
+
         crime_routes.mongo.db.crime_reports.insert_one(crime_report)
+        get_existence_cache(crime_routes.mongo.db, "crime_reports", "dr_no").add(crime_report["dr_no"])
+        # count the new report into the rollup collections
+        apply_reports(crime_routes.mongo.db, [crime_report])
+        invalidate(crime_routes.mongo.db, "crime_reports")
         return jsonify({"message": "Crime report added successfully!"}), 201
+    except DuplicateKeyError:
+        # the unique dr_no index rejects a report that was already posted
+        return jsonify({"error": f"Crime report with DR_NO {crime_report['dr_no']} already exists."}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 
-# update a crime
+# post many crimes at once, as a JSON array or NDJSON (Content-Type: application/x-ndjson)
+@crime_routes.route("/crimes/bulk", methods=["POST"])
+def insert_crimes_bulk():
+    items = bulk_items()
+    if items is None:
+        return jsonify({"error": "Send a JSON array or NDJSON (application/x-ndjson) of crime records."}), 400
+
+    try:
+        compact = current_app.config.get("CRIME_SCHEMA") == "compact"
+        results = insert_crimes(crime_routes.mongo.db, items, compact=compact)
+        invalidate(crime_routes.mongo.db, "crime_reports")
+        return jsonify(summarize(results)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# update a crime: flat fields as in POST /crimes, plus the "version" read earlier to guard against lost updates
 @crime_routes.route("/crimes/<dr_no>", methods=["PUT"])
 def update_crime(dr_no):
     updated_fields = request.json
-    
-    # check if the crime report exists
-    existing_crime = crime_routes.mongo.db.crime_reports.find_one({"dr_no": dr_no})
-    if not existing_crime:
+
+    # unknown dr_no values are rejected by the existence filter without a query
+    if not get_existence_cache(crime_routes.mongo.db, "crime_reports", "dr_no").might_exist(dr_no):
         return jsonify({"error": f"Crime report with DR_NO {dr_no} not found."}), 404
 
-    # validate only the fields that are being updated
-    validation_error, status_code = validate_partial_crime_data(updated_fields, existing_crime)
-    if validation_error:
-        return jsonify(validation_error), status_code
+    try:
+        compact = current_app.config.get("CRIME_SCHEMA") == "compact"
+        changed = update_crime_report(crime_routes.mongo.db, dr_no, updated_fields, compact=compact)
+        invalidate(crime_routes.mongo.db, "crime_reports")
+        return jsonify(changed), 200
+    except UpdateError as e:
+        return jsonify(e.error), e.status_code
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# update many crimes: [{"dr_no": ..., "version": ..., <flat fields>}, ...]
+@crime_routes.route("/crimes", methods=["PATCH"])
+def update_crimes():
+    updates = request.get_json(silent=True)
+    if not isinstance(updates, list):
+        return jsonify({"error": "Send a JSON array of updates, each with a dr_no."}), 400
 
     try:
-        # update only the fields provided in the request
-        crime_routes.mongo.db.crime_reports.update_one({"dr_no": dr_no}, {"$set": updated_fields})
-        return jsonify({"message": f"Crime report with DR_NO {dr_no} updated successfully!"}), 200
+        compact = current_app.config.get("CRIME_SCHEMA") == "compact"
+        results = update_crime_reports(crime_routes.mongo.db, updates, compact=compact)
+        if any(result["status"] == "updated" for result in results):
+            invalidate(crime_routes.mongo.db, "crime_reports")
+        return jsonify({"results": results}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# crimes within a radius (meters) of a point, nearest first
+@crime_routes.route("/crimes/within-radius", methods=["GET"])
+def crimes_within_radius():
+    lat = request.args.get("lat")
+    lon = request.args.get("lon")
+    radius = request.args.get("radius")
+
+    if not lat or not lon or not radius:
+        return jsonify({"error": "lat, lon, and radius are required."}), 400
+
+    try:
+        result = get_crimes_within_radius(crime_routes.mongo.db, lat, lon, radius, **spatial_filters(request.args))
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# crimes within a bounding box
+@crime_routes.route("/crimes/within-box", methods=["GET"])
+def crimes_within_box():
+    bounds = [request.args.get(key) for key in ("min_lat", "min_lon", "max_lat", "max_lon")]
+
+    if not all(bounds):
+        return jsonify({"error": "min_lat, min_lon, max_lat, and max_lon are required."}), 400
+
+    try:
+        result = get_crimes_within_box(crime_routes.mongo.db, *bounds, **spatial_filters(request.args))
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# crimes within an area polygon, sent as JSON: {"polygon": <GeoJSON Polygon or [[lon, lat], ...]>, ...filters}
+@crime_routes.route("/crimes/within-polygon", methods=["POST"])
+def crimes_within_polygon():
+    body = request.json or {}
+    polygon = body.get("polygon")
+
+    if not polygon:
+        return jsonify({"error": "polygon is required."}), 400
+
+    try:
+        result = get_crimes_within_polygon(crime_routes.mongo.db, polygon, **spatial_filters(body))
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# crime counts per geohash tile for a map viewport
+@crime_routes.route("/crimes/heatmap", methods=["GET"])
+def crimes_heatmap():
+    bounds = [request.args.get(key) for key in ("min_lat", "min_lon", "max_lat", "max_lon")]
+    zoom = request.args.get("zoom")
+    crime_code = request.args.get("crime_code")
+
+    if not all(bounds) or not zoom:
+        return jsonify({"error": "min_lat, min_lon, max_lat, max_lon, and zoom are required."}), 400
+    if not zoom.isdigit() or (crime_code and not crime_code.isdigit()):
+        return jsonify({"error": "zoom and crime_code must be numbers."}), 400
+
+    try:
+        result = get_heatmap(
+            crime_routes.mongo.db, *bounds, zoom,
+            start_date=request.args.get("start_date"),
+            end_date=request.args.get("end_date"),
+            crime_code=crime_code
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# crime counts by hour of day / weekday / area / crime code, e.g. ?group_by=weekday,hour&area=1
+# dates are widened to whole months, the response echoes the months counted
+@crime_routes.route("/crimes/hour-of-week", methods=["GET"])
+def crimes_per_hour_of_week():
+    area = request.args.get("area")
+    crime_code = request.args.get("crime_code")
+    group_by = request.args.get("group_by")
+
+    if (area and not area.isdigit()) or (crime_code and not crime_code.isdigit()):
+        return jsonify({"error": "area and crime_code must be numbers."}), 400
+
+    try:
+        result = get_crimes_per_hour_of_week(
+            crime_routes.mongo.db,
+            start_date=request.args.get("start_date"),
+            end_date=request.args.get("end_date"),
+            area=area,
+            crime_code=crime_code,
+            group_by=group_by.split(",") if group_by else None
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# crimes by modus operandi, e.g. ?mocodes=0344,1822&match=all
+@crime_routes.route("/crimes/mocodes", methods=["GET"])
+def crimes_by_mocodes():
+    mocodes = request.args.get("mocodes")
+    area = request.args.get("area")
+
+    if not mocodes:
+        return jsonify({"error": "mocodes is required."}), 400
+    if area and not area.isdigit():
+        return jsonify({"error": "area must be a number."}), 400
+
+    try:
+        result = get_reports_by_mocodes(
+            crime_routes.mongo.db, mocodes.split(","),
+            match=request.args.get("match", "any"),
+            start_date=request.args.get("start_date"),
+            end_date=request.args.get("end_date"),
+            area=area,
+            limit=request.args.get("limit", 100)
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -101,6 +297,8 @@ def reports_per_day_for_crime_code():
 
     if not crime_code or not start_date or not end_date:
         return jsonify({"error": "crime_code, start_date, and end_date are required."}), 400
+    if not crime_code.isdigit():
+        return jsonify({"error": "crime_code must be a number."}), 400
 
     try:
         # call the query function
@@ -144,29 +342,53 @@ def two_least_common_crimes_in_time_range():
         return jsonify({"error": str(e)}), 500
     
 # query 5
+# optional filters: min_areas (default 2), start_date / end_date (whole months, echoed as "months"), weapons=<code>,<code>
 @crime_routes.route("/weapons-used-for-same-crime-in-multiple-areas", methods=["GET"])
 def weapons_used_for_same_crime_in_multiple_areas():
+    min_areas = request.args.get("min_areas", "2")
+    weapons = request.args.get("weapons")
+
+    if not min_areas.isdigit():
+        return jsonify({"error": "min_areas must be a number."}), 400
+    if weapons and not all(weapon.strip().isdigit() for weapon in weapons.split(",")):
+        return jsonify({"error": "weapons must be a comma-separated list of weapon codes."}), 400
+
     try:
         # call the query function
-        result = get_weapons_used_for_same_crime_in_multiple_areas(crime_routes.mongo.db)
+        result = get_weapons_used_for_same_crime_in_multiple_areas(
+            crime_routes.mongo.db,
+            min_areas=min_areas,
+            start_date=request.args.get("start_date"),
+            end_date=request.args.get("end_date"),
+            weapons=weapons.split(",") if weapons else None
+        )
         return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
  # query 6   
+# a single day (specific_date) or a range (start_date / end_date), top `limit` reports (default 50)
 @crime_routes.route("/top-fifty-upvoted-reports-for-day", methods=["GET"])
 def top_fifty_upvoted_reports_for_day():
-    # extract specific date from query parameters
-    specific_date = request.args.get("specific_date")
+    # extract the day or the date range from query parameters
+    start_date = request.args.get("specific_date") or request.args.get("start_date")
+    end_date = request.args.get("end_date")
+    limit = request.args.get("limit", "50")
 
-    if not specific_date:
-        return jsonify({"error": "specific_date is required."}), 400
+    if not start_date:
+        return jsonify({"error": "specific_date (or start_date and end_date) is required."}), 400
+    if not limit.isdigit():
+        return jsonify({"error": "limit must be a number."}), 400
 
     try:
         # call the query function
-        result = get_top_fifty_upvoted_reports_for_day(crime_routes.mongo.db, specific_date)
+        result = get_top_upvoted_reports(crime_routes.mongo.db, start_date, end_date, limit=limit)
         return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -194,13 +416,42 @@ def top_fifty_officers_by_areas():
         return jsonify({"error": str(e)}), 500
     
 # query 9
+# paged by email: ?after=<"next" of the previous page>&limit=100
 @crime_routes.route("/reports-with-duplicate-email", methods=["GET"])
 def reports_with_duplicate_email():
+    limit = request.args.get("limit", "100")
+
+    if not limit.isdigit():
+        return jsonify({"error": "limit must be a number."}), 400
+
+    try:
+        # call the query function
+        result = get_duplicate_emails(crime_routes.mongo.db, after=request.args.get("after"), limit=limit)
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# reports upvoted by the officers of one email, paged by dr_no: ?email=...&after=<dr_no>&limit=100
+@crime_routes.route("/reports-with-duplicate-email/reports", methods=["GET"])
+def reports_for_duplicate_email():
+    email = request.args.get("email")
+    limit = request.args.get("limit", "100")
+
+    if not email:
+        return jsonify({"error": "email is required."}), 400
+    if not limit.isdigit():
+        return jsonify({"error": "limit must be a number."}), 400
 
     try:
         # call the query function
-        result = get_reports_with_duplicate_email(crime_routes.mongo.db)
+        result = get_reports_for_email(crime_routes.mongo.db, email, after=request.args.get("after"), limit=limit)
+        if result is None:
+            return jsonify({"error": f"No officer is registered with the email {email}."}), 404
         return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -241,27 +492,87 @@ def create_upvote():
     if not is_valid:
         return jsonify({"error": error_message}), 400
 
-    # check if the officer exists
-    officer = crime_routes.mongo.db.police_officers.find_one({"badge_no": upvote_data["officer"]["badge_no"]})
-    if not officer:
-        return jsonify({"error": f"Officer with badge_no {upvote_data['officer']['badge_no']} not found."}), 404
+    # the leaderboards are keyed on the exact "YYYY-MM-DD" string
+    try:
+        parse_day(upvote_data["upvote_date"])
+    except ValueError as e:
+        return jsonify({"error": f"upvote_date: {e}"}), 400
 
-    # check if the report exists
-    report = crime_routes.mongo.db.crime_reports.find_one({"dr_no": upvote_data["report"]["dr_no"]})
-    if not report:
+    # check that the officer and the report exist (cached, or one indexed lookup each)
+    if not officer_exists(crime_routes.mongo.db, upvote_data["officer"]["badge_no"]):
+        return jsonify({"error": f"Officer with badge_no {upvote_data['officer']['badge_no']} not found."}), 404
+    if not report_exists(crime_routes.mongo.db, upvote_data["report"]["dr_no"]):
         return jsonify({"error": f"Report with DR_NO {upvote_data['report']['dr_no']} not found."}), 404
 
-    # check if the upvote already exists
-    existing_upvote = crime_routes.mongo.db.upvotes.find_one({
-        "officer.badge_no": upvote_data["officer"]["badge_no"],
-        "report.dr_no": upvote_data["report"]["dr_no"]
-    })
-    if existing_upvote:
-        return jsonify({"error": "Upvote already exists for this officer and report."}), 409
+    # write-behind: queue the upvote for the background flusher, or ask the client to back off
+    if current_app.config.get("UPVOTE_WRITE_MODE") == "write-behind":
+        if not get_write_behind(crime_routes.mongo.db, current_app.config, current_app.logger).submit(upvote_data):
+            return jsonify({"error": "Too many upvotes queued, retry shortly."}), 503, {"Retry-After": "1"}
+        return jsonify({"message": "Upvote accepted."}), 202
 
     try:
-        # insert the new upvote record
+        # the unique (officer.badge_no, report.dr_no) index rejects repeated upvotes
         crime_routes.mongo.db.upvotes.insert_one(upvote_data)
+        try:
+            # count the upvote into the officer stats and the leaderboard of its day. these are
+            # separate writes: if they fail the upvote stays stored (a retry would get 409) and
+            # the stats are repaired with `python -m db.rollups.officers --repair`
+            apply_upvotes(crime_routes.mongo.db, [upvote_data])
+        except Exception as e:
+            current_app.logger.error(f"Upvote stored, but the upvote rollups were not updated: {e}")
+        forget_upvoted_days(crime_routes.mongo.db, [upvote_data])
+        invalidate(crime_routes.mongo.db, "upvotes")
         return jsonify({"message": "Upvote created successfully!"}), 201
+    except DuplicateKeyError:
+        return jsonify({"error": "Upvote already exists for this officer and report."}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# queue depth and flush latency of the upvote write-behind buffer
+@crime_routes.route("/metrics/write-behind", methods=["GET"])
+def write_behind_metrics():
+    if current_app.config.get("UPVOTE_WRITE_MODE") != "write-behind":
+        return jsonify({"enabled": False}), 200
+
+    try:
+        metrics = get_write_behind(crime_routes.mongo.db, current_app.config, current_app.logger).metrics()
+        return jsonify({"enabled": True, **metrics}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# memory use, false positive rate and hit counters of the dr_no / badge_no existence filters, and
+# whether their misses are authoritative (they are not without a change stream, see app/existence.py)
+@crime_routes.route("/metrics/existence", methods=["GET"])
+def existence_metrics():
+    try:
+        db = crime_routes.mongo.db
+        result = {
+            "crime_reports": get_existence_cache(db, "crime_reports", "dr_no").stats(),
+            "police_officers": get_existence_cache(db, "police_officers", "badge_no").stats(),
+        }
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# hit rate, size and eviction counters of the analytics result cache and the hot leaderboard days
+@crime_routes.route("/metrics/cache", methods=["GET"])
+def cache_metrics():
+    try:
+        return jsonify({**result_cache.info(), "leaderboard_days": get_hot_days(crime_routes.mongo.db).stats()}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# post many upvotes at once, as a JSON array or NDJSON (Content-Type: application/x-ndjson)
+@crime_routes.route("/upvotes/bulk", methods=["POST"])
+def create_upvotes_bulk():
+    items = bulk_items()
+    if items is None:
+        return jsonify({"error": "Send a JSON array or NDJSON (application/x-ndjson) of upvotes."}), 400
+
+    try:
+        results = insert_upvotes(crime_routes.mongo.db, items, logger=current_app.logger)
+        invalidate(crime_routes.mongo.db, "upvotes")
+        return jsonify(summarize(results)), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,216 @@
+import atexit
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+from pymongo import InsertOne, WriteConcern
+from pymongo.errors import BulkWriteError
+from app.cache import invalidate
+from db.rollups import apply_upvotes
+from app.queries.leaderboard import forget_upvoted_days
+
+# optional write-behind mode for POST /upvotes (UPVOTE_WRITE_MODE=write-behind): validated
+# upvotes are queued in-process and a background thread inserts them in unordered batches
+# when BATCH_SIZE are waiting or FLUSH_INTERVAL has passed. a full queue is reported to the
+# caller (503 + Retry-After) instead of growing without bound, and the queue is flushed at
+# exit and on SIGTERM (install_shutdown_handler, the way gunicorn and container runtimes stop
+# the app). queued upvotes are lost if the process is killed, and repeated upvotes are only dropped
+# at flush time (by the unique index), so the API answers 202 instead of 201 / 409.
+# with UPVOTE_WRITE_CONCERN=0 the server never reports which upvotes it rejected, so those
+# flushes are not counted into the upvote rollups; rebuild them (db.rollups.officers /
+# db.rollups.leaderboard) after running in that mode
+
+QUEUE_SIZE = 50000
+BATCH_SIZE = 1000
+FLUSH_INTERVAL = 0.2  # seconds
+DUPLICATE_KEY = 11000
+
+
+class WriteBehindBuffer:
+    """Queue of documents inserted into a collection in batches by a background thread."""
+
+    def __init__(self, collection, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 write_concern=None, logger=None):
+        self.collection = collection.with_options(write_concern=write_concern) if write_concern else collection
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.logger = logger or logging.getLogger(__name__)
+        self.stats = {
+            "enqueued": 0, "rejected": 0, "written": 0, "unacknowledged": 0, "duplicates": 0, "failed": 0,
+            "flushes": 0, "last_flush_ms": 0.0, "max_flush_ms": 0.0, "total_flush_ms": 0.0,
+        }
+        self.acknowledged = self.collection.write_concern.acknowledged
+        if not self.acknowledged:
+            self.logger.warning("Write-behind upvotes are unacknowledged (w=0): officer_stats and upvote_leaderboard are not updated, rebuild them afterwards.")
+        self.thread = threading.Thread(target=self.run, name="upvotes-write-behind", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def submit(self, document):
+        """Queue a document; return False when the queue is full and the caller should back off."""
+        try:
+            self.queue.put_nowait(document)
+        except queue.Full:
+            with self.lock:
+                self.stats["rejected"] += 1
+            return False
+        with self.lock:
+            self.stats["enqueued"] += 1
+        return True
+
+    def take_batch(self):
+        """Wait for the first document, then collect more until the batch is full or the interval passes."""
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self, batch):
+        """Insert one batch unordered and update the counters."""
+        started = time.perf_counter()
+        written, duplicates, failed, unacknowledged = batch, 0, 0, 0
+        try:
+            self.collection.bulk_write([InsertOne(document) for document in batch], ordered=False)
+        except BulkWriteError as e:
+            errors = e.details["writeErrors"]
+            duplicates = sum(1 for error in errors if error["code"] == DUPLICATE_KEY)
+            failed = len(errors) - duplicates
+            rejected = {error["index"] for error in errors}
+            written = [document for index, document in enumerate(batch) if index not in rejected]
+        except Exception as e:
+            self.logger.error(f"Write-behind flush of {len(batch)} upvotes failed: {e}")
+            written, failed = [], len(batch)
+        if written and not self.acknowledged:
+            # duplicates rejected by the unique index are not reported, so nothing can be counted
+            written, unacknowledged = [], len(written)
+            forget_upvoted_days(self.collection.database, batch)
+            invalidate(self.collection.database, self.collection.name)
+        if written:
+            try:
+                # count what was actually inserted into the officer stats and leaderboards
+                apply_upvotes(self.collection.database, written)
+            except Exception as e:
+                self.logger.error(f"Could not update the upvote rollups after a write-behind flush: {e}")
+            forget_upvoted_days(self.collection.database, written)
+            invalidate(self.collection.database, self.collection.name)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        with self.lock:
+            self.stats["written"] += len(written)
+            self.stats["unacknowledged"] += unacknowledged
+            self.stats["duplicates"] += duplicates
+            self.stats["failed"] += failed
+            self.stats["flushes"] += 1
+            self.stats["last_flush_ms"] = elapsed
+            self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], elapsed)
+            self.stats["total_flush_ms"] += elapsed
+
+    def run(self):
+        """Flusher thread: write batches until close() is called."""
+        while not self.stopping.is_set():
+            batch = self.take_batch()
+            if batch:
+                self.flush(batch)
+
+    def close(self):
+        """Stop the flusher and write whatever is still queued."""
+        if self.stopping.is_set():
+            return
+        self.stopping.set()
+        self.thread.join()
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self.flush(batch)
+
+    def metrics(self):
+        """Queue depth and flush counters / latency."""
+        with self.lock:
+            stats = dict(self.stats)
+        total_flush_ms = stats.pop("total_flush_ms")
+        return {
+            **stats,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "avg_flush_ms": total_flush_ms / stats["flushes"] if stats["flushes"] else 0.0,
+        }
+
+
+def write_concern_from(config):
+    """Build the write concern of the flusher from UPVOTE_WRITE_CONCERN / UPVOTE_JOURNAL."""
+    w = config.get("UPVOTE_WRITE_CONCERN")
+    if not w:
+        return None
+    w = int(w) if str(w).isdigit() else w
+    if w == 0 and config.get("UPVOTE_JOURNAL"):
+        raise ValueError("UPVOTE_JOURNAL=1 needs acknowledged writes, it cannot be combined with UPVOTE_WRITE_CONCERN=0.")
+    return WriteConcern(w=w, j=config.get("UPVOTE_JOURNAL") or None)
+
+
+# one buffer per database, shared by the request handlers of a process
+buffers = {}
+buffers_lock = threading.Lock()
+
+
+def get_write_behind(db, config, logger=None):
+    """Return the process-wide upvote buffer, started on first use."""
+    with buffers_lock:
+        if db.name not in buffers:
+            buffers[db.name] = WriteBehindBuffer(
+                db.upvotes,
+                queue_size=int(config.get("UPVOTE_QUEUE_SIZE", QUEUE_SIZE)),
+                batch_size=int(config.get("UPVOTE_BATCH_SIZE", BATCH_SIZE)),
+                flush_interval=float(config.get("UPVOTE_FLUSH_INTERVAL", FLUSH_INTERVAL)),
+                write_concern=write_concern_from(config),
+                logger=logger,
+            )
+        return buffers[db.name]
+
+
+def close_buffers():
+    """Flush and stop every upvote buffer of this process."""
+    with buffers_lock:
+        started = list(buffers.values())
+    for buffer in started:
+        buffer.close()
+
+
+def install_shutdown_handler():
+    """Flush the queued upvotes on SIGTERM before handing the signal to the previous handler.
+
+    atexit does not run when the process is terminated by a signal, so without this the queued
+    (already acknowledged with 202) upvotes would be lost. Must be called from the main thread.
+    """
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handler(signum, frame):
+        close_buffers()
+        if callable(previous):
+            previous(signum, frame)
+        elif previous != signal.SIG_IGN:
+            # default action: terminate the process the way the signal would have
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+
+    signal.signal(signal.SIGTERM, handler)
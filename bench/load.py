@@ -0,0 +1,82 @@
+import argparse
+import contextlib
+import os
+import time
+from pymongo import MongoClient
+from data.crimes.post import load_records
+from data.crimes.process import process_crime_data
+from data.crimes.soda_stub import generate_rows
+
+# compares the original row-at-a-time loader with the process pool + bulk_write loader
+#
+#   python -m bench.load --rows 100000
+#
+# runs against a scratch database (la_crime_bench) that is dropped afterwards
+
+
+def make_records(rows):
+    """Generate raw records, with a few invalid ones sprinkled in."""
+    records = generate_rows(rows)
+    for record in records[::50]:
+        record["vict_sex"] = "Q"
+    return records
+
+
+def load_row_by_row(records, collection):
+    """The original loader: one process_crime_data, insert_one and print per record."""
+    for crime in records:
+        processed_crime, error, status_code = process_crime_data(crime)
+        if error:
+            dr_no = crime.get("dr_no", "Unknown DR_NO")
+            print(f"Skipping record with DR_NO: {dr_no} due to validation error: {error}")
+            continue
+        try:
+            collection.insert_one(processed_crime)
+            print(f"Inserted crime report with DR_NO: {processed_crime['dr_no']}")
+        except Exception as e:
+            print(f"Failed to insert crime report: {e}")
+
+
+def quietly(func, *args):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        func(*args)
+
+
+def timed(label, rows, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<24} {rows} rows in {elapsed:7.2f}s  {rows / elapsed:10.0f} rows/sec")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the crime_reports loaders.")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_bench']
+    records = make_records(args.rows)
+
+    try:
+        db.crime_reports.drop()
+        # per-row prints go to /dev/null so the terminal does not dominate the measurement
+        before = timed("insert_one per row", args.rows, lambda: quietly(load_row_by_row, records, db.crime_reports))
+
+        db.crime_reports.drop()
+        after = timed("pool + bulk_write", args.rows, lambda: load_records(
+            records, db.crime_reports,
+            batch_size=args.batch_size, chunk_size=args.chunk_size, workers=args.workers,
+        ))
+
+        print(f"speedup: {before / after:.1f}x")
+    finally:
+        client.drop_database('la_crime_bench')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import statistics
+import time
+from pymongo import InsertOne, MongoClient
+from app.queries.crimes import get_top_three_crimes_per_area_for_day, get_weapons_used_for_same_crime_in_multiple_areas
+from data.crimes.lookups import LOOKUP_COLLECTIONS, compact_crime_report, extract_lookups, get_lookup_cache, save_lookups
+from data.crimes.process import process_crime_data
+from data.crimes.soda_stub import generate_rows
+
+# compares the full and the compact crime report layouts: storage size and query latency
+#
+#   python -m bench.schema --rows 200000
+#
+# each layout is loaded into its own scratch database (la_crime_bench_full / _compact)
+
+
+def make_reports(rows):
+    """Generate processed crime reports spread over a week, plus their lookup pairs."""
+    lookups = {collection: {} for collection in LOOKUP_COLLECTIONS}
+    reports = []
+    for i, record in enumerate(generate_rows(rows)):
+        record["date_occ"] = f"2020-01-{1 + i % 7:02d}T00:00:00.000"
+        if i % 3 == 0:
+            record["weapon_used_cd"], record["weapon_desc"] = "400", "STRONG-ARM (HANDS, FIST, FEET OR BODILY FORCE)"
+        report, _, _ = process_crime_data(record)
+        extract_lookups(report, lookups)
+        reports.append(report)
+    return reports, lookups
+
+
+def load(db, reports, lookups, compact):
+    db.crime_reports.drop()
+    for start in range(0, len(reports), 1000):
+        batch = reports[start:start + 1000]
+        if compact:
+            batch = [compact_crime_report(report) for report in batch]
+        db.crime_reports.bulk_write([InsertOne(dict(report)) for report in batch], ordered=False)
+    db.crime_reports.create_index([("date_occurred", 1), ("area.no", 1), ("crime.code", 1)])
+    db.crime_reports.create_index([("crime.code", 1), ("weapon.code", 1), ("area.no", 1)])
+    save_lookups(db, lookups)
+
+
+def latency(func, repeat):
+    """Median wall time of `repeat` calls, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def measure(db, repeat):
+    stats = db.command("collStats", "crime_reports")
+    lookups = get_lookup_cache(db)
+    return {
+        "avg document (bytes)": stats["avgObjSize"],
+        "data size (MB)": stats["size"] / 2 ** 20,
+        "storage size (MB)": stats["storageSize"] / 2 ** 20,
+        "index size (MB)": stats["totalIndexSize"] / 2 ** 20,
+        # bypass the result cache, every call has to run the pipeline against the layout
+        "query 3 (ms)": latency(lambda: get_top_three_crimes_per_area_for_day.uncached(db, "2020-01-03"), repeat),
+        "query 5 (ms)": latency(lambda: get_weapons_used_for_same_crime_in_multiple_areas.uncached(db), repeat),
+        "fetch + expand 1000 (ms)": latency(
+            lambda: [lookups.expand_crime_report(report) for report in db.crime_reports.find().limit(1000)], repeat
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the full and compact crime report layouts.")
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    client = MongoClient('mongodb://localhost:27017/')
+    reports, lookups = make_reports(args.rows)
+
+    results = {}
+    try:
+        for layout in ("full", "compact"):
+            db = client[f'la_crime_bench_{layout}']
+            load(db, reports, lookups, compact=layout == "compact")
+            results[layout] = measure(db, args.repeat)
+    finally:
+        for layout in ("full", "compact"):
+            client.drop_database(f'la_crime_bench_{layout}')
+
+    print(f"{'':<26}{'full':>12}{'compact':>12}")
+    for metric in results["full"]:
+        print(f"{metric:<26}{results['full'][metric]:>12.1f}{results['compact'][metric]:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import random
+import statistics
+import time
+from types import SimpleNamespace
+from flask import Flask, jsonify, request
+from pymongo import MongoClient
+from app import routes
+from app.existence import caches
+from app.routes import crime_routes
+from data.upvotes.validation import validate_officer_data, validate_report_data, validate_upvote_data
+from db.indexes import create_unique_indexes
+from db.rollups import create_rollup_indexes
+
+# latency of POST /upvotes: the original four round trip handler against the current one
+# (cached existence checks + unique index duplicate detection). the current handler also
+# updates officer_stats and upvote_leaderboard (one bulk_write each), so it is measured once
+# with those rollup writes switched off (the insert alone) and once as it runs in the app
+#
+#   python -m bench.upvotes --requests 5000
+#
+# runs against a scratch database (la_crime_bench) that is dropped afterwards
+
+
+def create_upvote_original():
+    """The original handler: find_one officer, find_one report, find_one upvote, insert_one."""
+    db = crime_routes.mongo.db
+    upvote_data = request.json
+
+    for validate, data in ((validate_upvote_data, upvote_data), (validate_officer_data, upvote_data["officer"]), (validate_report_data, upvote_data["report"])):
+        is_valid, error_message = validate(data)
+        if not is_valid:
+            return jsonify({"error": error_message}), 400
+
+    if not db.police_officers.find_one({"badge_no": upvote_data["officer"]["badge_no"]}):
+        return jsonify({"error": "Officer not found."}), 404
+    if not db.crime_reports.find_one({"dr_no": upvote_data["report"]["dr_no"]}):
+        return jsonify({"error": "Report not found."}), 404
+    if db.upvotes.find_one({"officer.badge_no": upvote_data["officer"]["badge_no"], "report.dr_no": upvote_data["report"]["dr_no"]}):
+        return jsonify({"error": "Upvote already exists for this officer and report."}), 409
+
+    db.upvotes.insert_one(upvote_data)
+    return jsonify({"message": "Upvote created successfully!"}), 201
+
+
+def seed(db, officers, reports):
+    """Load officers and reports into the scratch database."""
+    db.police_officers.insert_many([{"badge_no": n, "name": f"Officer {n}", "email": f"officer{n}@lapd.example"} for n in range(1, officers + 1)])
+    db.crime_reports.insert_many([{"dr_no": str(100000000 + n), "area": {"no": n % 21 + 1}} for n in range(reports)])
+
+
+def make_upvotes(count, officers, reports, rng):
+    """Distinct upvotes, about one in ten of them repeated to exercise the 409 path."""
+    pairs = set()
+    while len(pairs) < count:
+        pairs.add((rng.randint(1, officers), rng.randrange(reports)))
+    pairs = list(pairs)
+    pairs += rng.sample(pairs, count // 10)
+    rng.shuffle(pairs)
+    return [
+        {
+            "officer": {"badge_no": badge_no, "name": f"Officer {badge_no}", "email": f"officer{badge_no}@lapd.example"},
+            "report": {"dr_no": str(100000000 + report), "area": {"no": report % 21 + 1}},
+            "upvote_date": "2024-05-01"
+        }
+        for badge_no, report in pairs
+    ]
+
+
+def measure(client, path, upvotes):
+    """POST every upvote and return the per-request latencies in milliseconds and status counts."""
+    latencies, statuses = [], {}
+    for upvote in upvotes:
+        started = time.perf_counter()
+        response = client.post(path, json=upvote)
+        latencies.append((time.perf_counter() - started) * 1000)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return latencies, statuses
+
+
+def report(label, latencies, statuses):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{label:<22} p50 {statistics.median(latencies):6.2f} ms  p95 {p95:6.2f} ms  "
+        f"{len(latencies) / (sum(latencies) / 1000):8.0f} req/s  {statuses}"
+    )
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the POST /upvotes handler.")
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--officers', type=int, default=1000)
+    parser.add_argument('--reports', type=int, default=50000)
+    args = parser.parse_args()
+
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_bench']
+    client.drop_database('la_crime_bench')
+
+    app = Flask(__name__)
+    app.add_url_rule("/upvotes-original", view_func=create_upvote_original, methods=["POST"])
+    app.register_blueprint(crime_routes)
+    crime_routes.mongo = SimpleNamespace(db=db)
+    test_client = app.test_client()
+
+    try:
+        seed(db, args.officers, args.reports)
+        upvotes = make_upvotes(args.requests, args.officers, args.reports, random.Random(0))
+
+        # the original handler ran without any index on the keys it looks up
+        before = report("original (4 calls)", *measure(test_client, "/upvotes-original", [dict(u) for u in upvotes]))
+
+        apply_upvotes = routes.apply_upvotes
+        timings = {}
+        for label, rollups in (("insert only", False), ("insert + rollup writes", True)):
+            for collection in ("upvotes", "officer_stats", "upvote_leaderboard"):
+                db[collection].drop()
+            create_unique_indexes(db)
+            create_rollup_indexes(db)
+            caches.clear()
+            routes.apply_upvotes = apply_upvotes if rollups else (lambda db, upvotes: None)
+            try:
+                timings[label] = report(label, *measure(test_client, "/upvotes", [dict(u) for u in upvotes]))
+            finally:
+                routes.apply_upvotes = apply_upvotes
+
+        print(f"p50 speedup: {before / timings['insert only']:.1f}x insert only, {before / timings['insert + rollup writes']:.1f}x with rollups")
+    finally:
+        client.drop_database('la_crime_bench')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,42 +1,190 @@
-import requests
+import argparse
 import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from data.shards import SHARD_ROWS, append_rows, shard_entry, write_manifest
+
+# API endpoint (can be pointed at a local stand-in, see data/crimes/soda_stub.py)
+URL = os.environ.get("CRIME_DATA_URL", "https://data.lacity.org/resource/2nrs-mtv8.json")
+
+DATA_DIR = os.path.dirname(__file__)
+CHECKPOINT_PATH = os.path.join(DATA_DIR, 'download_checkpoint.json')
+OUTPUT_DIR = os.path.join(DATA_DIR, 'raw')
+
+PAGE_SIZE = 1000   # number of rows per request (batches of 1000 records)
+MAX_RETRIES = 5    # attempts per page before a fetcher gives up
+
+# serializes checkpoint writes coming from the fetcher threads
+checkpoint_lock = threading.RLock()
+
+
+def fetch(session, url, params):
+    """Fetch one page from the SODA endpoint, retrying with exponential backoff."""
+    for attempt in range(MAX_RETRIES):
+        try:
+            response = session.get(url, params=params, timeout=60)
+            if response.status_code == 200:
+                return response.json()
+            print(f"Failed to fetch data: {response.status_code}")
+        except requests.RequestException as e:
+            print(f"Failed to fetch data: {e}")
+        time.sleep(2 ** attempt)
+    raise RuntimeError(f"Giving up after {MAX_RETRIES} attempts: {params}")
+
+
+def count_rows(session, url):
+    """Return the total number of rows in the dataset."""
+    data = fetch(session, url, {'$select': 'count(*) AS count'})
+    return int(data[0]['count'])
+
+
+def partition_bounds(session, url, workers):
+    """Split the dr_no keyspace into `workers` ranges of roughly equal size."""
+    total = count_rows(session, url)
+    bounds = [None]
+    for i in range(1, workers):
+        # only the boundaries are looked up by offset, the pages themselves use keyset paging
+        params = {'$select': 'dr_no', '$order': 'dr_no', '$limit': 1, '$offset': total * i // workers}
+        data = fetch(session, url, params)
+        if data and data[0]['dr_no'] != bounds[-1]:
+            bounds.append(data[0]['dr_no'])
+    bounds.append(None)
+
+    return total, [
+        {
+            "start": bounds[i], "end": bounds[i + 1], "last": None, "rows": 0, "done": False,
+            "shard": 0, "shard_rows": 0, "bytes": 0, "shards": [],
+        }
+        for i in range(len(bounds) - 1)
+    ]
+
+
+def shard_name(index, shard):
+    """Return the file name of one shard written by one fetcher."""
+    return f'part{index:02d}-{shard:05d}.jsonl.gz'
+
+
+def page_params(partition):
+    """Build the keyset query for the next page of a partition."""
+    where = []
+    if partition["last"] is not None:
+        where.append(f"dr_no > '{partition['last']}'")
+    elif partition["start"] is not None:
+        where.append(f"dr_no >= '{partition['start']}'")
+    if partition["end"] is not None:
+        where.append(f"dr_no < '{partition['end']}'")
+
+    params = {'$order': 'dr_no', '$limit': PAGE_SIZE}
+    if where:
+        params['$where'] = ' AND '.join(where)
+    return params
+
+
+def load_checkpoint():
+    """Load the download checkpoint, or None if there is nothing to resume."""
+    try:
+        with open(CHECKPOINT_PATH, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(checkpoint):
+    """Atomically replace the checkpoint file so a crash never leaves it half written."""
+    with checkpoint_lock:
+        tmp_path = CHECKPOINT_PATH + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, CHECKPOINT_PATH)
+
+
+def download_partition(index, checkpoint, url):
+    """Stream one dr_no range into compressed shards, checkpointing after every page."""
+    partition = checkpoint["partitions"][index]
+    session = requests.Session()
+
+    # drop anything written after the last checkpoint (a page that was cut off mid-write)
+    path = os.path.join(OUTPUT_DIR, shard_name(index, partition["shard"]))
+    with open(path, 'ab') as f:
+        f.truncate(partition["bytes"])
+
+    while not partition["done"]:
+        data = fetch(session, url, page_params(partition))
+
+        size = append_rows(path, data) if data else partition["bytes"]
+
+        with checkpoint_lock:
+            if data:
+                partition["last"] = data[-1]["dr_no"]
+                partition["rows"] += len(data)
+                partition["shard_rows"] += len(data)
+                partition["bytes"] = size
+
+            # a short page means this range is exhausted
+            partition["done"] = len(data) < PAGE_SIZE
+
+            # seal the shard once it is full (or the range is done) and move on to the next file
+            if partition["shard_rows"] and (partition["shard_rows"] >= SHARD_ROWS or partition["done"]):
+                partition["shards"].append(
+                    shard_entry(OUTPUT_DIR, shard_name(index, partition["shard"]), partition["shard_rows"])
+                )
+                partition["shard"] += 1
+                partition["shard_rows"] = 0
+                partition["bytes"] = 0
+                path = os.path.join(OUTPUT_DIR, shard_name(index, partition["shard"]))
+
+            save_checkpoint(checkpoint)
+        print(f"[part {index:02d}] fetched {len(data)} rows. Total rows so far: {partition['rows']}")
+
+    return partition["rows"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the LA crime dataset.")
+    parser.add_argument('--url', default=URL, help="SODA endpoint to download from")
+    parser.add_argument('--workers', type=int, default=4, help="number of parallel fetchers")
+    parser.add_argument('--restart', action='store_true', help="ignore any existing checkpoint")
+    args = parser.parse_args()
+
+    checkpoint = None if args.restart else load_checkpoint()
+    if checkpoint and checkpoint["url"] != args.url:
+        print("Checkpoint belongs to a different endpoint, starting over.")
+        checkpoint = None
+
+    if checkpoint:
+        done = sum(p["rows"] for p in checkpoint["partitions"])
+        print(f"Resuming download: {done} of {checkpoint['total']} rows already on disk.")
+    else:
+        total, partitions = partition_bounds(requests.Session(), args.url, args.workers)
+        checkpoint = {"url": args.url, "total": total, "partitions": partitions}
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        for file_name in os.listdir(OUTPUT_DIR):
+            os.remove(os.path.join(OUTPUT_DIR, file_name))
+        save_checkpoint(checkpoint)
+
+    with ThreadPoolExecutor(max_workers=len(checkpoint["partitions"])) as executor:
+        futures = [
+            executor.submit(download_partition, index, checkpoint, args.url)
+            for index in range(len(checkpoint["partitions"]))
+        ]
+        try:
+            total_rows = sum(future.result() for future in futures)
+        except RuntimeError as e:
+            print(f"Download interrupted: {e}")
+            print("Progress is saved, rerun the download to resume.")
+            exit(1)
+
+    # shards are listed partition by partition, which keeps the manifest in dr_no order
+    write_manifest(OUTPUT_DIR, [shard for partition in checkpoint["partitions"] for shard in partition["shards"]])
+
+    print(f"Download completed. Total rows downloaded: {total_rows}")
+    print(f"Data saved to '{OUTPUT_DIR}'")
+
 
-# API endpoint
-url = "https://data.lacity.org/resource/2nrs-mtv8.json"
-
-# parameters to control the limit and offset
-limit = 1000  # number of rows per request (batches of 1000 records)
-offset = 0    # starting point for each request
-all_data = []
-
-while len(all_data) <= 1004876: # the total records are 1004876
-    # make a request with the current limit and offset
-    params = {'$limit': limit, '$offset': offset}
-    response = requests.get(url, params=params)
-    
-    # check if the request was successful
-    if response.status_code != 200:
-        print(f"Failed to fetch data: {response.status_code}")
-        break
-    
-    # parse the JSON response
-    data = response.json()
-    
-    # if no more data is returned, break the loop
-    if not data:
-        print("No more data to fetch")
-        break
-    
-    # append the data to the all_data list
-    all_data.extend(data)
-    print(f"Fetched {len(data)} rows. Total rows so far: {len(all_data)}")
-    
-    # update the offset for the next request
-    offset += limit
-
-# save all data to a JSON file, locally, in the same directory
-with open('./data/crimes/crime_data.json', 'w') as f:
-    json.dump(all_data, f)
-
-print(f"Download completed. Total rows downloaded: {len(all_data)}")
-print("Data saved to 'crime_data.json'")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import math
+
+# minimal geohash implementation (https://en.wikipedia.org/wiki/Geohash): bits alternate between
+# longitude and latitude, five bits per base32 character, so every prefix of a geohash is the
+# enclosing tile at a coarser precision
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+DECODE = {char: index for index, char in enumerate(BASE32)}
+
+
+def encode(lat, lon, precision):
+    """Return the geohash of a point at the given precision (number of characters)."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits, bit_count, even = 0, 0, True
+
+    while len(chars) < precision:
+        value, value_range = (lon, lon_range) if even else (lat, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            value_range[0] = mid
+        else:
+            bits = bits * 2
+            value_range[1] = mid
+
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+
+    return "".join(chars)
+
+
+def bbox(geohash):
+    """Return the (min_lat, min_lon, max_lat, max_lon) bounds of a geohash tile."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        bits = DECODE[char]
+        for shift in range(4, -1, -1):
+            value_range = lon_range if even else lat_range
+            mid = (value_range[0] + value_range[1]) / 2
+            if (bits >> shift) & 1:
+                value_range[0] = mid
+            else:
+                value_range[1] = mid
+            even = not even
+
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def cell_size(precision):
+    """Return the (lat, lon) size in degrees of a tile at the given precision."""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def count_tiles(min_lat, min_lon, max_lat, max_lon, precision):
+    """Return how many tiles `covering` would return for a bounding box."""
+    lat_size, lon_size = cell_size(precision)
+    rows = math.floor((max_lat + 90) / lat_size) - math.floor((min_lat + 90) / lat_size) + 1
+    columns = math.floor((max_lon + 180) / lon_size) - math.floor((min_lon + 180) / lon_size) + 1
+    return rows * columns
+
+
+def covering(min_lat, min_lon, max_lat, max_lon, precision):
+    """Return the geohashes of every tile intersecting a bounding box."""
+    lat_size, lon_size = cell_size(precision)
+    first_row = math.floor((min_lat + 90) / lat_size)
+    last_row = math.floor((max_lat + 90) / lat_size)
+    first_column = math.floor((min_lon + 180) / lon_size)
+    last_column = math.floor((max_lon + 180) / lon_size)
+
+    tiles = []
+    for row in range(first_row, last_row + 1):
+        # encode the center of each grid cell
+        lat = min(-90 + (row + 0.5) * lat_size, 90.0)
+        for column in range(first_column, last_column + 1):
+            lon = min(-180 + (column + 0.5) * lon_size, 180.0)
+            tiles.append(encode(lat, lon, precision))
+    return tiles
@@ -0,0 +1,179 @@
+import argparse
+import time
+from pymongo import MongoClient, UpdateOne
+
+# the compact crime schema keeps only codes in crime_reports; the descriptions live in small
+# lookup collections ({_id: code, description: ...}) that are cached in-process and joined back
+# when an API response is built
+#
+#   python -m data.crimes.lookups   # (re)build the lookup collections from crime_reports
+
+# (lookup collection, code path, description path) for the single-valued descriptions
+LOOKUP_FIELDS = [
+    ("areas", "area.no", "area.name"),
+    ("premises", "location.premis.code", "location.premis.description"),
+    ("weapons", "weapon.code", "weapon.description"),
+    ("statuses", "status.code", "status.description"),
+]
+# crime descriptions live in the `crime` array
+CRIME_CODES = "crime_codes"
+LOOKUP_COLLECTIONS = [collection for collection, _, _ in LOOKUP_FIELDS] + [CRIME_CODES]
+
+CACHE_TTL = 300  # seconds before the in-process cache reloads the lookup collections
+
+
+def get_path(document, path):
+    """Read a dotted path from a nested document."""
+    for key in path.split("."):
+        if not isinstance(document, dict):
+            return None
+        document = document.get(key)
+    return document
+
+
+def pop_path(document, path):
+    """Remove a dotted path from a nested document if it is there."""
+    *parents, key = path.split(".")
+    for parent in parents:
+        document = document.get(parent)
+        if not isinstance(document, dict):
+            return
+    document.pop(key, None)
+
+
+def set_path(document, path, value):
+    """Write a dotted path into a nested document."""
+    *parents, key = path.split(".")
+    for parent in parents:
+        document = document.setdefault(parent, {})
+    document[key] = value
+
+
+def extract_lookups(crime_report, lookups=None):
+    """Collect the code -> description pairs of a full crime report into `lookups`."""
+    lookups = lookups if lookups is not None else {collection: {} for collection in LOOKUP_COLLECTIONS}
+    for collection, code_path, description_path in LOOKUP_FIELDS:
+        code, description = get_path(crime_report, code_path), get_path(crime_report, description_path)
+        if code is not None and description:
+            lookups[collection][code] = description
+    for crime in crime_report.get("crime") or []:
+        if crime.get("code") is not None and crime.get("description"):
+            lookups[CRIME_CODES][crime["code"]] = crime["description"]
+    return lookups
+
+
+def drop_empty(value):
+    """Recursively drop None / empty values from a document."""
+    if isinstance(value, dict):
+        value = {key: drop_empty(item) for key, item in value.items()}
+        return {key: item for key, item in value.items() if item not in (None, "", {}, [])}
+    if isinstance(value, list):
+        return [drop_empty(item) for item in value]
+    return value
+
+
+def compact_crime_report(crime_report):
+    """Turn a full crime report into the compact layout: codes only, no null fields."""
+    compact = drop_empty(crime_report)
+    for _, _, description_path in LOOKUP_FIELDS:
+        pop_path(compact, description_path)
+    for crime in compact.get("crime") or []:
+        crime.pop("description", None)
+    return drop_empty(compact)
+
+
+def save_lookups(db, lookups):
+    """Upsert code -> description pairs into the lookup collections."""
+    for collection, pairs in lookups.items():
+        if pairs:
+            db[collection].bulk_write(
+                [UpdateOne({"_id": code}, {"$set": {"description": description}}, upsert=True) for code, description in pairs.items()],
+                ordered=False
+            )
+
+
+class LookupCache:
+    """In-process copy of the lookup collections, reloaded every CACHE_TTL seconds."""
+
+    def __init__(self, db, ttl=CACHE_TTL):
+        self.db = db
+        self.ttl = ttl
+        self.loaded_at = None
+        self.tables = {}
+
+    def table(self, collection):
+        """Return the code -> description dict of one lookup collection."""
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl:
+            self.tables = {
+                name: {document["_id"]: document.get("description") for document in self.db[name].find()}
+                for name in LOOKUP_COLLECTIONS
+            }
+            self.loaded_at = time.monotonic()
+        return self.tables.get(collection, {})
+
+    def describe(self, collection, code):
+        """Return the description of a code, or None if it is unknown."""
+        return self.table(collection).get(code)
+
+    def remember(self, lookups):
+        """Save pairs that are not cached yet, so repeated inserts cost no extra writes."""
+        missing = {
+            collection: {code: description for code, description in pairs.items() if self.describe(collection, code) != description}
+            for collection, pairs in lookups.items()
+        }
+        if any(missing.values()):
+            save_lookups(self.db, missing)
+            for collection, pairs in missing.items():
+                self.tables.setdefault(collection, {}).update(pairs)
+
+    def expand_crime_report(self, crime_report):
+        """Join the descriptions back into a (compact) crime report for an API response."""
+        for collection, code_path, description_path in LOOKUP_FIELDS:
+            code = get_path(crime_report, code_path)
+            if code is not None and get_path(crime_report, description_path) is None:
+                description = self.describe(collection, code)
+                if description is not None:
+                    set_path(crime_report, description_path, description)
+        for crime in crime_report.get("crime") or []:
+            if crime.get("description") is None:
+                crime["description"] = self.describe(CRIME_CODES, crime.get("code"))
+        return crime_report
+
+
+# one cache per database, shared by the request handlers of a process
+caches = {}
+
+
+def get_lookup_cache(db):
+    """Return the process-wide lookup cache for a database."""
+    if db.name not in caches:
+        caches[db.name] = LookupCache(db)
+    return caches[db.name]
+
+
+def build_lookups(db):
+    """Rebuild the lookup collections from the descriptions stored in crime_reports."""
+    for collection, code_path, description_path in LOOKUP_FIELDS:
+        db.crime_reports.aggregate([
+            {"$match": {code_path: {"$ne": None}, description_path: {"$nin": [None, ""]}}},
+            {"$group": {"_id": f"${code_path}", "description": {"$first": f"${description_path}"}}},
+            {"$merge": {"into": collection, "whenMatched": "replace", "whenNotMatched": "insert"}},
+        ], allowDiskUse=True)
+    db.crime_reports.aggregate([
+        {"$unwind": "$crime"},
+        {"$match": {"crime.description": {"$nin": [None, ""]}}},
+        {"$group": {"_id": "$crime.code", "description": {"$first": "$crime.description"}}},
+        {"$merge": {"into": CRIME_CODES, "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ], allowDiskUse=True)
+
+
+if __name__ == '__main__':
+    argparse.ArgumentParser(description="Rebuild the crime lookup collections from crime_reports.").parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    build_lookups(db)
+    for collection in LOOKUP_COLLECTIONS:
+        print(f"{collection}: {db[collection].count_documents({})} entries")
@@ -1,42 +1,189 @@
+import argparse
 import json
 import os
-from pymongo import MongoClient
-from .process import process_crime_data
-
-file_path = os.path.join(os.path.dirname(__file__), 'crime_data.json')
-
-# load crime data from JSON file
-try:
-    with open(file_path, 'r') as f:
-        crime_data = json.load(f)
-except FileNotFoundError:
-    print(f"Error: The file '{file_path}' was not found.")
-    exit(1)
-except json.JSONDecodeError:
-    print(f"Error: The file '{file_path}' contains invalid JSON.")
-    exit(1)
-
-# connect to MongoDB
-client = MongoClient('mongodb://localhost:27017/')  
-db = client['la_crime_db'] 
-collection = db['crime_reports']
-
-# process and insert each crime record
-for crime in crime_data:
-    # process the crime data
-    processed_crime, error, status_code = process_crime_data(crime)
-    
-    if error:
-        # print the DR_NO of the record that failed validation
-        dr_no = crime.get("dr_no", "Unknown DR_NO")
-        print(f"Skipping record with DR_NO: {dr_no} due to validation error: {error}")
-        continue  # skip this record if there's an error
-    
-    # insert the processed crime data into the database
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pymongo import InsertOne, MongoClient
+from pymongo.errors import BulkWriteError
+from data.shards import read_manifest, iter_shard
+from db.indexes import create_unique_indexes
+from data.crimes.lookups import LOOKUP_COLLECTIONS, compact_crime_report, extract_lookups, save_lookups
+from data.crimes.process import process_crime_data
+from data.crimes.update import versioned_upsert
+from data.crimes.validation import validate_crime_batch
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'raw')
+REJECTED_PATH = os.path.join(os.path.dirname(__file__), 'rejected.jsonl')
+
+PROGRESS_INTERVAL = 2.0  # seconds between progress lines
+
+
+def process_chunk(records, compact=False):
+    """Validate a chunk of raw records in one batch and process the valid ones (executed in a worker process)."""
+    processed, rejected = [], []
+    lookups = {collection: {} for collection in LOOKUP_COLLECTIONS}
+    mask, errors = validate_crime_batch(records)
+    for crime, valid, error in zip(records, mask, errors):
+        if valid:
+            processed_crime, error, status_code = process_crime_data(crime, validate=False)
+            if not error:
+                # descriptions always go to the lookup collections, compact reports then drop them
+                extract_lookups(processed_crime, lookups)
+                processed.append(compact_crime_report(processed_crime) if compact else processed_crime)
+                continue
+        rejected.append({"dr_no": (crime or {}).get("dr_no", "Unknown DR_NO"), "error": error, "record": crime})
+    return processed, rejected, lookups
+
+
+def chunked(records, size):
+    """Group an iterable of records into lists of `size`."""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class LoadStats:
+    """Counters for a load run, printed as a periodic throughput summary."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last_report = self.started
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def rate(self):
+        return self.processed / max(time.perf_counter() - self.started, 1e-9)
+
+    def report(self, force=False):
+        now = time.perf_counter()
+        if force or now - self.last_report >= PROGRESS_INTERVAL:
+            self.last_report = now
+            print(
+                f"{self.processed} processed, {self.inserted} inserted, {self.updated} updated, {self.rejected} rejected, "
+                f"{self.failed} failed ({self.rate():.0f} rows/sec)"
+            )
+
+
+def write_batch(collection, documents, stats, upsert=False):
+    """Write one batch with an unordered bulk write, counting per-document failures."""
+    if upsert:
+        # keyed on the unique dr_no index, so retrying a load never duplicates a report
+        operations = [versioned_upsert(document) for document in documents]
+    else:
+        operations = [InsertOne(document) for document in documents]
+
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        stats.inserted += result.inserted_count + result.upserted_count
+        stats.updated += result.modified_count
+    except BulkWriteError as e:
+        # duplicate dr_no values end up here when loading in insert mode
+        stats.inserted += e.details["nInserted"] + e.details["nUpserted"]
+        stats.updated += e.details["nModified"]
+        stats.failed += len(e.details["writeErrors"])
+
+
+def load_records(records, collection, batch_size=1000, chunk_size=5000, workers=None, rejected_file=None, upsert=False,
+                 compact=False):
+    """Process raw records in a worker pool and bulk insert the results into `collection`."""
+    stats = LoadStats()
+    batch = []
+    lookups = {name: {} for name in LOOKUP_COLLECTIONS}
+    workers = workers or os.cpu_count()
+
+    def drain(future):
+        processed, rejected, chunk_lookups = future.result()
+        for name, pairs in chunk_lookups.items():
+            lookups[name].update(pairs)
+        stats.processed += len(processed) + len(rejected)
+        stats.rejected += len(rejected)
+        if rejected_file:
+            for entry in rejected:
+                rejected_file.write(json.dumps(entry, default=str) + '\n')
+
+        batch.extend(processed)
+        while len(batch) >= batch_size:
+            write_batch(collection, batch[:batch_size], stats, upsert=upsert)
+            del batch[:batch_size]
+        stats.report()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # keep a bounded number of chunks in flight so memory stays flat
+        pending = deque()
+        for chunk in chunked(records, chunk_size):
+            pending.append(executor.submit(process_chunk, chunk, compact))
+            if len(pending) >= workers * 2:
+                drain(pending.popleft())
+        while pending:
+            drain(pending.popleft())
+
+    if batch:
+        write_batch(collection, batch, stats, upsert=upsert)
+
+    save_lookups(collection.database, lookups)
+    return stats
+
+
+def iter_manifest_records(data_dir, manifest):
+    """Stream the crime data shard by shard."""
+    for shard in manifest["shards"]:
+        print(f"Loading shard {shard['file']} ({shard['rows']} rows)")
+        yield from iter_shard(data_dir, shard)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the downloaded crime shards into MongoDB.")
+    parser.add_argument('--input', default=DATA_DIR, help="shard directory (e.g. a generated workload)")
+    parser.add_argument('--batch-size', type=int, default=1000, help="documents per bulk_write call")
+    parser.add_argument('--chunk-size', type=int, default=5000, help="records per worker task")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--rejected', default=REJECTED_PATH, help="file collecting rejected records")
+    parser.add_argument('--upsert', action='store_true', help="upsert on dr_no so the load can be safely retried")
+    parser.add_argument('--compact', action='store_true', help="store codes only, descriptions go to lookup collections")
+    args = parser.parse_args()
+
+    # load the shard manifest written by the download script
     try:
-        collection.insert_one(processed_crime)
-        print(f"Inserted crime report with DR_NO: {processed_crime['dr_no']}")
-    except Exception as e:
-        print(f"Failed to insert crime report: {e}")
+        manifest = read_manifest(args.input)
+    except FileNotFoundError:
+        print(f"Error: No shard manifest found in '{args.input}'.")
+        exit(1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit(1)
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+    collection = db['crime_reports']
+
+    # make sure dr_no is unique before loading, so reruns cannot duplicate reports
+    create_unique_indexes(db, collections=["crime_reports"])
+
+    with open(args.rejected, 'w') as rejected_file:
+        stats = load_records(
+            iter_manifest_records(args.input, manifest),
+            collection,
+            batch_size=args.batch_size,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            rejected_file=rejected_file,
+            upsert=args.upsert,
+            compact=args.compact,
+        )
+
+    stats.report(force=True)
+    print(f"Data insertion completed. Rejected records written to '{args.rejected}'.")
+
 
-print("Data insertion completed.")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,56 @@
+from datetime import datetime
+from data.crimes.geohash import encode
+from data.crimes.lookups import compact_crime_report
 from data.crimes.validation import validate_new_crime_data
 
+def to_int(value):
+    """Convert a numeric code to int, leaving missing or non-numeric values as they are."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+def to_datetime(value):
+    """Convert an ISO date string to a datetime; raise ValueError if it cannot be parsed."""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).rstrip("Z"))
+
+# geohash length stored with each report; coarser tiles are its prefixes (see db/rollups/tiles.py)
+GEOHASH_PRECISION = 6
+
+def to_point(lat, lon):
+    """Build a GeoJSON Point from latitude / longitude, or None if they are missing, zero or out of range."""
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    if lat == 0 or lon == 0 or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    # GeoJSON order is [longitude, latitude]
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+def geohash_of(point):
+    """Return the geohash of a GeoJSON Point, or None if there is no point."""
+    if not point:
+        return None
+    lon, lat = point["coordinates"]
+    return encode(lat, lon, GEOHASH_PRECISION)
+
+def day_bucket(date):
+    """Truncate a datetime to midnight, used to group reports per day."""
+    return datetime(date.year, date.month, date.day) if date else None
+
+def split_mocodes(mocodes):
+    """Split the space-separated MO code string into a list of codes (multikey indexed)."""
+    if isinstance(mocodes, list):
+        return mocodes
+    return str(mocodes).split() if mocodes else []
+
 def create_area_data(new_crime):
     """Create area data from the crime data."""
     return {
-        "no": new_crime.get("area"),
+        "no": to_int(new_crime.get("area")),
         "name": new_crime.get("area_name"),
         "report_dist_no": new_crime.get("rpt_dist_no")
     }
@@ -20,7 +67,7 @@ def create_weapon_data(new_crime):
     """Create weapon data from the crime data if it exists."""
     if new_crime.get("weapon_used_cd") and new_crime.get("weapon_desc"):
         return {
-            "code": new_crime.get("weapon_used_cd"),
+            "code": to_int(new_crime.get("weapon_used_cd")),
             "description": new_crime.get("weapon_desc")
         }
     return {}
@@ -40,15 +87,16 @@ def create_crime_codes(new_crime):
         if code:  # only add if the code is not None
             crime_data.append({
                 "severity": severity,
-                "code": code,
+                "code": to_int(code),
                 "description": description if code == new_crime.get("crm_cd") else None
             })
             
     return crime_data
     
 def create_location_data(new_crime):
-    """Create location data from the crime data."""
+    """Create location data from the crime data, with the coordinates as a GeoJSON Point and a geohash."""
     street = new_crime.get("cross_street") if new_crime.get("cross_street") else None
+    point = to_point(new_crime.get("lat"), new_crime.get("lon"))
 
     return {
         "premis": {
@@ -57,10 +105,8 @@ def create_location_data(new_crime):
         },
         "location": new_crime.get("location"),
         "street": street,
-        "coordinates": {
-            "latitude": new_crime.get("lat"),
-            "longitude": new_crime.get("lon")
-        }
+        "coordinates": point,
+        "geohash": geohash_of(point)
     }
     
 def create_status_data(new_crime):
@@ -73,25 +119,40 @@ def create_status_data(new_crime):
         "description": status_description
     }
     
-def process_crime_data(new_crime):
-    """Process and validate crime data to create a crime report."""
-    validation_error, status_code = validate_new_crime_data(new_crime)
-    if validation_error:
-        return None, validation_error, status_code
+def process_crime_data(new_crime, validate=True, compact=False):
+    """Process and validate crime data to create a crime report.
+
+    Pass `validate=False` for records already checked with `validate_crime_batch`, and
+    `compact=True` for the codes-only layout (see data/crimes/lookups.py).
+    """
+    if validate:
+        validation_error, status_code = validate_new_crime_data(new_crime)
+        if validation_error:
+            return None, validation_error, status_code
+
+    # dates are stored as native BSON dates so range filters and grouping need no string parsing
+    try:
+        date_reported = to_datetime(new_crime.get("date_rptd"))
+        date_occurred = to_datetime(new_crime.get("date_occ"))
+    except ValueError:
+        return None, {"error": "Invalid 'date_rptd' or 'date_occ'. They must be ISO dates."}, 400
 
     # create full crime report doc
     crime_report = {
         "dr_no": new_crime.get("dr_no"),
-        "date_reported": new_crime.get("date_rptd"),
-        "date_occurred": new_crime.get("date_occ"),
+        "date_reported": date_reported,
+        "date_occurred": date_occurred,
+        "day": day_bucket(date_occurred),
         "time_occurred": new_crime.get("time_occ"),
         "area": create_area_data(new_crime),
         "crime": create_crime_codes(new_crime),
-        "mocodes": new_crime.get("mocodes"),
+        "mocodes": split_mocodes(new_crime.get("mocodes")),
         "victim": create_victim_data(new_crime),
         "weapon": create_weapon_data(new_crime),
         "location": create_location_data(new_crime),
         "status": create_status_data(new_crime),
     }
     
+    if compact:
+        return compact_crime_report(crime_report), None, None
     return crime_report, None, None
\ No newline at end of file
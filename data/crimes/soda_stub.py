@@ -0,0 +1,240 @@
+import argparse
+import bisect
+import json
+import random
+import re
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# local stand-in for the SODA endpoint, supporting the subset of SoQL the downloader and sync use:
+#   $select=count(*) AS count, $select=max(:updated_at) AS updated_at, $select=dr_no, $select=*, :updated_at
+#   $order=dr_no or $order=:updated_at, dr_no, $limit, $offset
+#   $where with `<field> <op> '<value>'` comparisons combined with AND / OR and parentheses
+#
+#   python -m data.crimes.soda_stub --rows 50000 --fail-rate 0.05
+#   CRIME_DATA_URL=http://localhost:8000/resource.json python -m data.crimes.download
+#
+# `POST /touch?updated=100&new=10` bumps :updated_at on random rows and appends new ones,
+# which is enough to exercise data.crimes.sync.
+
+WHERE_CLAUSE = re.compile(r"(dr_no)\s*(>=|<=|>|<|=)\s*'([^']*)'")
+WHERE_TOKEN = re.compile(r"\s*(\(|\)|>=|<=|>|<|=|'[^']*'|[:\w]+)")
+
+OPERATORS = {
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '=': lambda a, b: a == b,
+}
+
+
+def now():
+    """Return the current time formatted like a SODA :updated_at value."""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+# a handful of common MO codes for the generated rows
+MOCODES = ["0344", "0416", "1822", "0329", "1300", "0913", "2000", "1414", "0400", "1501"]
+
+
+def generate_rows(count, seed=0, rng=None):
+    """Generate `count` fake raw crime rows with unique dr_no values."""
+    rng = rng or random.Random(seed)
+    updated_at = now()
+    rows = []
+    for dr_no in rng.sample(range(100000000, 999999999), count):
+        rows.append({
+            ":updated_at": updated_at,
+            "dr_no": str(dr_no),
+            "date_rptd": "2020-01-08T00:00:00.000",
+            "date_occ": "2020-01-08T00:00:00.000",
+            "time_occ": f"{rng.randint(0, 23):02d}{rng.randint(0, 59):02d}",
+            "area": f"{rng.randint(1, 21):02d}",
+            "area_name": "Southwest",
+            "rpt_dist_no": "0377",
+            "crm_cd": "624",
+            "crm_cd_desc": "BATTERY - SIMPLE ASSAULT",
+            "vict_age": str(rng.randint(1, 99)),
+            "vict_sex": rng.choice(["F", "M", "X"]),
+            "vict_descent": rng.choice(["B", "H", "W", "O"]),
+            "premis_cd": "501",
+            "premis_desc": "SINGLE FAMILY DWELLING",
+            "status": "AO",
+            "status_desc": "Adult Other",
+            "crm_cd_1": "624",
+            "location": "1100 W  39TH PL",
+            "lat": "34.0141",
+            "lon": "-118.2978",
+            "mocodes": " ".join(rng.sample(MOCODES, rng.randint(1, 4))),
+        })
+    return rows
+
+
+def load_rows(path):
+    """Load raw rows from a JSON array or a line-delimited JSON file."""
+    with open(path, 'r') as f:
+        if path.endswith('.jsonl'):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = json.load(f)
+    updated_at = now()
+    for row in rows:
+        row.setdefault(":updated_at", updated_at)
+    return rows
+
+
+def parse_where(where):
+    """Compile a $where expression into a predicate over a row."""
+    tokens = WHERE_TOKEN.findall(where)
+    position = 0
+
+    def peek():
+        return tokens[position].upper() if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def parse_or():
+        terms = [parse_and()]
+        while peek() == 'OR':
+            take()
+            terms.append(parse_and())
+        return lambda row: any(term(row) for term in terms)
+
+    def parse_and():
+        factors = [parse_factor()]
+        while peek() == 'AND':
+            take()
+            factors.append(parse_factor())
+        return lambda row: all(factor(row) for factor in factors)
+
+    def parse_factor():
+        if peek() == '(':
+            take()
+            inner = parse_or()
+            take()
+            return inner
+        field, op, value = take(), take(), take().strip("'")
+        return lambda row: OPERATORS[op](row.get(field, '').rstrip('Z'), value.rstrip('Z'))
+
+    return parse_or()
+
+
+class SodaHandler(BaseHTTPRequestHandler):
+    rows = []
+    keys = []
+    fail_rate = 0.0
+
+    def do_POST(self):
+        params = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+        if urlparse(self.path).path != '/touch':
+            self.send_error(404)
+            return
+
+        # bump :updated_at on existing rows and append brand new ones
+        touched = random.sample(self.rows, min(int(params.get('updated', 0)), len(self.rows)))
+        updated_at = now()
+        for row in touched:
+            row[":updated_at"] = updated_at
+            row["status"], row["status_desc"] = "AA", "Adult Arrest"
+
+        known = set(self.keys)
+        new_rows = [row for row in generate_rows(int(params.get('new', 0)), rng=random.Random()) if row["dr_no"] not in known]
+        self.rows.extend(new_rows)
+        self.rows.sort(key=lambda row: row["dr_no"])
+        self.keys[:] = [row["dr_no"] for row in self.rows]
+
+        self.send_json({"updated": len(touched), "new": len(new_rows)})
+
+    def do_GET(self):
+        # simulate a flaky upstream so the retry / resume logic can be exercised
+        if random.random() < self.fail_rate:
+            self.send_error(503)
+            return
+
+        params = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+        rows = self.select_rows(params.get('$where'))
+
+        select = params.get('$select', '')
+        if select.lower().startswith('count(*)'):
+            self.send_json([{"count": str(len(rows))}])
+            return
+        if select.lower().startswith('max(:updated_at)'):
+            self.send_json([{"updated_at": max((row[":updated_at"] for row in rows), default=None)}])
+            return
+
+        if params.get('$order', 'dr_no').replace(' ', '') == ':updated_at,dr_no':
+            rows = sorted(rows, key=lambda row: (row[":updated_at"], row["dr_no"]))
+
+        offset = int(params.get('$offset', 0))
+        limit = int(params.get('$limit', 1000))
+        rows = rows[offset:offset + limit]
+
+        fields = [field.strip() for field in select.split(',')] if select else ['*']
+        if '*' in fields:
+            # system fields are only returned when they are selected explicitly
+            rows = [
+                {key: value for key, value in row.items() if not key.startswith(':') or key in fields}
+                for row in rows
+            ]
+        else:
+            rows = [{field: row.get(field) for field in fields} for row in rows]
+
+        self.send_json(rows)
+
+    def select_rows(self, where):
+        """Apply a $where to the rows, using binary search for plain dr_no ranges."""
+        if where and (' OR ' in where.upper() or ':updated_at' in where):
+            predicate = parse_where(where)
+            return [row for row in self.rows if predicate(row)]
+
+        lo, hi = 0, len(self.rows)
+        for field, op, value in WHERE_CLAUSE.findall(where or ''):
+            if op in ('>', '>='):
+                find = bisect.bisect_right if op == '>' else bisect.bisect_left
+                lo = max(lo, find(self.keys, value))
+            elif op in ('<', '<='):
+                find = bisect.bisect_left if op == '<' else bisect.bisect_right
+                hi = min(hi, find(self.keys, value))
+            else:
+                return [row for row in self.rows[lo:hi] if OPERATORS[op](row[field], value)]
+        return self.rows[lo:hi]
+
+    def send_json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve crime rows over a SODA-like HTTP API.")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--rows', type=int, default=10000, help="number of fake rows to generate")
+    parser.add_argument('--file', help="serve rows from a JSON / JSONL file instead")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    rows = load_rows(args.file) if args.file else generate_rows(args.rows)
+    rows.sort(key=lambda row: row["dr_no"])
+
+    SodaHandler.rows = rows
+    SodaHandler.keys = [row["dr_no"] for row in rows]
+    SodaHandler.fail_rate = args.fail_rate
+
+    server = ThreadingHTTPServer(('localhost', args.port), SodaHandler)
+    print(f"Serving {len(rows)} rows on http://localhost:{args.port}/resource.json")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import time
+import requests
+from pymongo import MongoClient
+from data.crimes.download import PAGE_SIZE, URL, fetch
+from data.crimes.lookups import LOOKUP_COLLECTIONS, compact_crime_report, extract_lookups, save_lookups
+from data.crimes.process import process_crime_data
+from data.crimes.update import versioned_upsert
+from data.crimes.validation import validate_crime_batch
+from db.rollups import apply_reports, rollup_projection
+
+# incremental refresh of crime_reports: only rows whose :updated_at (a SODA system field)
+# is past the stored high-water mark are pulled and upserted, keyed on dr_no
+
+
+def load_state(db):
+    """Return the stored high-water mark, or None if crime_reports was never synced."""
+    return db.sync_state.find_one({"_id": "crime_reports"})
+
+
+def save_state(db, state):
+    """Persist the high-water mark after every page so an interrupted sync can resume."""
+    db.sync_state.replace_one({"_id": "crime_reports"}, state, upsert=True)
+
+
+def bootstrap_state(db, session, url):
+    """Build a first high-water mark from the data already loaded in crime_reports."""
+    latest = db.crime_reports.find_one({}, projection={"dr_no": 1}, sort=[("dr_no", -1)])
+    updated_at = fetch(session, url, {'$select': 'max(:updated_at) AS updated_at'})[0]["updated_at"]
+
+    # rows loaded by a full download are only missing if they are newer than the highest dr_no
+    return {
+        "_id": "crime_reports",
+        "max_dr_no": latest["dr_no"] if latest else "",
+        "updated_at": updated_at,
+        "cursor": None,
+        "bootstrapped": False,
+    }
+
+
+def page_params(state):
+    """Build the keyset query for the next page of changed rows."""
+    params = {'$select': '*, :updated_at', '$limit': PAGE_SIZE}
+
+    if not state["bootstrapped"]:
+        # first run: pick up everything past the highest dr_no already in the collection
+        last = state["cursor"] or state["max_dr_no"]
+        params['$where'] = f"dr_no > '{last}'"
+        params['$order'] = 'dr_no'
+        return params
+
+    updated_at, dr_no = state["cursor"] or (state["updated_at"], None)
+    updated_at = updated_at.rstrip('Z')
+    if dr_no is None:
+        params['$where'] = f":updated_at > '{updated_at}'"
+    else:
+        params['$where'] = f"(:updated_at > '{updated_at}' OR (:updated_at = '{updated_at}' AND dr_no > '{dr_no}'))"
+    params['$order'] = ':updated_at, dr_no'
+    return params
+
+
+def upsert_page(collection, rows, compact=False):
+    """Process a page of raw rows and upsert the valid ones; return per-page counts."""
+    operations, reports = [], []
+    lookups = {name: {} for name in LOOKUP_COLLECTIONS}
+    mask, errors = validate_crime_batch(rows)
+    rejected = mask.count(False)
+    for row, valid in zip(rows, mask):
+        if not valid:
+            continue
+        crime_report, error, status_code = process_crime_data(row, validate=False)
+        if error:
+            rejected += 1
+            continue
+        extract_lookups(crime_report, lookups)
+        if compact:
+            crime_report = compact_crime_report(crime_report)
+        reports.append(crime_report)
+        operations.append(versioned_upsert(crime_report))
+
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "rejected": rejected}
+    if operations:
+        # before-images of the reports being replaced, so the rollups can be moved, not double counted
+        previous = list(collection.find({"dr_no": {"$in": [report["dr_no"] for report in reports]}}, rollup_projection()))
+        result = collection.bulk_write(operations, ordered=False)
+        apply_reports(collection.database, previous, sign=-1)
+        apply_reports(collection.database, reports)
+        counts["inserted"] = result.upserted_count
+        counts["updated"] = result.modified_count
+        counts["unchanged"] = result.matched_count - result.modified_count
+        save_lookups(collection.database, lookups)
+    return counts
+
+
+def sync(db, url, compact=False):
+    """Pull new / changed rows past the high-water mark and upsert them into crime_reports."""
+    session = requests.Session()
+    state = load_state(db) or bootstrap_state(db, session, url)
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0, "rejected": 0}
+
+    while True:
+        rows = fetch(session, url, page_params(state))
+
+        for key, value in upsert_page(db.crime_reports, rows, compact=compact).items():
+            totals[key] += value
+
+        if rows:
+            last = rows[-1]
+            if state["bootstrapped"]:
+                state["cursor"] = [last[":updated_at"], last["dr_no"]]
+            else:
+                state["cursor"] = last["dr_no"]
+
+        if len(rows) < PAGE_SIZE and not state["bootstrapped"]:
+            # new rows are in, carry on with whatever changed since the bootstrap started
+            state["bootstrapped"] = True
+            state["cursor"] = None
+        elif len(rows) < PAGE_SIZE:
+            # advance the high-water mark to the newest change seen in this run
+            if state["cursor"]:
+                state["updated_at"] = state["cursor"][0]
+            state["cursor"] = None
+            save_state(db, state)
+            break
+
+        save_state(db, state)
+
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync new and changed crime reports into MongoDB.")
+    parser.add_argument('--url', default=URL, help="SODA endpoint to sync from")
+    parser.add_argument('--compact', action='store_true', help="store codes only, descriptions go to lookup collections")
+    args = parser.parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    started = time.perf_counter()
+    totals = sync(db, args.url, compact=args.compact)
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"Sync completed in {elapsed:.1f}s: {totals['inserted']} inserted, {totals['updated']} updated, "
+        f"{totals['unchanged']} unchanged, {totals['rejected']} rejected."
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+import copy
+from pymongo import ReturnDocument, UpdateOne
+from data.crimes.lookups import CRIME_CODES, get_lookup_cache, get_path, set_path
+from data.crimes.process import day_bucket, geohash_of, split_mocodes, to_datetime, to_int, to_point
+from data.crimes.validation import validate_partial_crime_data
+from db.rollups import apply_reports, rollup_projection
+
+# partial updates of crime reports: the flat fields accepted by POST /crimes are mapped onto the
+# nested schema built by process_crime_data and applied with one find_one_and_update, guarded by
+# the report's `version` (missing counts as 0) when the caller sends the version it read.
+#
+# a lat or lon sent alone is merged with the stored coordinate, and crime codes are written as
+# a whole new `crime` array (adding entries for severities the report does not have yet). both
+# read the stored value first and only apply if it is still the same, otherwise 409
+
+# flat field -> (nested path, converter); descriptions are skipped for compact reports
+FIELD_PATHS = {
+    "date_rptd": ("date_reported", to_datetime),
+    "time_occ": ("time_occurred", str),
+    "area": ("area.no", to_int),
+    "area_name": ("area.name", str),
+    "rpt_dist_no": ("area.report_dist_no", str),
+    "vict_age": ("victim.age", str),
+    "vict_sex": ("victim.sex", str),
+    "vict_descent": ("victim.descent", str),
+    "weapon_used_cd": ("weapon.code", to_int),
+    "weapon_desc": ("weapon.description", str),
+    "premis_cd": ("location.premis.code", str),
+    "premis_desc": ("location.premis.description", str),
+    "location": ("location.location", str),
+    "cross_street": ("location.street", str),
+    "status": ("status.code", str),
+    "status_desc": ("status.description", str),
+    "mocodes": ("mocodes", split_mocodes),
+}
+DESCRIPTION_FIELDS = {"area_name", "weapon_desc", "premis_desc", "status_desc", "crm_cd_desc"}
+# crime codes live in the `crime` array, one entry per severity
+CRIME_CODE_FIELDS = {"crm_cd": 1, "crm_cd_2": 2, "crm_cd_3": 3, "crm_cd_4": 4}
+# fields with their own handling
+SPECIAL_FIELDS = {"date_occ", "lat", "lon", "crm_cd_desc", "version"}
+# description field -> (lookup collection, code field), so updated descriptions reach the lookup collections
+LOOKUP_DESCRIPTIONS = {
+    "area_name": ("areas", "area"),
+    "weapon_desc": ("weapons", "weapon_used_cd"),
+    "premis_desc": ("premises", "premis_cd"),
+    "status_desc": ("statuses", "status"),
+    "crm_cd_desc": (CRIME_CODES, "crm_cd"),
+}
+# raw fields the rollup collections depend on
+ROLLUP_INPUTS = {"date_occ", "time_occ", "area", "lat", "lon", "weapon_used_cd", *CRIME_CODE_FIELDS}
+
+
+class UpdateError(Exception):
+    """An update that cannot be applied, with the HTTP status and error payload to return."""
+
+    def __init__(self, status_code, error):
+        super().__init__(error)
+        self.status_code = status_code
+        self.error = error
+
+
+def build_update(fields, lookups=None, compact=False):
+    """Map flat input fields to ($set paths, {severity: crime entry changes}); raise UpdateError if invalid."""
+    if not isinstance(fields, dict) or not fields:
+        raise UpdateError(400, {"error": "No data provided"})
+    unknown = sorted(set(fields) - set(FIELD_PATHS) - set(CRIME_CODE_FIELDS) - SPECIAL_FIELDS)
+    if "dr_no" in fields:
+        raise UpdateError(400, {"error": "dr_no cannot be updated."})
+    if unknown:
+        raise UpdateError(400, {"error": f"Unknown fields: {', '.join(unknown)}"})
+
+    validation_error, status_code = validate_partial_crime_data(fields, {})
+    if validation_error:
+        raise UpdateError(status_code, validation_error)
+
+    sets = {}
+    try:
+        for field, value in fields.items():
+            if field in FIELD_PATHS and not (compact and field in DESCRIPTION_FIELDS):
+                path, convert = FIELD_PATHS[field]
+                sets[path] = convert(value) if value is not None else None
+        if "date_occ" in fields:
+            sets["date_occurred"] = to_datetime(fields["date_occ"])
+            sets["day"] = day_bucket(sets["date_occurred"])
+    except ValueError:
+        raise UpdateError(400, {"error": "Invalid 'date_rptd' or 'date_occ'. They must be ISO dates."})
+
+    if "lat" in fields or "lon" in fields:
+        point = to_point(fields.get("lat"), fields.get("lon"))
+        if point is None:
+            raise UpdateError(400, {"error": {"coordinates": "Invalid Latitude or/and longitude."}})
+        sets["location.coordinates"] = point
+        sets["location.geohash"] = geohash_of(point)
+
+    crimes = {}
+    for field, severity in CRIME_CODE_FIELDS.items():
+        if field in fields:
+            code = to_int(fields[field])
+            description = fields.get("crm_cd_desc") if severity == 1 else None
+            if severity == 1 and description is None and lookups is not None:
+                description = lookups.describe(CRIME_CODES, code)
+            crimes[severity] = {"code": code} if compact else {"code": code, "description": description}
+    if "crm_cd_desc" in fields and "crm_cd" not in fields and not compact:
+        crimes.setdefault(1, {})["description"] = fields["crm_cd_desc"]
+
+    return sets, crimes
+
+
+def description_pairs(fields):
+    """Code -> description pairs sent with an update, shaped like extract_lookups output."""
+    pairs = {collection: {} for collection, _ in LOOKUP_DESCRIPTIONS.values()}
+    for field, (collection, code_field) in LOOKUP_DESCRIPTIONS.items():
+        if fields.get(field) and fields.get(code_field) is not None:
+            code = to_int(fields[code_field]) if code_field in ("area", "weapon_used_cd", "crm_cd") else fields[code_field]
+            pairs[collection][code] = fields[field]
+    return pairs
+
+
+def projection_of(paths):
+    """A projection of the given paths, leaving out paths already covered by a parent path."""
+    paths = set(paths)
+    kept = [path for path in paths if not any(path.startswith(parent + ".") for parent in paths)]
+    return {"_id": 0, **{path: 1 for path in sorted(kept)}}
+
+
+def apply_changes(report, sets, crimes):
+    """Apply a built update to a (projected) copy of a report, mirroring what MongoDB did."""
+    report = copy.deepcopy(report)
+    for path, value in sets.items():
+        set_path(report, path, value)
+    for crime in report.get("crime") or []:
+        crime.update(crimes.get(crime.get("severity"), {}))
+    report["version"] = report.get("version", 0) + 1
+    return report
+
+
+def changed_fields(report, sets, crimes):
+    """The nested fields an update touched, read from the updated report."""
+    changed = {"dr_no": report.get("dr_no"), "version": report["version"]}
+    for path in sets:
+        set_path(changed, path, get_path(report, path))
+    if crimes:
+        changed["crime"] = [crime for crime in report.get("crime") or [] if crime.get("severity") in crimes]
+    return changed
+
+
+def versioned_upsert(report):
+    """Upsert a whole report keyed on dr_no, bumping its version only if a field actually changes.
+
+    Used by the bulk writers (sync, loader upserts), so API updates based on a read taken before
+    such a write fail the version guard like any other concurrent change.
+    """
+    unchanged = {"$and": [{"$eq": [f"${field}", {"$literal": value}]} for field, value in report.items()]}
+    return UpdateOne({"dr_no": report["dr_no"]}, [
+        {"$set": {"version": {"$cond": [unchanged, "$version", {"$add": [{"$ifNull": ["$version", 0]}, 1]}]}}},
+        {"$set": {field: {"$literal": value} for field, value in report.items()}},
+    ], upsert=True)
+
+
+def merge_crimes(current, crimes, dr_no):
+    """The `crime` array with the changes of each severity applied, adding the severities it lacks."""
+    merged = copy.deepcopy(current)
+    severities = {crime.get("severity") for crime in merged}
+    for crime in merged:
+        crime.update(crimes.get(crime.get("severity"), {}))
+    for severity, changes in sorted(crimes.items()):
+        if severity in severities:
+            continue
+        if "code" not in changes:
+            raise UpdateError(400, {"error": f"Crime report with DR_NO {dr_no} has no crime code with severity {severity}."})
+        merged.append({"severity": severity, **changes})
+    return sorted(merged, key=lambda crime: crime.get("severity") or 0)
+
+
+def update_crime_report(db, dr_no, fields, compact=False):
+    """Atomically apply flat field changes to one report; return the changed fields or raise UpdateError."""
+    if not isinstance(fields, dict):
+        raise UpdateError(400, {"error": "No data provided"})
+    fields = dict(fields)
+    expected_version = fields.pop("version", None)
+    if expected_version is not None and not isinstance(expected_version, int):
+        raise UpdateError(400, {"error": "version must be an integer."})
+    lookups = get_lookup_cache(db)
+
+    # a lone lat / lon and crime code changes are merged with what is stored
+    partial_point = ("lat" in fields) != ("lon" in fields)
+    touches_crimes = bool(set(fields) & (set(CRIME_CODE_FIELDS) | {"crm_cd_desc"}))
+    current = None
+    if partial_point or touches_crimes:
+        current = db.crime_reports.find_one({"dr_no": dr_no}, {"_id": 0, "location.coordinates": 1, "crime": 1})
+        if current is None:
+            raise UpdateError(404, {"error": f"Crime report with DR_NO {dr_no} not found."})
+    stored_point = get_path(current, "location.coordinates") if partial_point else None
+    if partial_point:
+        if not isinstance(stored_point, dict) or len(stored_point.get("coordinates") or []) != 2:
+            raise UpdateError(400, {"error": {"coordinates": "The report has no stored coordinates, send both lat and lon."}})
+        lon, lat = stored_point["coordinates"]
+        fields.setdefault("lat", lat)
+        fields.setdefault("lon", lon)
+
+    sets, crimes = build_update(fields, lookups=lookups, compact=compact)
+
+    query = {"dr_no": dr_no}
+    if expected_version is not None:
+        # reports written before versioning have no version field, which counts as 0
+        query["version"] = {"$in": [expected_version, None]} if expected_version == 0 else expected_version
+    if partial_point:
+        query["location.coordinates"] = stored_point
+    if crimes:
+        query["crime"] = current.get("crime")
+        sets["crime"] = merge_crimes(current.get("crime") or [], crimes, dr_no)
+
+    update = {"$inc": {"version": 1}}
+    if sets:
+        update["$set"] = sets
+
+    # the before-image carries what the rollups need and what the response reports back
+    paths = list(sets) + ["dr_no", "version"]
+    touches_rollups = bool(ROLLUP_INPUTS & set(fields))
+    if touches_rollups:
+        paths += list(rollup_projection())
+
+    before = db.crime_reports.find_one_and_update(
+        query, update,
+        projection=projection_of(paths),
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        current = db.crime_reports.find_one({"dr_no": dr_no}, {"_id": 0, "version": 1})
+        if current is None:
+            raise UpdateError(404, {"error": f"Crime report with DR_NO {dr_no} not found."})
+        # the version, or the stored coordinate / crime codes merged with, changed meanwhile
+        raise UpdateError(409, {"error": "Version conflict.", "version": current.get("version", 0)})
+
+    after = apply_changes(before, sets, {})
+    if touches_rollups:
+        apply_reports(db, [before], sign=-1)
+        apply_reports(db, [after])
+    lookups.remember(description_pairs(fields))
+    return changed_fields(after, sets, crimes)
+
+
+def update_crime_reports(db, updates, compact=False):
+    """Apply a batch of {dr_no, version?, ...fields} updates; return a result per item."""
+    results = []
+    for index, item in enumerate(updates):
+        if not isinstance(item, dict) or not item.get("dr_no"):
+            results.append({"index": index, "status": "invalid", "error": "Each update needs a dr_no."})
+            continue
+        fields = {key: value for key, value in item.items() if key != "dr_no"}
+        try:
+            changed = update_crime_report(db, item["dr_no"], fields, compact=compact)
+            results.append({"index": index, "status": "updated", "changed": changed})
+        except UpdateError as e:
+            status = {404: "not_found", 409: "conflict"}.get(e.status_code, "invalid")
+            results.append({"index": index, "status": status, **e.error})
+    return results
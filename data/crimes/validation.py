@@ -1,54 +1,32 @@
 import re
 
+# precompiled patterns and lookup sets shared by the single-record and batch validators
+DR_NO_PATTERN = re.compile(r'^\d{9}$')
+AGE_PATTERN = re.compile(r'^\d{1,2}$')
+VALID_SEXES = frozenset(['F', 'M', 'X'])
+VALID_DESCENTS = frozenset(['A', 'B', 'C', 'D', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'O', 'P', 'S', 'U', 'V', 'W', 'X', 'Z'])
+
 # helper functions for validation
 def validate_dr_no(dr_no):
     """Validate that 'dr_no' is a 9-digit number."""
-    return dr_no and re.match(r'^\d{9}$', str(dr_no))
+    return bool(dr_no) and DR_NO_PATTERN.match(str(dr_no)) is not None
 
 def validate_age(age):
     """Validate that age is a 1-2 digit number between 0 and 99."""
-    return age and re.match(r'^\d{1,2}$', age) and (0 <= int(age) <= 99)
+    return bool(age) and AGE_PATTERN.match(str(age)) is not None and (0 <= int(age) <= 99)
 
 def validate_sex(sex):
     """Validate that sex is one of 'F', 'M', or 'X'."""
-    return sex in ['F', 'M', 'X']
+    return sex in VALID_SEXES
 
 def validate_descent(descent):
     """Validate that descent is one of the valid codes."""
-    valid_descents = ['A', 'B', 'C', 'D', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'O', 'P', 'S', 'U', 'V', 'W', 'X', 'Z']
-    return descent in valid_descents
+    return descent in VALID_DESCENTS
 
 def validate_coordinates(lat, lon):
     """Validate that latitude and longitude are non-zero."""
     return lat != 0 and lon != 0
 
-def validate_new_crime_data(new_crime):
-    """Validate the incoming crime data."""
-    if not new_crime:
-        return {"error": "No data provided"}, 400
-
-    dr_no = new_crime.get("dr_no")
-    if not validate_dr_no(dr_no):
-        return {"error": "Invalid 'dr_no'. It must be a 9-digit number."}, 400
-
-    age = new_crime.get("vict_age")
-    sex = new_crime.get("vict_sex")
-    descent = new_crime.get("vict_descent")
-
-    if not validate_age(age):
-        return {"error": "Invalid victim age."}, 400
-    if not validate_sex(sex):
-        return {"error": "Invalid victim sex."}, 400
-    if not validate_descent(descent):
-        return {"error": "Invalid victim descent."}, 400
-
-    lat = new_crime.get("lat")
-    lon = new_crime.get("lon")
-    if not validate_coordinates(lat, lon):
-        return {"error": "Invalid Latitude or/and longitude"}, 400
-    
-    return None, None
-
 # dictionary to map fields to their validation functions and error messages
 VALIDATION_RULES = {
     "dr_no": (validate_dr_no, "Invalid 'dr_no'. It must be a 9-digit number."),
@@ -58,6 +36,56 @@ VALIDATION_RULES = {
     "coordinates": (validate_coordinates, "Invalid Latitude or/and longitude."),
 }
 
+# raw fields read by the batch validator
+BATCH_FIELDS = ("dr_no", "vict_age", "vict_sex", "vict_descent", "lat", "lon")
+
+def check_column(field, values):
+    """Apply the rule for `field` to a whole column; None values are not checked."""
+    validation_func, _ = VALIDATION_RULES[field]
+    return [value is None or validation_func(value) for value in values]
+
+def validate_crime_batch(records):
+    """Validate a batch of raw crime records in one pass per rule.
+
+    `records` is either a list of raw record dicts or a column batch ({field: [values]}).
+    Returns `(mask, errors)`: mask[i] is True when row i is valid, errors[i] is None or the
+    same error payload `validate_new_crime_data` returns for that row.
+    """
+    if isinstance(records, dict):
+        columns = {field: records.get(field) for field in BATCH_FIELDS}
+        size = max((len(column) for column in columns.values() if column is not None), default=0)
+        columns = {field: column if column is not None else [None] * size for field, column in columns.items()}
+        empty = [False] * size
+    else:
+        size = len(records)
+        empty = [not record for record in records]
+        columns = {field: [record.get(field) if record else None for record in records] for field in BATCH_FIELDS}
+
+    # one pass per rule over the column, collecting failures per row
+    failures = {}
+    for field in ("dr_no", "vict_age", "vict_sex", "vict_descent"):
+        for row, ok in enumerate(check_column(field, columns[field])):
+            if not ok:
+                failures.setdefault(row, {})[field] = VALIDATION_RULES[field][1]
+
+    _, coordinates_message = VALIDATION_RULES["coordinates"]
+    for row, (lat, lon) in enumerate(zip(columns["lat"], columns["lon"])):
+        if not validate_coordinates(lat, lon):
+            failures.setdefault(row, {})["coordinates"] = coordinates_message
+
+    mask, errors = [], []
+    for row in range(size):
+        if empty[row]:
+            mask.append(False)
+            errors.append({"error": "No data provided"})
+        elif row in failures:
+            mask.append(False)
+            errors.append({"error": failures[row]})
+        else:
+            mask.append(True)
+            errors.append(None)
+    return mask, errors
+
 def validate_field(field_name, value, existing_data=None):
     """Validate a single field based on the validation rules."""
     if field_name == "coordinates":
@@ -68,32 +96,18 @@ def validate_field(field_name, value, existing_data=None):
     else:
         validation_func, error_message = VALIDATION_RULES[field_name]
         return validation_func(value), error_message
-    
+
 def validate_new_crime_data(new_crime):
     """Validate the incoming crime data."""
-    if not new_crime:
-        return {"error": "No data provided"}, 400
-
-    errors = {}
-    for field, (validation_func, error_message) in VALIDATION_RULES.items():
-        if field == "coordinates":
-            lat = new_crime.get("lat")
-            lon = new_crime.get("lon")
-            if not validation_func(lat, lon):
-                errors[field] = error_message
-        else:
-            value = new_crime.get(field)
-            if value is not None and not validation_func(value):
-                errors[field] = error_message
-
-    if errors:
-        return {"error": errors}, 400
+    mask, errors = validate_crime_batch([new_crime])
+    if not mask[0]:
+        return errors[0], 400
     return None, None
 
 def validate_partial_crime_data(updated_fields, existing_crime):
     """Validate only the fields that are being updated."""
     errors = {}
-    
+
     for field in updated_fields:
         if field in VALIDATION_RULES:
             validation_func, error_message = VALIDATION_RULES[field]
@@ -109,4 +123,4 @@ def validate_partial_crime_data(updated_fields, existing_crime):
 
     if errors:
         return {"error": errors}, 400
-    return None, None
\ No newline at end of file
+    return None, None
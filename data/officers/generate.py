@@ -1,13 +1,19 @@
 import json
+import random
 from faker import Faker
 
+# the same seed always gives the same officers
+SEED = 0
+
 fake = Faker()
+fake.seed_instance(SEED)
 
-# generate 1000 police officers
+# generate 9999 police officers, with badge numbers drawn without repetition from 1..99999
+# (badge_no has a unique index)
 officers = []
-for _ in range(9999):
+for badge_no in random.Random(SEED).sample(range(1, 100000), 9999):
     officer = {
-        "badge_no": fake.random_int(min=1, max=99999),
+        "badge_no": badge_no,
         "name": fake.name(),
         "email": fake.email(),
         "area": fake.random_int(min=1, max=21)
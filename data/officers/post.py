@@ -1,16 +1,28 @@
+import argparse
 import json
 import os
-from pymongo import MongoClient
+from pymongo import InsertOne, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+from db.indexes import create_unique_indexes
+from db.rollups import apply_officers
+from data.shards import MANIFEST_FILE, iter_records
 
+parser = argparse.ArgumentParser(description="Load the generated police officers into MongoDB.")
+parser.add_argument('--input', help="shard directory of a generated workload, instead of officers_data.json")
+parser.add_argument('--upsert', action='store_true', help="upsert on badge_no so the load can be safely retried")
+args = parser.parse_args()
 
 file_path = os.path.join(os.path.dirname(__file__), 'officers_data.json')
 
-# load officers data from JSON file
+# load officers data from the workload shards or the JSON file
 try:
-    with open(file_path, 'r') as f:
-        officers_data = json.load(f)
+    if args.input:
+        officers_data = list(iter_records(args.input))
+    else:
+        with open(file_path, 'r') as f:
+            officers_data = json.load(f)
 except FileNotFoundError:
-    print(f"Error: The file '{file_path}' was not found.")
+    print(f"Error: '{os.path.join(args.input, MANIFEST_FILE) if args.input else file_path}' was not found.")
     exit(1)
 except json.JSONDecodeError:
     print(f"Error: The file '{file_path}' contains invalid JSON.")
@@ -22,10 +34,38 @@ client = MongoClient("mongodb://localhost:27017/")
 db = client["la_crime_db"]
 collection = db['police_officers']
 
+# badge_no is unique, so reruns cannot duplicate officers
+create_unique_indexes(db, collections=["police_officers"])
+
+# emails before the load, so officers whose email changes are moved in the officer_emails mapping
+previous = {
+    officer["badge_no"]: officer.get("email")
+    for officer in collection.find({"badge_no": {"$in": [officer["badge_no"] for officer in officers_data]}}, {"_id": 0, "badge_no": 1, "email": 1})
+}
+
+if args.upsert:
+    operations = [UpdateOne({"badge_no": officer["badge_no"]}, {"$set": officer}, upsert=True) for officer in officers_data]
+else:
+    operations = [InsertOne(officer) for officer in officers_data]
+
 try:
-    # insert the data into the MongoDB collection
-    collection.insert_many(officers_data)
+    # write the data into the MongoDB collection
+    result = collection.bulk_write(operations, ordered=False)
+    written = officers_data
+    print(f"Police officers loaded into MongoDB: {result.inserted_count + result.upserted_count} inserted, {result.modified_count} updated.")
+except BulkWriteError as e:
+    failed = {error["index"] for error in e.details["writeErrors"]}
+    written = [officer for index, officer in enumerate(officers_data) if index not in failed]
+    print(
+        f"Police officers loaded into MongoDB: {e.details['nInserted'] + e.details['nUpserted']} inserted, "
+        f"{len(e.details['writeErrors'])} skipped as duplicates or failures."
+    )
 except Exception as e:
         print(f"Failed to insert officers data: {e}")
+        exit(1)
 
-print("Police officers inserted successfully into MongoDB!")
+# keep the email -> badge mapping of the duplicate email query in step
+try:
+    apply_officers(db, written, previous)
+except Exception as e:
+    print(f"Failed to update the officer email mapping (rebuild it with `python -m db.rollups.emails`): {e}")
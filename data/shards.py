@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+
+# on-disk layout shared by the downloaders / generators and the post scripts:
+#   <directory>/manifest.json        {"format": ..., "rows": ..., "shards": [{"file", "rows", "sha256"}, ...]}
+#   <directory>/<name>.jsonl.gz      gzip-compressed, one JSON document per line
+#
+# every batch of rows is appended as its own gzip member, so a shard can be truncated back to
+# a known size after a crash and still be read by `gzip.open` as one continuous stream
+
+MANIFEST_FILE = 'manifest.json'
+FORMAT = 'jsonl.gz'
+SHARD_ROWS = 50000  # rows per shard before a new file is started
+
+
+def append_rows(path, rows):
+    """Append rows to a shard as one gzip member and return the new shard size in bytes."""
+    payload = b''.join(json.dumps(row, default=str).encode() + b'\n' for row in rows)
+    with open(path, 'ab') as f:
+        f.write(gzip.compress(payload, mtime=0))
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+def file_sha256(path):
+    """Return the hex sha256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def shard_entry(directory, file_name, rows, **extra):
+    """Describe a finished shard for the manifest."""
+    return {"file": file_name, "rows": rows, "sha256": file_sha256(os.path.join(directory, file_name)), **extra}
+
+
+def write_manifest(directory, shards):
+    """Atomically write the manifest listing the shards in read order."""
+    manifest = {"format": FORMAT, "rows": sum(shard["rows"] for shard in shards), "shards": shards}
+    tmp_path = os.path.join(directory, MANIFEST_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+    return manifest
+
+
+def read_manifest(directory):
+    """Load the manifest of a shard directory."""
+    with open(os.path.join(directory, MANIFEST_FILE), 'r') as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT:
+        raise ValueError(f"Unsupported shard format: {manifest.get('format')}")
+    return manifest
+
+
+def iter_shard(directory, shard, verify=True):
+    """Stream the documents of one shard, checking its checksum and row count."""
+    path = os.path.join(directory, shard["file"])
+    if verify and file_sha256(path) != shard["sha256"]:
+        raise ValueError(f"Checksum mismatch for shard '{shard['file']}'")
+
+    rows = 0
+    with gzip.open(path, 'rb') as f:
+        for line in io.BufferedReader(f, buffer_size=1 << 20):
+            if line.strip():
+                rows += 1
+                yield json.loads(line)
+
+    if verify and rows != shard["rows"]:
+        raise ValueError(f"Shard '{shard['file']}' has {rows} rows, manifest says {shard['rows']}")
+
+
+def iter_records(directory, verify=True):
+    """Stream every document of a shard directory, shard by shard."""
+    for shard in read_manifest(directory)["shards"]:
+        yield from iter_shard(directory, shard, verify=verify)
+
+
+class ShardWriter:
+    """Write documents sequentially into fixed-size shards."""
+
+    def __init__(self, directory, prefix, shard_rows=SHARD_ROWS, batch_rows=1000):
+        self.directory = directory
+        self.prefix = prefix
+        self.shard_rows = shard_rows
+        self.batch_rows = batch_rows
+        self.shards = []
+        self.buffer = []
+        self.current_rows = 0
+        os.makedirs(directory, exist_ok=True)
+
+        # start from a clean slate, shards are appended to
+        for file_name in os.listdir(directory):
+            if file_name.startswith(prefix + '-') and file_name.endswith(FORMAT):
+                os.remove(os.path.join(directory, file_name))
+
+    @property
+    def current_file(self):
+        return f'{self.prefix}-{len(self.shards):05d}.{FORMAT}'
+
+    def write(self, document):
+        self.buffer.append(document)
+        if len(self.buffer) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        """Append buffered documents to the current shard, rolling over when it is full."""
+        while self.buffer:
+            take = min(len(self.buffer), self.shard_rows - self.current_rows)
+            append_rows(os.path.join(self.directory, self.current_file), self.buffer[:take])
+            del self.buffer[:take]
+            self.current_rows += take
+            if self.current_rows >= self.shard_rows:
+                self.finish_shard()
+
+    def finish_shard(self):
+        if self.current_rows:
+            self.shards.append(shard_entry(self.directory, self.current_file, self.current_rows))
+            self.current_rows = 0
+
+    def close(self):
+        """Flush what is left and return the list of shard entries written."""
+        self.flush()
+        self.finish_shard()
+        return self.shards
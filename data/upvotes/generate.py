@@ -1,100 +1,128 @@
-import json
-from pymongo import MongoClient
-from datetime import datetime, timedelta
+import argparse
+import math
+import os
 import random
+from datetime import datetime, timedelta
+from pymongo import InsertOne, MongoClient
+from pymongo.errors import BulkWriteError
+from data.shards import ShardWriter, write_manifest
+
+# generates fake upvotes by streaming crime_reports once: every report draws a Poisson number
+# of upvotes from distinct officers, so no (officer, report) set and no list of reports is kept
+# in memory. only the officers (a few thousand {badge_no, name, email}) are held in RAM
+#
+#   python -m data.upvotes.generate                          # ~1 upvote per 3 reports into data/upvotes/raw
+#   python -m data.upvotes.generate --upvotes 100000000 --max-per-officer 0 --target db
+
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'raw')
+BATCH_SIZE = 10000  # upvotes per bulk insert / shard append
+START_DATE = datetime(2020, 1, 1)
+NORMAL_MEAN = 30  # above this mean, Poisson counts are drawn from the normal approximation
+
+
+def load_officers(db):
+    """Load the officer fields embedded in an upvote."""
+    return list(db.police_officers.find({}, {"_id": 0, "badge_no": 1, "name": 1, "email": 1}))
+
+
+def poisson(rng, mean):
+    """Draw a Poisson-distributed count: Knuth's method for small means, a normal approximation above NORMAL_MEAN.
+
+    Knuth's method multiplies uniforms down to exp(-mean), which underflows for large means.
+    """
+    if mean > NORMAL_MEAN:
+        return max(0, round(rng.gauss(mean, math.sqrt(mean))))
+    limit, count, product = math.exp(-mean), 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def generate_upvotes(db, upvotes, rng, max_per_officer=1000, end_date=None):
+    """Yield upvotes for every crime report, about `upvotes` in total."""
+    officers = load_officers(db)
+    reports = db.crime_reports.estimated_document_count()
+    if not officers or not reports:
+        return
+
+    mean = upvotes / reports
+    days = max(1, ((end_date or datetime.now()) - START_DATE).days)
+    officer_counts = [0] * len(officers)
+
+    for report in db.crime_reports.find({}, {"_id": 0, "dr_no": 1, "area": 1}).batch_size(BATCH_SIZE):
+        count = min(poisson(rng, mean), len(officers))
+        if not count:
+            continue
+
+        # each report gets a small pool of dates its upvotes are spread over
+        dates = [(START_DATE + timedelta(days=rng.randrange(days))).strftime("%Y-%m-%d") for _ in range(rng.randint(1, 5))]
+
+        # distinct officers per report, so (officer, report) pairs never repeat
+        for index in rng.sample(range(len(officers)), count):
+            if max_per_officer and officer_counts[index] >= max_per_officer:
+                continue
+            officer_counts[index] += 1
+            yield {
+                "officer": officers[index],
+                "report": {"dr_no": report["dr_no"], "area": report.get("area")},
+                "upvote_date": rng.choice(dates)
+            }
+
+
+def insert_batch(db, batch):
+    """Insert one batch unordered; return (inserted, skipped), upvotes that already exist being skipped."""
+    try:
+        return db.upvotes.bulk_write(batch, ordered=False).inserted_count, 0
+    except BulkWriteError as e:
+        return e.details["nInserted"], len(e.details["writeErrors"])
+
+
+def write_to_db(db, upvotes):
+    """Insert upvotes in unordered bulk writes of BATCH_SIZE; return how many were written and skipped."""
+    written, skipped, batch = 0, 0, []
+    for upvote in upvotes:
+        batch.append(InsertOne(upvote))
+        if len(batch) >= BATCH_SIZE:
+            inserted, rejected = insert_batch(db, batch)
+            written, skipped, batch = written + inserted, skipped + rejected, []
+    if batch:
+        inserted, rejected = insert_batch(db, batch)
+        written, skipped = written + inserted, skipped + rejected
+    return written, skipped
+
+
+def write_to_shards(directory, upvotes):
+    """Write upvotes into compressed shards plus a manifest; return how many were written."""
+    writer = ShardWriter(directory, 'upvotes', batch_rows=BATCH_SIZE)
+    for upvote in upvotes:
+        writer.write(upvote)
+    manifest = write_manifest(directory, writer.close())
+    return manifest["rows"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate fake upvotes from the loaded officers and crime reports.")
+    parser.add_argument('--upvotes', type=int, help="approximate number of upvotes (default: one per three reports)")
+    parser.add_argument('--max-per-officer', type=int, default=1000, help="cap on upvotes per officer, 0 for no cap")
+    parser.add_argument('--target', choices=['shards', 'db'], default='shards', help="write shards for data.upvotes.post, or insert directly")
+    parser.add_argument('--output', default=OUTPUT_DIR, help="shard directory")
+    parser.add_argument('--seed', type=int, help="random seed, for reproducible output")
+    args = parser.parse_args()
+
+    # connect to MongoDB
+    client = MongoClient("mongodb://localhost:27017/")
+    db = client["la_crime_db"]
+
+    upvotes_wanted = args.upvotes if args.upvotes is not None else max(1, db.crime_reports.estimated_document_count() // 3)
+    upvotes = generate_upvotes(db, upvotes_wanted, random.Random(args.seed), max_per_officer=args.max_per_officer)
+
+    if args.target == 'db':
+        written, skipped = write_to_db(db, upvotes)
+        print(f"Upvote data generated: {written} upvotes inserted into the database, {skipped} skipped as duplicates.")
+    else:
+        print(f"Upvote data generated: {write_to_shards(args.output, upvotes)} upvotes saved to {args.output}.")
 
-# connect to MongoDB
-client = MongoClient("mongodb://localhost:27017/")
-db = client["la_crime_db"]
-
-# retrieve all officers from the police_officers collection
-officers_collection = db['police_officers']
-all_officers = list(officers_collection.find({}))
-
-# retrieve all crime reports from the crime_reports collection
-crime_reports_collection = db['crime_reports']
-all_reports = list(crime_reports_collection.find({}))
-
-# function to generate a random date between 01/01/2020 and now
-def generate_random_date(start_date, end_date):
-    time_between_dates = end_date - start_date
-    random_number_of_days = random.randrange(time_between_dates.days)
-    random_date = start_date + timedelta(days=random_number_of_days)
-    return random_date.strftime("%Y-%m-%d")
-
-# generate fake upvotes
-upvotes = []
-start_date = datetime(2020, 1, 1)
-end_date = datetime.now()
-
-# track upvoted combinations of officer badge_no and report dr_no
-upvoted_combinations = set()
-
-# track the number of upvotes per officer
-officer_upvote_counts = {officer["badge_no"]: 0 for officer in all_officers}
-
-# number of upvotes to generate 
-num_upvotes = max(1, len(all_reports) // 3)
-
-# pre-generate a pool of random dates for each report
-report_dates = {}
-for report in all_reports:
-    # generate a small pool of random dates for this report
-    num_dates = random.randint(1, 5)  
-    dates = [generate_random_date(start_date, end_date) for _ in range(num_dates)]
-    report_dates[report["dr_no"]] = dates
-
-# loop to generate upvotes
-for _ in range(num_upvotes):
-    # randomly pick an officer and a report
-    officer = random.choice(all_officers)
-    report = random.choice(all_reports)
-    
-    # check if the officer has already made 1000 upvotes
-    if officer_upvote_counts[officer["badge_no"]] >= 1000:
-        continue  # Skip this officer
-    
-    # create a unique key for the combination of officer and report
-    combination_key = (officer["badge_no"], report["dr_no"])
-    
-    # check if this combination has already been upvoted
-    if combination_key in upvoted_combinations:
-        continue  # Skip this combination
-    
-    # get the pre-generated dates for this report
-    dates_for_report = report_dates[report["dr_no"]]
-    
-    # randomly pick one of the pre-generated dates for this upvote
-    upvote_date = random.choice(dates_for_report)
-    
-    # create the upvote document
-    upvote = {
-        "officer": {
-            "badge_no": officer["badge_no"],
-            "name": officer["name"],
-            "email": officer["email"]
-        },
-        "report": {
-            "dr_no": report["dr_no"],
-            "area": report["area"]
-        },
-        "upvote_date": upvote_date
-    }
-    
-    # add the upvote to the list
-    upvotes.append(upvote)
-    
-    # add the combination to the set to prevent duplicate upvotes
-    upvoted_combinations.add(combination_key)
-    
-    # increment the upvote count for the officer
-    officer_upvote_counts[officer["badge_no"]] += 1
-
-
-# save the upvote data to a JSON file, locally, in the same directory
-output_file = 'data/upvotes/upvotes_data.json'
-with open(output_file, 'w') as f:
-    json.dump(upvotes, f, indent=4)
-
-print(f"Upvote data generated and saved to {output_file}.")
 
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,69 @@
+import argparse
 import os
 import json
-from pymongo import MongoClient
+from itertools import islice
+from pymongo import InsertOne, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+from db.indexes import create_unique_indexes
+from data.shards import MANIFEST_FILE, iter_records
 
+BATCH_SIZE = 10000  # upvotes per bulk_write call
 
+parser = argparse.ArgumentParser(description="Load the generated upvotes into MongoDB.")
+parser.add_argument('--input', default=os.path.join(os.path.dirname(__file__), 'raw'), help="shard directory (e.g. a generated workload)")
+parser.add_argument('--upsert', action='store_true', help="upsert on (badge_no, dr_no) so the load can be safely retried")
+args = parser.parse_args()
+
+shard_dir = args.input
 file_path = os.path.join(os.path.dirname(__file__), 'upvotes_data.json')
 
-# load upvote data from JSON file
-try:
-    with open(file_path, 'r') as f:
-        upvote_data = json.load(f)
-except FileNotFoundError:
-    print(f"Error: The file '{file_path}' was not found.")
-    exit(1)
-except json.JSONDecodeError:
-    print(f"Error: The file '{file_path}' contains invalid JSON.")
-    exit(1)
+# stream the shards written by data.upvotes.generate, falling back to an older JSON file
+if os.path.exists(os.path.join(shard_dir, MANIFEST_FILE)):
+    upvote_data = iter_records(shard_dir)
+else:
+    try:
+        with open(file_path, 'r') as f:
+            upvote_data = iter(json.load(f))
+    except FileNotFoundError:
+        print(f"Error: Neither '{shard_dir}' nor '{file_path}' was found.")
+        exit(1)
+    except json.JSONDecodeError:
+        print(f"Error: The file '{file_path}' contains invalid JSON.")
+        exit(1)
     
 # connect to MongoDB
 client = MongoClient('mongodb://localhost:27017/')
 db = client['la_crime_db']
 upvotes_collection = db['upvotes']
 
-# insert upvote data into the database
-try:
-    upvotes_collection.insert_many(upvote_data)
-    print(f"Inserted {len(upvote_data)} upvotes into the database.")
-except Exception as e:
-    print(f"Failed to insert upvotes: {e}")
\ No newline at end of file
+# an officer can upvote a report only once, so reruns cannot duplicate upvotes
+create_unique_indexes(db, collections=["upvotes"])
+
+# write upvote data into the database in batches
+inserted, updated, skipped = 0, 0, 0
+for batch in iter(lambda: list(islice(upvote_data, BATCH_SIZE)), []):
+    if args.upsert:
+        operations = [
+            UpdateOne(
+                {"officer.badge_no": upvote["officer"]["badge_no"], "report.dr_no": upvote["report"]["dr_no"]},
+                {"$set": upvote},
+                upsert=True
+            )
+            for upvote in batch
+        ]
+    else:
+        operations = [InsertOne(upvote) for upvote in batch]
+
+    try:
+        result = upvotes_collection.bulk_write(operations, ordered=False)
+        inserted += result.inserted_count + result.upserted_count
+        updated += result.modified_count
+    except BulkWriteError as e:
+        inserted += e.details["nInserted"] + e.details["nUpserted"]
+        updated += e.details["nModified"]
+        skipped += len(e.details["writeErrors"])
+    except Exception as e:
+        print(f"Failed to insert upvotes: {e}")
+        exit(1)
+
+print(f"Upvotes loaded into the database: {inserted} inserted, {updated} updated, {skipped} skipped as duplicates.")
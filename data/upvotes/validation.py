@@ -25,8 +25,15 @@ def validate_report_data(report_data):
     if not report_data:
         return False, "Report data is missing."
     
+    if not isinstance(report_data, dict):
+        return False, "Report data must be an object."
+
     required_fields = ["dr_no", "area"]
     if not all(key in report_data for key in required_fields):
         return False, f"Missing required report fields: {', '.join(required_fields)}"
+
+    # the upvote rollups count the report's area by its number
+    if not isinstance(report_data["area"], dict):
+        return False, "Report area must be an object, e.g. {\"no\": 1, \"name\": \"Central\"}."
     
     return True, ""
\ No newline at end of file
@@ -0,0 +1,262 @@
+import argparse
+import functools
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from faker import Faker
+from data.shards import FORMAT, SHARD_ROWS, append_rows, shard_entry, write_manifest
+from data.upvotes.generate import poisson
+
+# deterministic synthetic workload at a scale factor: SF1 is about the size of the public
+# dataset (1M crime reports, 10k officers, ~333k upvotes) and everything grows linearly.
+# every shard is generated by its own task from a seed derived from (seed, kind, shard), so the
+# output is identical for a given seed whatever the number of workers:
+#
+#   python -m data.workload --sf 10 --workers 8
+#   python -m data.crimes.post --input data/workload/sf10/crimes
+#   python -m data.officers.post --input data/workload/sf10/officers
+#   python -m data.upvotes.post --input data/workload/sf10/upvotes
+#
+# crime rows are raw SODA rows, so they go through the same validation / processing as the
+# downloaded data. officers are derived from their badge number alone, which lets the crime
+# tasks embed officer names in upvotes without reading the officer shards
+
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'workload')
+
+CRIMES_PER_SF = 1000000
+OFFICERS_PER_SF = 10000
+UPVOTES_PER_REPORT = 1 / 3
+FIRST_DR_NO = 100000000
+APPEND_ROWS = 10000  # rows per gzip member
+
+START_DATE = datetime(2020, 1, 1)
+END_DATE = datetime(2024, 12, 31)
+
+# (code, description, share of reports), roughly the most frequent codes of the public data
+CRIME_CODES = [
+    ("510", "VEHICLE - STOLEN", 11),
+    ("624", "BATTERY - SIMPLE ASSAULT", 8),
+    ("330", "BURGLARY FROM VEHICLE", 6),
+    ("354", "THEFT OF IDENTITY", 6),
+    ("740", "VANDALISM - FELONY ($400 & OVER, ALL CHURCH VANDALISMS)", 6),
+    ("310", "BURGLARY", 6),
+    ("230", "ASSAULT WITH DEADLY WEAPON, AGGRAVATED ASSAULT", 5),
+    ("440", "THEFT PLAIN - PETTY ($950 & UNDER)", 5),
+    ("626", "INTIMATE PARTNER - SIMPLE ASSAULT", 5),
+    ("420", "THEFT FROM MOTOR VEHICLE - PETTY ($950 & UNDER)", 4),
+    ("331", "THEFT FROM MOTOR VEHICLE - GRAND ($950.01 AND OVER)", 4),
+    ("341", "THEFT-GRAND ($950.01 & OVER)EXCPT,GUNS,FOWL,LIVESTK,PROD", 3),
+    ("745", "VANDALISM - MISDEAMEANOR ($399 OR UNDER)", 3),
+    ("210", "ROBBERY", 3),
+]
+# codes that usually involve a weapon
+VIOLENT_CODES = {"624", "230", "626", "210"}
+
+# (area no, area name, centroid lat, centroid lon)
+AREAS = [
+    (1, "Central", 34.046, -118.248), (2, "Rampart", 34.066, -118.278), (3, "Southwest", 34.018, -118.310),
+    (4, "Hollenbeck", 34.046, -118.203), (5, "Harbor", 33.770, -118.285), (6, "Hollywood", 34.100, -118.330),
+    (7, "Wilshire", 34.060, -118.350), (8, "West LA", 34.050, -118.440), (9, "Van Nuys", 34.185, -118.450),
+    (10, "West Valley", 34.190, -118.540), (11, "Northeast", 34.115, -118.230), (12, "77th Street", 33.970, -118.300),
+    (13, "Newton", 34.010, -118.260), (14, "Pacific", 33.990, -118.430), (15, "N Hollywood", 34.170, -118.390),
+    (16, "Foothill", 34.260, -118.390), (17, "Devonshire", 34.260, -118.530), (18, "Southeast", 33.940, -118.260),
+    (19, "Mission", 34.270, -118.450), (20, "Olympic", 34.050, -118.300), (21, "Topanga", 34.200, -118.600),
+]
+
+PREMISES = [
+    ("101", "STREET", 25), ("501", "SINGLE FAMILY DWELLING", 17), ("502", "MULTI-UNIT DWELLING (APARTMENT, DUPLEX, ETC)", 12),
+    ("108", "PARKING LOT", 7), ("203", "OTHER BUSINESS", 5), ("102", "SIDEWALK", 5),
+    ("122", "VEHICLE, PASSENGER/TRUCK", 4), ("210", "RESTAURANT/FAST FOOD", 2),
+]
+WEAPONS = [
+    ("400", "STRONG-ARM (HANDS, FIST, FEET OR BODILY FORCE)", 55), ("500", "UNKNOWN WEAPON/OTHER WEAPON", 10),
+    ("511", "VERBAL THREAT", 8), ("102", "HAND GUN", 6), ("200", "KNIFE WITH BLADE 6INCHES OR LESS", 3),
+    ("109", "SEMI-AUTOMATIC PISTOL", 2),
+]
+STATUSES = [("IC", "Invest Cont", 80), ("AO", "Adult Other", 10), ("AA", "Adult Arrest", 9), ("JA", "Juv Arrest", 1)]
+MOCODES = ["0344", "0416", "1822", "0329", "1300", "0913", "2000", "1414", "0400", "1501", "1402", "0325", "1609", "0358"]
+DESCENTS = [("H", 38), ("W", 21), ("B", 14), ("X", 10), ("O", 8), ("A", 3), ("K", 1), ("F", 1)]
+# relative number of crimes per hour of day: quiet before dawn, peaks at noon and in the evening
+HOUR_WEIGHTS = [5, 4, 3, 2, 2, 2, 3, 4, 5, 5, 5, 5, 8, 6, 6, 6, 6, 7, 7, 7, 7, 6, 6, 5]
+
+
+def shard_rng(seed, kind, shard):
+    """Random generator for one shard, independent of which worker runs it."""
+    return random.Random(f"{seed}:{kind}:{shard}")
+
+
+def weighted(rng, table):
+    """Pick a row of a (..., weight) table by weight."""
+    return rng.choices(table, weights=[row[-1] for row in table])[0]
+
+
+fake = Faker()
+
+
+@functools.lru_cache(maxsize=100000)
+def officer(seed, badge_no):
+    """The officer with a given badge number, derived from the badge number alone."""
+    fake.seed_instance(f"{seed}:officer:{badge_no}")
+    return {
+        "badge_no": badge_no,
+        "name": fake.name(),
+        "email": fake.email(),
+        "area": fake.random_int(min=1, max=21)
+    }
+
+
+def crime_row(rng, dr_no):
+    """Generate one raw crime row shaped like the SODA rows."""
+    code, description, _ = weighted(rng, CRIME_CODES)
+    area_no, area_name, lat, lon = rng.choice(AREAS)
+    premis_code, premis_description, _ = weighted(rng, PREMISES)
+    status, status_description, _ = weighted(rng, STATUSES)
+
+    occurred = START_DATE + timedelta(days=rng.randrange((END_DATE - START_DATE).days + 1))
+    # most crimes are reported the same day, a long tail much later
+    reported = min(occurred + timedelta(days=int(rng.expovariate(0.3))), END_DATE)
+    hour = rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+
+    row = {
+        "dr_no": str(dr_no),
+        "date_rptd": reported.strftime("%Y-%m-%dT%H:%M:%S.000"),
+        "date_occ": occurred.strftime("%Y-%m-%dT%H:%M:%S.000"),
+        "time_occ": f"{hour:02d}{rng.randrange(60):02d}",
+        "area": f"{area_no:02d}",
+        "area_name": area_name,
+        "rpt_dist_no": f"{area_no:02d}{rng.randrange(100):02d}",
+        "crm_cd": code,
+        "crm_cd_desc": description,
+        "crm_cd_1": code,
+        "mocodes": " ".join(rng.sample(MOCODES, rng.randint(1, 4))),
+        "premis_cd": premis_code,
+        "premis_desc": premis_description,
+        "status": status,
+        "status_desc": status_description,
+        "location": f"{rng.randint(100, 19999)} {rng.choice(['W', 'E', 'N', 'S'])}  {rng.randint(1, 120)}TH ST",
+        "lat": f"{rng.gauss(lat, 0.015):.4f}",
+        "lon": f"{rng.gauss(lon, 0.015):.4f}",
+    }
+
+    if code == "510":
+        # vehicle thefts have no victim
+        row.update(vict_age="0", vict_sex="X", vict_descent="X")
+    else:
+        row.update(
+            vict_age=str(min(99, max(1, int(rng.gauss(38, 15))))),
+            vict_sex=rng.choice(["F", "M"]),
+            vict_descent=weighted(rng, DESCENTS)[0]
+        )
+    if rng.random() < (0.9 if code in VIOLENT_CODES else 0.03):
+        row["weapon_used_cd"], row["weapon_desc"], _ = weighted(rng, WEAPONS)
+    if rng.random() < 0.07:
+        row["crm_cd_2"] = weighted(rng, CRIME_CODES)[0]
+    return row
+
+
+def upvotes_for(rng, seed, row, officers, mean):
+    """Upvotes of one crime report, from distinct officers, dated after the crime occurred."""
+    count = min(poisson(rng, mean), officers)
+    if not count:
+        return []
+
+    occurred = datetime.fromisoformat(row["date_occ"])
+    days = (END_DATE - occurred).days + 1
+    return [
+        {
+            "officer": {key: value for key, value in officer(seed, badge_no).items() if key != "area"},
+            "report": {"dr_no": row["dr_no"], "area": {"no": int(row["area"]), "name": row["area_name"], "report_dist_no": row["rpt_dist_no"]}},
+            "upvote_date": (occurred + timedelta(days=rng.randrange(days))).strftime("%Y-%m-%d")
+        }
+        for badge_no in rng.sample(range(1, officers + 1), count)
+    ]
+
+
+def write_rows(directory, file_name, rows):
+    """Write rows into a fresh shard in APPEND_ROWS gzip members and return its manifest entry."""
+    path = os.path.join(directory, file_name)
+    if os.path.exists(path):
+        os.remove(path)
+    for start in range(0, len(rows), APPEND_ROWS):
+        append_rows(path, rows[start:start + APPEND_ROWS])
+    return shard_entry(directory, file_name, len(rows)) if rows else None
+
+
+def shard_range(shard, total):
+    """Row indexes covered by a shard."""
+    return range(shard * SHARD_ROWS, min((shard + 1) * SHARD_ROWS, total))
+
+
+def generate_officers(output, seed, shard, officers):
+    """Task: one shard of officers (badge numbers are 1..officers, so they are unique)."""
+    rows = [officer(seed, index + 1) for index in shard_range(shard, officers)]
+    return "officers", shard, write_rows(os.path.join(output, "officers"), f"officers-{shard:05d}.{FORMAT}", rows)
+
+
+def generate_crimes(output, seed, shard, crimes, officers, upvotes_per_report):
+    """Task: one shard of crime rows and the upvotes of those reports."""
+    rng = shard_rng(seed, "crimes", shard)
+    upvote_rng = shard_rng(seed, "upvotes", shard)
+
+    rows, upvotes = [], []
+    for index in shard_range(shard, crimes):
+        row = crime_row(rng, FIRST_DR_NO + index)
+        rows.append(row)
+        upvotes.extend(upvotes_for(upvote_rng, seed, row, officers, upvotes_per_report))
+
+    crimes_entry = write_rows(os.path.join(output, "crimes"), f"crimes-{shard:05d}.{FORMAT}", rows)
+    upvotes_entry = write_rows(os.path.join(output, "upvotes"), f"upvotes-{shard:05d}.{FORMAT}", upvotes)
+    return "crimes", shard, crimes_entry, upvotes_entry
+
+
+def generate(output, sf, seed=0, workers=None, upvotes_per_report=UPVOTES_PER_REPORT):
+    """Generate every shard in a process pool, then write one manifest per kind."""
+    crimes = int(CRIMES_PER_SF * sf)
+    officers = int(OFFICERS_PER_SF * sf)
+    for kind in ("crimes", "officers", "upvotes"):
+        os.makedirs(os.path.join(output, kind), exist_ok=True)
+
+    entries = {"crimes": {}, "officers": {}, "upvotes": {}}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(generate_officers, output, seed, shard, officers)
+            for shard in range(math.ceil(officers / SHARD_ROWS))
+        ] + [
+            executor.submit(generate_crimes, output, seed, shard, crimes, officers, upvotes_per_report)
+            for shard in range(math.ceil(crimes / SHARD_ROWS))
+        ]
+        for future in futures:
+            kind, shard, *shard_entries = future.result()
+            if kind == "officers":
+                entries["officers"][shard] = shard_entries[0]
+            else:
+                entries["crimes"][shard], entries["upvotes"][shard] = shard_entries
+            print(f"{kind} shard {shard} done")
+
+    # manifests list the shards in index order, whatever order the tasks finished in
+    return {
+        kind: write_manifest(
+            os.path.join(output, kind), [entry for _, entry in sorted(shards.items()) if entry]
+        )["rows"]
+        for kind, shards in entries.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic officers / crimes / upvotes workload.")
+    parser.add_argument('--sf', type=float, default=1, help="scale factor, SF1 ~ the public dataset")
+    parser.add_argument('--seed', type=int, default=0, help="seed, the same seed always gives the same data")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--upvotes-per-report', type=float, default=UPVOTES_PER_REPORT, help="mean upvotes per crime report")
+    parser.add_argument('--output', help="output directory (default: data/workload/sf<SF>)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(OUTPUT_DIR, f"sf{args.sf:g}")
+    rows = generate(output, args.sf, seed=args.seed, workers=args.workers, upvotes_per_report=args.upvotes_per_report)
+    print(f"Workload generated in {output}: {rows['crimes']} crimes, {rows['officers']} officers, {rows['upvotes']} upvotes.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,93 @@
+import argparse
 from pymongo import MongoClient
+from db.rollups import create_rollup_indexes
 
-# connect to MongoDB
-client = MongoClient('mongodb://localhost:27017/')  
-db = client['la_crime_db'] 
-crimes_collection = db['crime_reports']
-upvotes_collection = db['upvotes']
-
-# create indexes for crimes_collection
-try:
-    crimes_collection.create_index([("date_occurred", 1), ("crime.code", 1)])
-    crimes_collection.create_index([("date_occurred", 1), ("area.name", 1), ("crime.code", 1)])
-    crimes_collection.create_index([("crime.code", 1), ("weapon.description", 1), ("area.name", 1)])
-    print("Indexes created successfully for crimes_collection.")
-except Exception as e:
-    print(f"Error creating indexes for crimes_collection: {e}")
-
-# create indexes for upvotes_collection
-try:
-    upvotes_collection.create_index([("upvote_date", 1), ("report.dr_no", 1)])
-    upvotes_collection.create_index([("officer.badge_no", 1), ("officer.name", 1)])
-    upvotes_collection.create_index([("officer.badge_no", 1), ("report.area.no", 1)])
-    upvotes_collection.create_index([("officer.email", 1), ("officer.badge_no", 1)])
-    upvotes_collection.create_index([("officer.name", 1), ("report.area", 1)])
-    print("Indexes created successfully for upvotes_collection.")
-except Exception as e:
-    print(f"Error creating indexes for upvotes_collection: {e}")
\ No newline at end of file
+# keys that identify a document in each collection, enforced with unique indexes so that
+# rerunning a loader can never duplicate documents
+UNIQUE_KEYS = {
+    "crime_reports": [("dr_no", 1)],
+    "police_officers": [("badge_no", 1)],
+    "upvotes": [("officer.badge_no", 1), ("report.dr_no", 1)],
+}
+
+
+def remove_duplicates(collection, keys):
+    """Keep the first document for every key and delete the rest; return how many were removed."""
+    pipeline = [
+        {"$group": {"_id": {field.replace(".", "_"): f"${field}" for field, _ in keys}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    removed = 0
+    for group in collection.aggregate(pipeline, allowDiskUse=True):
+        removed += collection.delete_many({"_id": {"$in": group["ids"][1:]}}).deleted_count
+    return removed
+
+
+def create_unique_indexes(db, collections=tuple(UNIQUE_KEYS), dedupe=False):
+    """Create the unique indexes that make upsert-based ingestion idempotent."""
+    # a plain dr_no index from an earlier setup has the same key and must make way for the unique one
+    existing = db.crime_reports.index_information()
+    if "crime_reports" in collections and "dr_no_1" in existing and not existing["dr_no_1"].get("unique"):
+        db.crime_reports.drop_index("dr_no_1")
+
+    for collection_name in collections:
+        keys = UNIQUE_KEYS[collection_name]
+        if dedupe:
+            removed = remove_duplicates(db[collection_name], keys)
+            if removed:
+                print(f"Removed {removed} duplicate documents from {collection_name}.")
+        db[collection_name].create_index(keys, unique=True)
+
+
+def create_indexes(db, dedupe=False):
+    """Create all the indexes used by the loaders and the API queries."""
+    crimes_collection = db['crime_reports']
+    upvotes_collection = db['upvotes']
+
+    # create unique indexes on the document keys
+    try:
+        create_unique_indexes(db, dedupe=dedupe)
+        print("Unique indexes created successfully.")
+    except Exception as e:
+        print(f"Error creating unique indexes (rerun with --dedupe to remove existing duplicates): {e}")
+
+    # create indexes for crimes_collection
+    try:
+        crimes_collection.create_index([("date_occurred", 1), ("crime.code", 1)])
+        crimes_collection.create_index([("date_occurred", 1), ("area.no", 1), ("crime.code", 1)])
+        crimes_collection.create_index([("crime.code", 1), ("weapon.code", 1), ("area.no", 1)])
+        crimes_collection.create_index([("location.coordinates", "2dsphere"), ("date_occurred", 1)])
+        crimes_collection.create_index([("mocodes", 1), ("date_occurred", 1)])
+        print("Indexes created successfully for crimes_collection.")
+    except Exception as e:
+        print(f"Error creating indexes for crimes_collection: {e}")
+
+    # create the unique key indexes of the rollup collections
+    try:
+        create_rollup_indexes(db)
+        print("Indexes created successfully for the rollup collections.")
+    except Exception as e:
+        print(f"Error creating indexes for the rollup collections: {e}")
+
+    # create indexes for upvotes_collection
+    try:
+        upvotes_collection.create_index([("upvote_date", 1), ("report.dr_no", 1)])
+        upvotes_collection.create_index([("officer.badge_no", 1), ("officer.name", 1)])
+        upvotes_collection.create_index([("officer.badge_no", 1), ("report.area.no", 1)])
+        upvotes_collection.create_index([("officer.email", 1), ("officer.badge_no", 1)])
+        upvotes_collection.create_index([("officer.name", 1), ("report.area", 1)])
+        print("Indexes created successfully for upvotes_collection.")
+    except Exception as e:
+        print(f"Error creating indexes for upvotes_collection: {e}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create the MongoDB indexes.")
+    parser.add_argument('--dedupe', action='store_true', help="remove duplicate documents before creating unique indexes")
+    args = parser.parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    create_indexes(db, dedupe=args.dedupe)
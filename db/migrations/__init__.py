@@ -0,0 +1,21 @@
+def migrate_in_batches(collection, query, update, batch_size=10000):
+    """Apply `update` to every document matching `query`, one _id range at a time.
+
+    Each batch is a single server-side update_many, so documents never travel to the
+    client and the migration can be interrupted and rerun (migrated documents stop
+    matching `query`).
+    """
+    migrated = 0
+    last_id = None
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+
+        ids = [document["_id"] for document in collection.find(batch_query, {"_id": 1}).sort("_id", 1).limit(batch_size)]
+        if not ids:
+            return migrated
+
+        migrated += collection.update_many({"_id": {"$in": ids}}, update).modified_count
+        last_id = ids[-1]
+        print(f"{collection.name}: {migrated} documents migrated")
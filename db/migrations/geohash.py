@@ -0,0 +1,45 @@
+import argparse
+from pymongo import MongoClient, UpdateOne
+from data.crimes.process import geohash_of
+
+# adds location.geohash to crime reports that have a GeoJSON point but no geohash yet (run
+# db.migrations.geojson first). geohashes are computed client-side, so this one does not go
+# through migrate_in_batches:
+#
+#   python -m db.migrations.geohash
+
+
+def migrate(db, batch_size=10000):
+    """Store the geohash of every crime report that has coordinates but no geohash."""
+    query = {"location.coordinates.type": "Point", "location.geohash": {"$exists": False}}
+    migrated = 0
+    last_id = None
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+
+        batch = list(db.crime_reports.find(batch_query, {"location.coordinates": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            return migrated
+
+        operations = [
+            UpdateOne({"_id": report["_id"]}, {"$set": {"location.geohash": geohash_of(report["location"]["coordinates"])}})
+            for report in batch
+        ]
+        migrated += db.crime_reports.bulk_write(operations, ordered=False).modified_count
+        last_id = batch[-1]["_id"]
+        print(f"crime_reports: {migrated} documents migrated")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Add geohashes to crime reports with GeoJSON coordinates.")
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    reports = migrate(db, batch_size=args.batch_size)
+    print(f"Migration completed: {reports} crime reports geohashed. Rebuild the tiles with `python -m db.rollups.tiles`.")
@@ -0,0 +1,62 @@
+import argparse
+from pymongo import MongoClient
+from db.migrations import migrate_in_batches
+
+# replaces the {latitude, longitude} strings under location.coordinates with a GeoJSON Point
+# (null when the coordinates are missing or zero) so a 2dsphere index can be used:
+#
+#   python -m db.migrations.geojson
+
+
+def to_double(path):
+    """Aggregation expression converting a field to double, null if it does not convert."""
+    return {"$convert": {"input": path, "to": "double", "onError": None, "onNull": None}}
+
+
+CRIME_REPORTS_UPDATE = [
+    {
+        "$set": {
+            "location.coordinates": {
+                "$let": {
+                    "vars": {
+                        "lat": to_double("$location.coordinates.latitude"),
+                        "lon": to_double("$location.coordinates.longitude"),
+                    },
+                    "in": {
+                        "$cond": [
+                            {"$and": [
+                                {"$ne": [{"$ifNull": ["$$lat", 0]}, 0]},
+                                {"$ne": [{"$ifNull": ["$$lon", 0]}, 0]},
+                                {"$lte": [{"$abs": "$$lat"}, 90]},
+                                {"$lte": [{"$abs": "$$lon"}, 180]},
+                            ]},
+                            {"type": "Point", "coordinates": ["$$lon", "$$lat"]},
+                            None
+                        ]
+                    }
+                }
+            }
+        }
+    }
+]
+
+
+def migrate(db, batch_size=10000):
+    """Convert the coordinates of every crime report still in the old layout."""
+    return migrate_in_batches(
+        db.crime_reports, {"location.coordinates.latitude": {"$exists": True}}, CRIME_REPORTS_UPDATE, batch_size
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Migrate crime report coordinates to GeoJSON points.")
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    reports = migrate(db, batch_size=args.batch_size)
+    db.crime_reports.create_index([("location.coordinates", "2dsphere"), ("date_occurred", 1)])
+    print(f"Migration completed: {reports} crime reports converted, 2dsphere index created.")
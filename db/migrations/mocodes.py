@@ -0,0 +1,58 @@
+import argparse
+import sys
+from pymongo import MongoClient
+from db.migrations import migrate_in_batches
+
+# splits the space-separated mocodes string of existing crime reports into an array of codes
+# and creates the multikey index used by the MO code search:
+#
+#   python -m db.migrations.mocodes
+#
+# rerunning it is a no-op: only reports whose mocodes field itself is a string are selected
+# ({"$type": "string"} would also match arrays of codes, which $split cannot take)
+
+STRING_MOCODES = {"$expr": {"$eq": [{"$type": "$mocodes"}, "string"]}}
+
+CRIME_REPORTS_UPDATE = [
+    {
+        "$set": {
+            "mocodes": {
+                "$filter": {
+                    "input": {"$split": ["$mocodes", " "]},
+                    "as": "code",
+                    "cond": {"$ne": ["$$code", ""]}
+                }
+            }
+        }
+    }
+]
+
+
+def migrate(db, batch_size=10000):
+    """Convert the mocodes of every crime report still stored as a string."""
+    return migrate_in_batches(db.crime_reports, STRING_MOCODES, CRIME_REPORTS_UPDATE, batch_size)
+
+
+def remaining(db):
+    """Count the crime reports whose mocodes are still a string (0 once migrated)."""
+    return db.crime_reports.count_documents(STRING_MOCODES)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Migrate crime report MO codes to arrays.")
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    reports = migrate(db, batch_size=args.batch_size)
+    db.crime_reports.create_index([("mocodes", 1), ("date_occurred", 1)])
+    print(f"Migration completed: {reports} crime reports converted, mocodes index created.")
+
+    # a second pass must find nothing left to convert
+    left = remaining(db)
+    if left:
+        print(f"{left} crime reports still store mocodes as a string.")
+    sys.exit(1 if left else 0)
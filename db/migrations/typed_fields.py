@@ -0,0 +1,89 @@
+import argparse
+from pymongo import MongoClient
+from db.migrations import migrate_in_batches
+
+# converts crime reports written with string dates / codes to native BSON types, and adds the
+# `day` bucket used by the per-day queries:
+#
+#   python -m db.migrations.typed_fields
+
+
+def to_int(path):
+    """Aggregation expression converting a field to int, keeping values that do not convert."""
+    return {"$convert": {"input": path, "to": "int", "onError": path, "onNull": path}}
+
+
+def to_date(path):
+    """Aggregation expression parsing an ISO date string, keeping values that do not parse."""
+    return {"$dateFromString": {"dateString": path, "onError": path, "onNull": path}}
+
+
+CRIME_REPORTS_UPDATE = [
+    {
+        "$set": {
+            "date_reported": to_date("$date_reported"),
+            "date_occurred": to_date("$date_occurred"),
+            "area.no": to_int("$area.no"),
+            "crime": {
+                "$map": {
+                    "input": "$crime",
+                    "as": "crime",
+                    "in": {"$mergeObjects": ["$$crime", {"code": to_int("$$crime.code")}]}
+                }
+            },
+            # reports without a weapon keep an empty weapon document
+            "weapon": {
+                "$cond": [
+                    {"$eq": [{"$type": "$weapon.code"}, "missing"]},
+                    "$weapon",
+                    {"$mergeObjects": ["$weapon", {"code": to_int("$weapon.code")}]}
+                ]
+            },
+        }
+    },
+    {
+        "$set": {
+            # reports whose date_occurred did not parse keep the string and get no day
+            "day": {
+                "$cond": [
+                    {"$eq": [{"$type": "$date_occurred"}, "date"]},
+                    {
+                        "$dateFromParts": {
+                            "year": {"$year": "$date_occurred"},
+                            "month": {"$month": "$date_occurred"},
+                            "day": {"$dayOfMonth": "$date_occurred"}
+                        }
+                    },
+                    None
+                ]
+            }
+        }
+    },
+]
+
+# upvotes embed a copy of the report's area
+UPVOTES_UPDATE = [{"$set": {"report.area.no": to_int("$report.area.no")}}]
+
+
+def migrate(db, batch_size=10000):
+    """Convert crime_reports (and the area copies in upvotes) to typed fields."""
+    reports = migrate_in_batches(
+        db.crime_reports, {"date_occurred": {"$type": "string"}}, CRIME_REPORTS_UPDATE, batch_size
+    )
+    upvotes = migrate_in_batches(
+        db.upvotes, {"report.area.no": {"$type": "string"}}, UPVOTES_UPDATE, batch_size
+    )
+    return reports, upvotes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Migrate crime reports to native BSON dates and integer codes.")
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    reports, upvotes = migrate(db, batch_size=args.batch_size)
+    print(f"Migration completed: {reports} crime reports and {upvotes} upvotes converted.")
@@ -0,0 +1,47 @@
+from db.rollups import daily, emails, hours, leaderboard, officers, tiles, weapons
+from db.rollups.base import apply_counts, count_keys, create_key_index
+
+# rollup collections maintained incrementally from crime report writes. every rollup module
+# exposes COLLECTION, KEY (its unique key fields), FIELDS (the crime report fields it reads),
+# keys(report) and pipelines() (used by base.rebuild), and can be rebuilt with
+# `python -m db.rollups.<name>`
+ROLLUPS = [tiles, hours, daily, weapons]
+# collections maintained from upvote inserts, each with apply_upvotes(db, upvotes),
+# create_indexes(db) and rebuild(db)
+UPVOTE_ROLLUPS = [officers, leaderboard]
+# collections maintained from police officer writes, each with apply_officers(db, officers, previous),
+# create_indexes(db) and rebuild(db)
+OFFICER_ROLLUPS = [emails]
+
+
+def rollup_projection():
+    """Projection of the crime report fields any rollup reads, used to fetch before-images."""
+    return {field: 1 for rollup in ROLLUPS for field in rollup.FIELDS}
+
+
+def apply_reports(db, reports, sign=1):
+    """Count crime reports into (sign=1) or out of (sign=-1) every rollup collection."""
+    reports = [report for report in reports if report]
+    for rollup in ROLLUPS:
+        apply_counts(db[rollup.COLLECTION], count_keys(rollup, reports), sign)
+
+
+def apply_upvotes(db, upvotes):
+    """Count newly inserted upvotes into every upvote rollup collection."""
+    upvotes = [upvote for upvote in upvotes if upvote]
+    for rollup in UPVOTE_ROLLUPS:
+        rollup.apply_upvotes(db, upvotes)
+
+
+def apply_officers(db, officers, previous):
+    """Apply written police officers to every officer rollup; `previous` maps badge_no -> email before the write."""
+    for rollup in OFFICER_ROLLUPS:
+        rollup.apply_officers(db, officers, previous)
+
+
+def create_rollup_indexes(db):
+    """Create the indexes of every rollup collection."""
+    for rollup in ROLLUPS:
+        create_key_index(db, rollup)
+    for rollup in UPVOTE_ROLLUPS + OFFICER_ROLLUPS:
+        rollup.create_indexes(db)
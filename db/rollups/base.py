@@ -0,0 +1,83 @@
+from collections import Counter
+from pymongo import UpdateOne
+
+# shared plumbing of the rollup collections: every rollup is a set of {key fields..., count}
+# documents under a unique index on its key, kept current with $inc and rebuilt with $merge.
+# $merge cannot match on a null or missing field, so key fields a report may lack (its area,
+# a crime code or severity) are stored as UNKNOWN, both incrementally and by the pipelines
+
+UNKNOWN = -1
+
+
+def key_value(value):
+    """A key field as stored by keys(): the value, or UNKNOWN if it is missing."""
+    return UNKNOWN if value is None else value
+
+
+def key_field(path):
+    """A key field as stored by pipelines(): the field, or UNKNOWN if it is null or missing."""
+    return {"$ifNull": [path, UNKNOWN]}
+
+
+def known(path):
+    """Aggregation expression reading a key field back, with UNKNOWN as null."""
+    return {"$cond": [{"$eq": [path, UNKNOWN]}, None, path]}
+
+
+def count_keys(rollup, reports):
+    """Count how many times each rollup key occurs in a list of crime reports."""
+    counts = Counter()
+    for report in reports:
+        for key in rollup.keys(report):
+            counts[tuple(key.items())] += 1
+    return counts
+
+
+def apply_counts(collection, counts, sign=1):
+    """Add (sign=1) or remove (sign=-1) counted keys with one unordered bulk write."""
+    operations = [
+        UpdateOne(dict(key), {"$inc": {"count": sign * count}}, upsert=True)
+        for key, count in counts.items()
+    ]
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+
+
+def create_key_index(db, rollup):
+    """Create the unique index on the rollup key, which $inc upserts and $merge rely on."""
+    db[rollup.COLLECTION].create_index([(field, 1) for field in rollup.KEY], unique=True)
+
+
+def rebuild(db, rollup):
+    """Recompute a rollup collection from crime_reports."""
+    db[rollup.COLLECTION].drop()
+    create_key_index(db, rollup)
+    for pipeline in rollup.pipelines():
+        db.crime_reports.aggregate(pipeline + [
+            # drop the group _id so $merge matches on the key fields only
+            {"$project": {"_id": 0}},
+            {"$merge": {"into": rollup.COLLECTION, "on": rollup.KEY, "whenMatched": "replace", "whenNotMatched": "insert"}},
+        ], allowDiskUse=True)
+    return db[rollup.COLLECTION].count_documents({})
+
+
+def backfill(db, rollup, batch_size=10000):
+    """Recompute a rollup collection client-side, counting crime_reports in _id ranges of batch_size.
+
+    Slower than rebuild, but every batch is a bounded read plus one bulk write, and it does not
+    need $merge.
+    """
+    db[rollup.COLLECTION].drop()
+    create_key_index(db, rollup)
+    projection = {field: 1 for field in rollup.FIELDS}
+    reports, last_id = 0, None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(db.crime_reports.find(query, projection).sort("_id", 1).limit(batch_size))
+        if not batch:
+            return db[rollup.COLLECTION].count_documents({})
+
+        apply_counts(db[rollup.COLLECTION], count_keys(rollup, batch))
+        reports += len(batch)
+        last_id = batch[-1]["_id"]
+        print(f"{rollup.COLLECTION}: {reports} crime reports counted")
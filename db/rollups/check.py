@@ -0,0 +1,76 @@
+import argparse
+import sys
+from pymongo import MongoClient
+from app.queries import crimes as raw, daily
+
+# consistency check of the crime_daily_counts rollup: runs queries 1-4 both from the rollup
+# (app/queries/daily.py) and with the raw pipelines over crime_reports (app/queries/crimes.py)
+# and reports any difference. ties may be ordered differently, so rankings compare counts
+#
+#   python -m db.rollups.check --start-date 2020-01-01 --end-date 2020-12-31
+
+
+def by_code(rows):
+    return {row["code"]: row["count"] for row in rows}
+
+
+def by_area(rows):
+    return {row["area"]: [crime["count"] for crime in row["top_crimes"]] for row in rows}
+
+
+def counts(rows):
+    return [row["count"] for row in rows]
+
+
+def compare(name, rollup, pipeline):
+    """Print whether two normalized results agree; return True if they do."""
+    if rollup == pipeline:
+        print(f"{name}: ok")
+        return True
+    print(f"{name}: MISMATCH\n  rollup:   {rollup}\n  pipeline: {pipeline}")
+    return False
+
+
+def check(db, start_date, end_date, date, crime_codes):
+    """Compare queries 1-4 of the rollup and the raw pipelines; return True if all agree."""
+    results = [
+        compare(
+            "query 1 (reports per crime code)",
+            by_code(daily.get_reports_per_crime_code.uncached(db, start_date, end_date)),
+            by_code(raw.get_reports_per_crime_code.uncached(db, start_date, end_date)),
+        ),
+    ]
+    for crime_code in crime_codes:
+        results.append(compare(
+            f"query 2 (reports per day for crime code {crime_code})",
+            daily.get_reports_per_day_for_crime_code.uncached(db, crime_code, start_date, end_date),
+            raw.get_reports_per_day_for_crime_code.uncached(db, crime_code, start_date, end_date),
+        ))
+    results.append(compare(
+        f"query 3 (top three crimes per area on {date})",
+        by_area(daily.get_top_three_crimes_per_area_for_day.uncached(db, date)),
+        by_area(raw.get_top_three_crimes_per_area_for_day.uncached(db, date)),
+    ))
+    results.append(compare(
+        "query 4 (two least common crimes)",
+        counts(daily.get_two_least_common_crimes_per_day.uncached(db, start_date, end_date)),
+        counts(raw.get_two_least_common_crimes_per_day.uncached(db, start_date, end_date)),
+    ))
+    return all(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare queries 1-4 of the crime_daily_counts rollup with the raw pipelines.")
+    parser.add_argument('--start-date', required=True, help="first day of the range, e.g. 2020-01-01")
+    parser.add_argument('--end-date', required=True, help="last day of the range, e.g. 2020-12-31")
+    parser.add_argument('--date', help="day checked for query 3 (default: --start-date)")
+    parser.add_argument('--crime-codes', type=int, default=5, help="number of the most common crime codes checked for query 2")
+    args = parser.parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    top_codes = [row["code"] for row in raw.get_reports_per_crime_code.uncached(db, args.start_date, args.end_date) if row["code"] is not None]
+    consistent = check(db, args.start_date, args.end_date, args.date or args.start_date, top_codes[:args.crime_codes])
+    sys.exit(0 if consistent else 1)
@@ -0,0 +1,57 @@
+import argparse
+import sys
+from pymongo import MongoClient
+from db.rollups.base import key_field, key_value, rebuild
+
+# daily counts: crime entries per day, area, crime code and severity. every entry of a report's
+# `crime` array counts once, exactly like the $unwind of queries 1-4 in app/queries/crimes.py,
+# so those queries can be answered from this collection (see app/queries/daily.py)
+#
+#   python -m db.rollups.daily   # rebuild crime_daily_counts from crime_reports
+
+COLLECTION = "crime_daily_counts"
+KEY = ["day", "area_no", "crime_code", "severity"]
+# fields of a crime report the rollup is computed from
+FIELDS = ["day", "area.no", "crime.code", "crime.severity"]
+
+
+def keys(report):
+    """Return the crime_daily_counts keys a crime report counts towards, one per crime entry."""
+    day = report.get("day")
+    if day is None:
+        return []
+
+    area_no = key_value((report.get("area") or {}).get("no"))
+    return [
+        {"day": day, "area_no": area_no, "crime_code": key_value(crime.get("code")), "severity": key_value(crime.get("severity"))}
+        for crime in report.get("crime") or []
+    ]
+
+
+def pipelines():
+    """Aggregation pipeline computing the daily counts from crime_reports in one pass."""
+    return [[
+        {"$match": {"day": {"$type": "date"}}},
+        {"$unwind": "$crime"},
+        {"$group": {
+            "_id": {
+                "day": "$day", "area_no": key_field("$area.no"),
+                "crime_code": key_field("$crime.code"), "severity": key_field("$crime.severity")
+            },
+            "count": {"$sum": 1}
+        }},
+        {"$project": {
+            "day": "$_id.day", "area_no": "$_id.area_no",
+            "crime_code": "$_id.crime_code", "severity": "$_id.severity", "count": 1
+        }},
+    ]]
+
+
+if __name__ == '__main__':
+    argparse.ArgumentParser(description="Rebuild the crime_daily_counts rollup from crime_reports.").parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    print(f"{COLLECTION}: {rebuild(db, sys.modules[__name__])} rows")
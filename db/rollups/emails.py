@@ -0,0 +1,91 @@
+import argparse
+from collections import defaultdict
+from pymongo import MongoClient, UpdateOne
+
+# email -> badge numbers of the officers registered with it, from police_officers:
+#
+#   {email, badge_nos: [...], badge_count, duplicate: badge_count > 1}
+#
+# emails are compared trimmed and lowercased. officer loads move badges between emails with
+# one pipeline update per email, so badge_nos, badge_count and duplicate always agree; the
+# (duplicate, email) index pages through the shared emails. served by app/queries/emails.py
+#
+#   python -m db.rollups.emails   # rebuild officer_emails from police_officers
+
+COLLECTION = "officer_emails"
+
+
+def normalize_email(email):
+    """The form emails are compared in, or None for a missing email."""
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def update_badges(email, badge_nos, add):
+    """One update adding badges to an email (upserting it) or removing them from it."""
+    current = {"$ifNull": ["$badge_nos", []]}
+    if add:
+        badges = {"$setUnion": [current, {"$literal": badge_nos}]}
+    else:
+        badges = {"$filter": {"input": current, "cond": {"$eq": [{"$in": ["$$this", {"$literal": badge_nos}]}, False]}}}
+    return UpdateOne({"email": email}, [
+        {"$set": {"badge_nos": badges}},
+        {"$set": {"badge_count": {"$size": "$badge_nos"}}},
+        {"$set": {"duplicate": {"$gt": ["$badge_count", 1]}}},
+    ], upsert=add)
+
+
+def apply_officers(db, officers, previous):
+    """Move written officers to their current email; `previous` maps badge_no -> email before the write."""
+    added, removed = defaultdict(list), defaultdict(list)
+    for officer in officers:
+        badge_no = officer["badge_no"]
+        old, new = normalize_email(previous.get(badge_no)), normalize_email(officer.get("email"))
+        if old == new:
+            continue
+        if old:
+            removed[old].append(badge_no)
+        if new:
+            added[new].append(badge_no)
+
+    operations = [update_badges(email, badge_nos, add=False) for email, badge_nos in removed.items()]
+    operations += [update_badges(email, badge_nos, add=True) for email, badge_nos in added.items()]
+    if operations:
+        db[COLLECTION].bulk_write(operations, ordered=True)
+
+
+def create_indexes(db):
+    """Unique email index for the upserts, and the (duplicate, email) index the paged query walks."""
+    collection = db[COLLECTION]
+    collection.create_index([("email", 1)], unique=True)
+    collection.create_index([("duplicate", 1), ("email", 1)])
+
+
+def pipeline():
+    """Aggregation pipeline computing officer_emails from police_officers."""
+    return [
+        {"$match": {"email": {"$type": "string"}}},
+        {"$group": {"_id": {"$toLower": {"$trim": {"input": "$email"}}}, "badge_nos": {"$addToSet": "$badge_no"}}},
+        {"$match": {"_id": {"$ne": ""}}},
+        {"$project": {"_id": 0, "email": "$_id", "badge_nos": 1, "badge_count": {"$size": "$badge_nos"}}},
+        {"$addFields": {"duplicate": {"$gt": ["$badge_count", 1]}}},
+    ]
+
+
+def rebuild(db):
+    """Recompute officer_emails from police_officers."""
+    db[COLLECTION].drop()
+    create_indexes(db)
+    db.police_officers.aggregate(pipeline() + [
+        {"$merge": {"into": COLLECTION, "on": "email", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ], allowDiskUse=True)
+    return db[COLLECTION].count_documents({})
+
+
+if __name__ == '__main__':
+    argparse.ArgumentParser(description="Rebuild the officer_emails mapping from police_officers.").parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    print(f"{COLLECTION}: {rebuild(db)} emails")
@@ -0,0 +1,81 @@
+import argparse
+import sys
+from datetime import datetime
+from pymongo import MongoClient
+from db.rollups.base import key_field, key_value, rebuild
+
+# staffing cube: crime counts per month, weekday, hour of day, area and crime code. the hour
+# comes from time_occurred ("HHMM"), the weekday is ISO (1 = Monday ... 7 = Sunday) and the
+# month is the first day of the month, so date filters on the cube work at month granularity
+#
+#   python -m db.rollups.hours   # rebuild crime_hours from crime_reports
+
+COLLECTION = "crime_hours"
+KEY = ["month", "weekday", "hour", "area_no", "crime_code"]
+# fields of a crime report the rollup is computed from
+FIELDS = ["date_occurred", "time_occurred", "area.no", "crime.code"]
+
+
+def hour_of(time_occurred):
+    """Return the hour of an "HHMM" time, or None if it is missing or malformed."""
+    try:
+        hour = int(time_occurred) // 100
+    except (TypeError, ValueError):
+        return None
+    return hour if 0 <= hour <= 23 else None
+
+
+def month_of(date):
+    """Truncate a datetime to the first day of its month."""
+    return datetime(date.year, date.month, 1)
+
+
+def keys(report):
+    """Return the crime_hours keys a crime report counts towards."""
+    date = report.get("date_occurred")
+    hour = hour_of(report.get("time_occurred"))
+    if not isinstance(date, datetime) or hour is None:
+        return []
+
+    area_no = key_value((report.get("area") or {}).get("no"))
+    codes = {crime.get("code") for crime in report.get("crime") or [] if crime.get("code") is not None}
+    return [
+        {"month": month_of(date), "weekday": date.isoweekday(), "hour": hour, "area_no": area_no, "crime_code": code}
+        for code in sorted(codes)
+    ]
+
+
+def pipelines():
+    """Aggregation pipeline computing the cube from crime_reports in one pass."""
+    return [[
+        {"$match": {"date_occurred": {"$type": "date"}}},
+        {"$project": {
+            "month": {"$dateFromParts": {"year": {"$year": "$date_occurred"}, "month": {"$month": "$date_occurred"}}},
+            "weekday": {"$isoDayOfWeek": "$date_occurred"},
+            "hour": {"$floor": {"$divide": [{"$convert": {"input": "$time_occurred", "to": "int", "onError": None, "onNull": None}}, 100]}},
+            "area_no": key_field("$area.no"),
+            # a report listing the same code twice still counts once
+            "codes": {"$setUnion": ["$crime.code", []]},
+        }},
+        {"$match": {"hour": {"$gte": 0, "$lte": 23}}},
+        {"$unwind": "$codes"},
+        {"$match": {"codes": {"$ne": None}}},
+        {"$group": {
+            "_id": {"month": "$month", "weekday": "$weekday", "hour": {"$toInt": "$hour"}, "area_no": "$area_no", "crime_code": "$codes"},
+            "count": {"$sum": 1}
+        }},
+        {"$project": {
+            "month": "$_id.month", "weekday": "$_id.weekday", "hour": "$_id.hour",
+            "area_no": "$_id.area_no", "crime_code": "$_id.crime_code", "count": 1
+        }},
+    ]]
+
+
+if __name__ == '__main__':
+    argparse.ArgumentParser(description="Rebuild the crime_hours cube from crime_reports.").parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    print(f"{COLLECTION}: {rebuild(db, sys.modules[__name__])} cells")
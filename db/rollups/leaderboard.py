@@ -0,0 +1,62 @@
+import argparse
+from collections import Counter
+from pymongo import MongoClient, UpdateOne
+
+# upvoted-report leaderboards: one {date, dr_no, count} counter per report and upvote_date
+# ("YYYY-MM-DD"), incremented on every upvote. the (date, count desc) index returns a day's
+# top reports already in order, served by app/queries/leaderboard.py
+#
+#   python -m db.rollups.leaderboard   # rebuild upvote_leaderboard from upvotes
+
+COLLECTION = "upvote_leaderboard"
+
+
+def apply_upvotes(db, upvotes):
+    """Count newly inserted upvotes into the leaderboards of their days."""
+    counts = Counter(
+        (upvote.get("upvote_date"), upvote["report"]["dr_no"])
+        # like pipeline(), only string dates are counted
+        for upvote in upvotes if isinstance(upvote.get("upvote_date"), str)
+    )
+    operations = [
+        UpdateOne({"date": date, "dr_no": dr_no}, {"$inc": {"count": count}}, upsert=True)
+        for (date, dr_no), count in counts.items()
+    ]
+    if operations:
+        db[COLLECTION].bulk_write(operations, ordered=False)
+
+
+def create_indexes(db):
+    """Unique (date, dr_no) index for the upserts, and the (date, count) index the top-N reads walk."""
+    collection = db[COLLECTION]
+    collection.create_index([("date", 1), ("dr_no", 1)], unique=True)
+    collection.create_index([("date", 1), ("count", -1), ("dr_no", 1)])
+
+
+def pipeline():
+    """Aggregation pipeline computing the leaderboards from upvotes."""
+    return [
+        {"$match": {"upvote_date": {"$type": "string"}}},
+        {"$group": {"_id": {"date": "$upvote_date", "dr_no": "$report.dr_no"}, "count": {"$sum": 1}}},
+        {"$project": {"_id": 0, "date": "$_id.date", "dr_no": "$_id.dr_no", "count": 1}},
+    ]
+
+
+def rebuild(db):
+    """Recompute upvote_leaderboard from upvotes."""
+    db[COLLECTION].drop()
+    create_indexes(db)
+    db.upvotes.aggregate(pipeline() + [
+        {"$merge": {"into": COLLECTION, "on": ["date", "dr_no"], "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ], allowDiskUse=True)
+    return db[COLLECTION].count_documents({})
+
+
+if __name__ == '__main__':
+    argparse.ArgumentParser(description="Rebuild the upvote_leaderboard collection from upvotes.").parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    print(f"{COLLECTION}: {rebuild(db)} report days")
@@ -0,0 +1,155 @@
+import argparse
+import sys
+from collections import Counter, defaultdict
+from pymongo import MongoClient, UpdateOne
+
+# per-officer upvote statistics, one document per officer:
+#
+#   {badge_no, name, total_upvotes, areas: {"<area no>": upvotes}, distinct_areas}
+#
+# every batch of new upvotes becomes one pipeline update per officer, so the counters, the
+# per-area counts and distinct_areas always change together. served by app/queries/officers.py
+#
+# the upvote insert and the officer_stats update are separate writes (the standalone server has
+# no transactions), so a failure between them leaves the stats behind. --check compares every
+# officer with a recomputation from upvotes and --repair rewrites the ones that drifted
+#
+#   python -m db.rollups.officers            # rebuild officer_stats from upvotes
+#   python -m db.rollups.officers --check    # list the officers whose stats drifted
+#   python -m db.rollups.officers --repair   # and recompute them
+
+COLLECTION = "officer_stats"
+
+
+def area_of(upvote):
+    """The area number of the upvoted report, or None."""
+    area = (upvote.get("report") or {}).get("area")
+    return area.get("no") if isinstance(area, dict) else None
+
+
+def updates(upvotes):
+    """One upsert per officer adding a batch of upvotes to its stats."""
+    names, totals, areas = {}, Counter(), defaultdict(Counter)
+    for upvote in upvotes:
+        officer = upvote["officer"]
+        names.setdefault(officer["badge_no"], officer.get("name"))
+        totals[officer["badge_no"]] += 1
+        if area_of(upvote) is not None:
+            areas[officer["badge_no"]][str(area_of(upvote))] += 1
+
+    operations = []
+    for badge_no, total in totals.items():
+        # area keys are known here, so the per-area increments are literal field paths
+        area_counts = {
+            f"areas.{area}": {"$add": [{"$ifNull": [f"$areas.{area}", 0]}, count]}
+            for area, count in areas[badge_no].items()
+        }
+        stages = [
+            {"$set": {
+                "name": {"$ifNull": ["$name", names[badge_no]]},
+                "total_upvotes": {"$add": [{"$ifNull": ["$total_upvotes", 0]}, total]},
+                "areas": {"$ifNull": ["$areas", {}]},
+            }},
+            {"$set": area_counts},
+            {"$set": {"distinct_areas": {"$size": {"$objectToArray": "$areas"}}}},
+        ]
+        operations.append(UpdateOne({"badge_no": badge_no}, [stage for stage in stages if stage["$set"]], upsert=True))
+    return operations
+
+
+def apply_upvotes(db, upvotes):
+    """Count newly inserted upvotes into officer_stats."""
+    operations = updates(upvotes)
+    if operations:
+        db[COLLECTION].bulk_write(operations, ordered=False)
+
+
+def create_indexes(db):
+    """Unique badge_no index for the upserts, and the counter / name indexes queries 7, 8 and 10 read."""
+    collection = db[COLLECTION]
+    collection.create_index([("badge_no", 1)], unique=True)
+    collection.create_index([("total_upvotes", -1)])
+    collection.create_index([("distinct_areas", -1)])
+    collection.create_index([("name", 1)])
+
+
+def pipeline():
+    """Aggregation pipeline computing officer_stats from upvotes."""
+    return [
+        # count the upvotes per officer and area
+        {"$group": {
+            "_id": {"badge_no": "$officer.badge_no", "area": "$report.area.no"},
+            "name": {"$first": "$officer.name"},
+            "count": {"$sum": 1}
+        }},
+        # fold the areas of an officer into one document
+        {"$group": {
+            "_id": "$_id.badge_no",
+            "name": {"$first": "$name"},
+            "total_upvotes": {"$sum": "$count"},
+            "areas": {"$push": {"k": {"$toString": "$_id.area"}, "v": "$count"}}
+        }},
+        {"$project": {
+            "_id": 0,
+            "badge_no": "$_id",
+            "name": 1,
+            "total_upvotes": 1,
+            # upvotes of reports without an area count towards the total only
+            "areas": {"$arrayToObject": {"$filter": {"input": "$areas", "cond": {"$ne": ["$$this.k", None]}}}},
+        }},
+        {"$addFields": {"distinct_areas": {"$size": {"$objectToArray": "$areas"}}}},
+    ]
+
+
+def check(db, repair=False):
+    """Return the badge numbers whose stats differ from upvotes, rewriting them if `repair`.
+
+    Upvotes written while it runs can show up as drift, so run it while upvotes are quiet.
+    """
+    expected = {stats["badge_no"]: stats for stats in db.upvotes.aggregate(pipeline(), allowDiskUse=True)}
+    drifted = []
+    for stats in db[COLLECTION].find({}, {"_id": 0}):
+        computed = expected.pop(stats["badge_no"], None)
+        if computed is None or (stats.get("total_upvotes"), stats.get("areas")) != (computed["total_upvotes"], computed["areas"]):
+            drifted.append((stats["badge_no"], computed))
+    # officers with upvotes but no stats at all
+    drifted.extend(expected.items())
+
+    if repair:
+        for badge_no, computed in drifted:
+            if computed is None:
+                db[COLLECTION].delete_one({"badge_no": badge_no})
+            else:
+                db[COLLECTION].replace_one({"badge_no": badge_no}, computed, upsert=True)
+    return [badge_no for badge_no, _ in drifted]
+
+
+def rebuild(db):
+    """Recompute officer_stats from upvotes."""
+    db[COLLECTION].drop()
+    create_indexes(db)
+    db.upvotes.aggregate(pipeline() + [
+        {"$merge": {"into": COLLECTION, "on": "badge_no", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ], allowDiskUse=True)
+    return db[COLLECTION].count_documents({})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rebuild, check or repair the officer_stats collection from upvotes.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--check', action='store_true', help="only list the officers whose stats drifted")
+    mode.add_argument('--repair', action='store_true', help="recompute the officers whose stats drifted")
+    args = parser.parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    if args.check or args.repair:
+        drifted = check(db, repair=args.repair)
+        print(f"{COLLECTION}: {len(drifted)} officers {'repaired' if args.repair else 'drifted'}")
+        for badge_no in drifted[:20]:
+            print(f"  {badge_no}")
+        sys.exit(1 if drifted and args.check else 0)
+
+    print(f"{COLLECTION}: {rebuild(db)} officers")
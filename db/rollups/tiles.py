@@ -0,0 +1,59 @@
+import argparse
+import sys
+from pymongo import MongoClient
+from db.rollups.base import rebuild
+
+# heatmap cube: crime counts per geohash tile, day and crime code, at a few precisions.
+# reports store a single geohash (location.geohash, see data/crimes/process.py); its prefixes
+# are the enclosing tiles at the coarser precisions
+#
+#   python -m db.rollups.tiles   # rebuild crime_tiles from crime_reports
+
+COLLECTION = "crime_tiles"
+KEY = ["precision", "tile", "day", "crime_code"]
+# fields of a crime report the rollup is computed from
+FIELDS = ["location.geohash", "day", "crime.code"]
+
+# 4 ~ 39x20 km, 5 ~ 5x5 km, 6 ~ 1.2x0.6 km
+TILE_PRECISIONS = (4, 5, 6)
+
+
+def keys(report):
+    """Return the crime_tiles keys a crime report counts towards."""
+    geohash = (report.get("location") or {}).get("geohash")
+    day = report.get("day")
+    if not geohash or day is None:
+        return []
+
+    codes = {crime.get("code") for crime in report.get("crime") or [] if crime.get("code") is not None}
+    return [
+        {"precision": precision, "tile": geohash[:precision], "day": day, "crime_code": code}
+        for precision in TILE_PRECISIONS
+        for code in sorted(codes)
+    ]
+
+
+def pipelines():
+    """Aggregation pipelines computing the cube from crime_reports, one per precision."""
+    return [
+        [
+            {"$match": {"location.geohash": {"$type": "string"}, "day": {"$type": "date"}}},
+            # a report listing the same code twice still counts once
+            {"$project": {"tile": {"$substrBytes": ["$location.geohash", 0, precision]}, "day": 1, "codes": {"$setUnion": ["$crime.code", []]}}},
+            {"$unwind": "$codes"},
+            {"$match": {"codes": {"$ne": None}}},
+            {"$group": {"_id": {"tile": "$tile", "day": "$day", "crime_code": "$codes"}, "count": {"$sum": 1}}},
+            {"$project": {"precision": {"$literal": precision}, "tile": "$_id.tile", "day": "$_id.day", "crime_code": "$_id.crime_code", "count": 1}},
+        ]
+        for precision in TILE_PRECISIONS
+    ]
+
+
+if __name__ == '__main__':
+    argparse.ArgumentParser(description="Rebuild the crime_tiles heatmap cube from crime_reports.").parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    print(f"{COLLECTION}: {rebuild(db, sys.modules[__name__])} tiles")
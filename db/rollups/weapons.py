@@ -0,0 +1,70 @@
+import argparse
+import sys
+from datetime import datetime
+from pymongo import MongoClient
+from db.rollups.base import backfill, key_field, key_value, rebuild
+from db.rollups.hours import month_of
+
+# weapon matrix: crime counts per crime code, weapon, month and area, for the "weapons used for
+# the same crime in several areas" query. reports without a weapon code are left out
+#
+#   python -m db.rollups.weapons                      # rebuild crime_weapons with $merge
+#   python -m db.rollups.weapons --batch-size 10000   # or backfill it client-side in batches
+
+COLLECTION = "crime_weapons"
+KEY = ["crime_code", "weapon_code", "month", "area_no"]
+# fields of a crime report the rollup is computed from
+FIELDS = ["date_occurred", "area.no", "crime.code", "weapon.code"]
+
+
+def keys(report):
+    """Return the crime_weapons keys a crime report counts towards."""
+    date = report.get("date_occurred")
+    weapon_code = (report.get("weapon") or {}).get("code")
+    if not isinstance(date, datetime) or weapon_code is None:
+        return []
+
+    area_no = key_value((report.get("area") or {}).get("no"))
+    codes = {crime.get("code") for crime in report.get("crime") or [] if crime.get("code") is not None}
+    return [
+        {"crime_code": code, "weapon_code": weapon_code, "month": month_of(date), "area_no": area_no}
+        for code in sorted(codes)
+    ]
+
+
+def pipelines():
+    """Aggregation pipeline computing the matrix from crime_reports in one pass."""
+    return [[
+        {"$match": {"date_occurred": {"$type": "date"}, "weapon.code": {"$ne": None}}},
+        {"$project": {
+            "month": {"$dateFromParts": {"year": {"$year": "$date_occurred"}, "month": {"$month": "$date_occurred"}}},
+            "weapon_code": "$weapon.code",
+            "area_no": key_field("$area.no"),
+            # a report listing the same code twice still counts once
+            "codes": {"$setUnion": ["$crime.code", []]},
+        }},
+        {"$unwind": "$codes"},
+        {"$match": {"codes": {"$ne": None}}},
+        {"$group": {
+            "_id": {"crime_code": "$codes", "weapon_code": "$weapon_code", "month": "$month", "area_no": "$area_no"},
+            "count": {"$sum": 1}
+        }},
+        {"$project": {
+            "crime_code": "$_id.crime_code", "weapon_code": "$_id.weapon_code",
+            "month": "$_id.month", "area_no": "$_id.area_no", "count": 1
+        }},
+    ]]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rebuild the crime_weapons matrix from crime_reports.")
+    parser.add_argument('--batch-size', type=int, help="backfill client-side in batches of this many reports instead of one $merge")
+    args = parser.parse_args()
+
+    # connect to MongoDB
+    client = MongoClient('mongodb://localhost:27017/')
+    db = client['la_crime_db']
+
+    rollup = sys.modules[__name__]
+    cells = backfill(db, rollup, args.batch_size) if args.batch_size else rebuild(db, rollup)
+    print(f"{COLLECTION}: {cells} cells")